@@ -1,77 +1,214 @@
 import abc
-import copy
+import enum
+import functools
+import io
 import logging
 import random
+import struct
+from collections.abc import Iterator, Sequence
 from dataclasses import dataclass
-from typing import IO, Callable, Literal, override
+from typing import IO, Any, Callable, Generic, Literal, TypeVar, override
 
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 
 from dqmj1_randomizer.data import data_path
+from dqmj1_randomizer.randomize.layout import U8, U16, Blob, Field, RecordLayout
+from dqmj1_randomizer.randomize.patch import BytePatch, diff_bytes
 from dqmj1_randomizer.state import (
     BiasedByStatTotalMonsterShuffle,
     FullyRandomMonsterShuffle,
     MonsterRandomizationPolicyDefinition,
+    Monsters,
     State,
 )
 
 ENDIANESS: Literal["little"] = "little"
 
+BTL_ENMY_PRM_MAGIC = b"\x42\x45\x50\x54"
+BTL_ENMY_PRM_HEADER_STRUCT = struct.Struct("<4sI")
+
+ITEM_DROP_LAYOUT = RecordLayout(
+    [
+        Field("item_id", U16),
+        Field("chance_denominator_2_power", U16),
+    ]
+)
+ENEMY_SKILL_ENTRY_LAYOUT = RecordLayout(
+    [
+        Field("unknown_a", U16),
+        Field("skill_id", U16),
+    ]
+)
+# Layout of a single 88 byte entry. The fields are in the same order as in BtlEnmyPrmEntry.
+BTL_ENMY_PRM_ENTRY_LAYOUT = RecordLayout(
+    [
+        Field("species_id", U16),
+        Field("unknown_a", Blob(6)),
+        Field("skills", ENEMY_SKILL_ENTRY_LAYOUT, count=6),
+        Field("item_drops", ITEM_DROP_LAYOUT, count=2),
+        Field("gold", U16),
+        Field("unknown_b", Blob(2)),
+        Field("exp", U16),
+        Field("unknown_c", Blob(2)),
+        Field("level", U8),
+        Field("unknown_d", Blob(1)),
+        Field("unknown_e", U8),
+        Field("scout_chance", U8),
+        Field("max_hp", U16),
+        Field("max_mp", U16),
+        Field("attack", U16),
+        Field("defense", U16),
+        Field("agility", U16),
+        Field("wisdom", U16),
+        Field("unknown_f", Blob(20)),
+        Field("skill_set_ids", U8, count=3),
+        Field("unknown_g", Blob(1)),
+    ]
+)
+# Packs and unpacks entries with the skills, item drops, and skill set ids flattened out
+BTL_ENMY_PRM_ENTRY_STRUCT = BTL_ENMY_PRM_ENTRY_LAYOUT.struct
+# For columnar access to tables of entries
+BTL_ENMY_PRM_ENTRY_DTYPE = BTL_ENMY_PRM_ENTRY_LAYOUT.dtype
+
+ITEM_DROP_STRUCT = ITEM_DROP_LAYOUT.struct
+ENEMY_SKILL_ENTRY_STRUCT = ENEMY_SKILL_ENTRY_LAYOUT.struct
+
+
+class BtlEnmyPrmFlag(enum.IntFlag):
+    """
+    Per-entry flags from btl_enmy_prm_info.csv.
+    """
+
+    EXCLUDE = enum.auto()
+    GIFT_INCARNUS = enum.auto()
+    GIFT_MONSTER = enum.auto()
+    STARTER = enum.auto()
+    BOSS = enum.auto()
+    SWAP_DROP = enum.auto()
 
-def randomize_btl_enmy_prm(
-    state: State, input_stream: IO[bytes], output_stream: IO[bytes]
-) -> None:
-    random.seed(state.seed)
 
+BTL_ENMY_PRM_FLAG_COLUMNS = {
+    BtlEnmyPrmFlag.EXCLUDE: "exclude",
+    BtlEnmyPrmFlag.GIFT_INCARNUS: "is_gift_incarnus",
+    BtlEnmyPrmFlag.GIFT_MONSTER: "is_gift_monster",
+    BtlEnmyPrmFlag.STARTER: "is_starter",
+    BtlEnmyPrmFlag.BOSS: "is_boss",
+    BtlEnmyPrmFlag.SWAP_DROP: "swap_drop",
+}
+
+
+def compile_btl_enmy_prm_flags(data: pd.DataFrame) -> npt.NDArray[np.uint8]:
+    """
+    Compiles the "y" columns of btl_enmy_prm_info.csv into a BtlEnmyPrmFlag bitset per entry.
+    """
+    flags = np.zeros(len(data), dtype=np.uint8)
+    for flag, column in BTL_ENMY_PRM_FLAG_COLUMNS.items():
+        flags[(data[column] == "y").to_numpy()] |= np.uint8(flag)
+
+    return flags
+
+
+@functools.cache
+def load_btl_enmy_prm_flags() -> npt.NDArray[np.uint8]:
     info_filepath = data_path / "btl_enmy_prm_info.csv"
     logging.info(f"Loading BtlEnmyPrm info file: {info_filepath}")
-    data = pd.read_csv(info_filepath)
+    flags = compile_btl_enmy_prm_flags(pd.read_csv(info_filepath))
     logging.info("Successfully loaded BtlEnmyPrm info file.")
 
-    btl_enmy_prm = BtlEnmyPrm.from_bin(input_stream)
-    shuffle_btl_enmy_prm(state, data, btl_enmy_prm)
-    btl_enmy_prm.write_bin(output_stream)
+    # The flags are shared between runs, so make sure no one changes them
+    flags.flags.writeable = False
+    return flags
 
 
-def shuffle_btl_enmy_prm(
-    state: State, data: pd.DataFrame, btl_enmy_prm: "BtlEnmyPrm"
+def check_btl_enmy_prm_flags(
+    flags: npt.NDArray[np.uint8], btl_enmy_prm: "BtlEnmyPrmTable"
 ) -> None:
-    # Annotate with the row indices, so that we can use them later when setting the new values.
-    # Otherwise we would lose track of the indices because we filter when excluding specific
-    # entries from the shuffle.
-    entries_to_shuffle = [(i, entry) for i, entry in enumerate(btl_enmy_prm.entries)]
-
-    def filter_entries(condition: Callable[[int], bool]) -> None:
-        nonlocal entries_to_shuffle
-        entries_to_shuffle = [
-            (i, entry) for (i, entry) in entries_to_shuffle if condition(i)
-        ]
+    """
+    Makes sure that there are flags for exactly the entries of the table.
+    """
+    if len(flags) != len(btl_enmy_prm):
+        raise BtlEnmyPrmFlagsLengthMismatchError(len(flags), len(btl_enmy_prm))
 
-    filter_entries(lambda i: data["exclude"][i] != "y")
 
+def randomize_btl_enmy_prm(
+    state: State, input_stream: IO[bytes], output_stream: IO[bytes]
+) -> None:
+    rng = random.Random(state.seed)
+
+    flags = load_btl_enmy_prm_flags()
+
+    btl_enmy_prm = BtlEnmyPrmTable.from_bin(input_stream)
+    shuffle_btl_enmy_prm(state, flags, btl_enmy_prm, rng)
+    btl_enmy_prm.write_bin(output_stream)
+
+
+def btl_enmy_prm_patches(state: State, original_data: bytes) -> list[BytePatch]:
+    """
+    Randomizes the given BtlEnmyPrm.bin file, and returns the changed byte ranges instead of the
+    whole randomized file.
+    """
+    rng = random.Random(state.seed)
+
+    flags = load_btl_enmy_prm_flags()
+
+    btl_enmy_prm = BtlEnmyPrmTable.from_buffer(original_data)
+    shuffle_btl_enmy_prm(state, flags, btl_enmy_prm, rng)
+
+    return btl_enmy_prm.patches()
+
+
+def find_entries_to_shuffle(
+    monsters: Monsters, flags: npt.NDArray[np.uint8]
+) -> npt.NDArray[np.intp]:
+    """
+    Returns the indices of the entries that should be shuffled given the monster randomization
+    options.
+    """
     # Note: We always filter out the gift incarnus from randomization, because not having incarnus
     # can cause some cutscenes to crash. For more details see:
     #
     #  https://github.com/ExcaliburZero/dqmj1_randomizer/issues/4
-    filter_entries(lambda i: data["is_gift_incarnus"][i] != "y")
+    excluded = BtlEnmyPrmFlag.EXCLUDE | BtlEnmyPrmFlag.GIFT_INCARNUS
+
+    assert monsters.include_gift_monsters is not None
+    if not monsters.include_gift_monsters:
+        excluded |= BtlEnmyPrmFlag.GIFT_MONSTER
+
+    assert monsters.include_starters is not None
+    if not monsters.include_starters:
+        excluded |= BtlEnmyPrmFlag.STARTER
+
+    assert monsters.include_bosses is not None
+    if not monsters.include_bosses:
+        excluded |= BtlEnmyPrmFlag.BOSS
 
-    assert state.monsters.include_gift_monsters is not None
-    if not state.monsters.include_gift_monsters:
-        filter_entries(lambda i: data["is_gift_monster"][i] != "y")
+    return np.flatnonzero((flags & np.uint8(excluded)) == 0)
 
-    assert state.monsters.include_starters is not None
-    if not state.monsters.include_starters:
-        filter_entries(lambda i: data["is_starter"][i] != "y")
 
-    assert state.monsters.include_bosses is not None
-    if not state.monsters.include_bosses:
-        filter_entries(lambda i: data["is_boss"][i] != "y")
+def shuffle_btl_enmy_prm(
+    state: State,
+    flags: npt.NDArray[np.uint8],
+    btl_enmy_prm: "BtlEnmyPrmTable",
+    rng: random.Random,
+) -> None:
+    plan_btl_enmy_prm_shuffle(state, flags, btl_enmy_prm, rng).apply(btl_enmy_prm)
+
+
+def plan_btl_enmy_prm_shuffle(
+    state: State,
+    flags: npt.NDArray[np.uint8],
+    btl_enmy_prm: "BtlEnmyPrmTable",
+    rng: random.Random,
+) -> "BtlEnmyPrmShuffle":
+    check_btl_enmy_prm_flags(flags, btl_enmy_prm)
+    indices_to_shuffle = find_entries_to_shuffle(state.monsters, flags)
 
     logging.info(
-        f"Filtered down from {len(btl_enmy_prm.entries)} to {len(entries_to_shuffle)} BtlEnmyPtr entries to randomize."
+        f"Filtered down from {len(btl_enmy_prm)} to {len(indices_to_shuffle)} BtlEnmyPtr entries to randomize."
     )
 
-    shuffled_entries = entries_to_shuffle.copy()
     if state.monsters.randomization_policy is None:
         raise AssertionError
 
@@ -79,37 +216,113 @@ def shuffle_btl_enmy_prm(
         f"Randomizing monster encounters using policy: {state.monsters.randomization_policy}"
     )
     policy = MonsterRandomizationPolicy.build(state.monsters.randomization_policy)
-    policy.shuffle(shuffled_entries)
 
-    num_item_drops_swapped = 0
-    for (i, prev_entry), (i_2, new_entry) in zip(entries_to_shuffle, shuffled_entries):
-        btl_enmy_prm.entries[i] = copy.copy(new_entry)
+    # For each entry to shuffle, find the index of the original entry that replaces it
+    indices = indices_to_shuffle
+    order = policy.shuffle(btl_enmy_prm.simple_stat_totals[indices], rng)
+    sources = indices[order]
 
-        if state.monsters.transfer_boss_item_drops and (
-            data["swap_drop"][i] == "y" or data["swap_drop"][i_2] == "y"
-        ):
-            btl_enmy_prm.entries[i].item_drops = prev_entry.item_drops
-            if data["swap_drop"][i] == "y":
-                num_item_drops_swapped += 1
+    # Only entries that are replaced by a different entry need to be written
+    moved = sources != indices
+    indices = indices[moved]
+    sources = sources[moved]
 
-        if state.monsters.swap_scout_chance:
-            btl_enmy_prm.entries[i].scout_chance = prev_entry.scout_chance
+    overrides = {}
+    if state.monsters.transfer_boss_item_drops:
+        swap_drop = (flags & np.uint8(BtlEnmyPrmFlag.SWAP_DROP)) != 0
+        overrides["item_drops"] = indices[swap_drop[indices] | swap_drop[sources]]
 
-        if state.monsters.swap_experience_drops:
-            btl_enmy_prm.entries[i].exp = prev_entry.exp
+        num_item_drops_swapped = np.count_nonzero(swap_drop[indices_to_shuffle])
+        logging.info(f"Swapped item drops for {num_item_drops_swapped} entries.")
 
-        if state.monsters.swap_gold_drops:
-            btl_enmy_prm.entries[i].gold = prev_entry.gold
+    for swap, field_name in [
+        (state.monsters.swap_scout_chance, "scout_chance"),
+        (state.monsters.swap_experience_drops, "exp"),
+        (state.monsters.swap_gold_drops, "gold"),
+    ]:
+        if swap:
+            overrides[field_name] = indices
 
-    if state.monsters.transfer_boss_item_drops:
-        logging.info(f"Swapped item drops for {num_item_drops_swapped} entries.")
+    return BtlEnmyPrmShuffle(indices=indices, sources=sources, overrides=overrides)
+
+
+@dataclass(frozen=True, eq=False, slots=True)
+class BtlEnmyPrmShuffle:
+    """
+    A shuffle of BtlEnmyPrm entries, as a permutation plus per-field overrides.
+
+    Each entry in indices is replaced by the original entry at the same position in sources. The
+    overrides map field names to the replaced entries that keep their original value for that
+    field (ex. item drops of bosses).
+    """
+
+    indices: npt.NDArray[np.intp]
+    sources: npt.NDArray[np.intp]
+    overrides: dict[str, npt.NDArray[np.intp]]
+
+    def apply(self, btl_enmy_prm: "BtlEnmyPrmTable") -> None:
+        """
+        Writes the shuffle into the given table. Every value is gathered from the original
+        entries, so no entry objects are created, and data we have already overwritten is never
+        read.
+        """
+        original = btl_enmy_prm.original_records
+
+        btl_enmy_prm.set_records(self.indices, original[self.sources])
+        for field_name, indices in self.overrides.items():
+            btl_enmy_prm.set_field(field_name, indices, original[field_name][indices])
+
+
+def find_encounter_mappings(
+    state: State,
+    flags: npt.NDArray[np.uint8],
+    btl_enmy_prm: "BtlEnmyPrmTable",
+    seeds: Sequence[int],
+) -> npt.NDArray[np.intp]:
+    """
+    Returns, for each seed, the index of the original entry that randomize_btl_enmy_prm would put
+    in place of each entry. The result has one row per seed.
+    """
+    check_btl_enmy_prm_flags(flags, btl_enmy_prm)
+    indices_to_shuffle = find_entries_to_shuffle(state.monsters, flags)
+
+    if state.monsters.randomization_policy is None:
+        raise AssertionError
+
+    policy = MonsterRandomizationPolicy.build(state.monsters.randomization_policy)
+    permutations = policy.shuffle_batch(
+        btl_enmy_prm.simple_stat_totals[indices_to_shuffle], seeds
+    )
+
+    mappings = np.tile(np.arange(len(btl_enmy_prm), dtype=np.intp), (len(seeds), 1))
+    mappings[:, indices_to_shuffle] = indices_to_shuffle[permutations]
+    return mappings
 
 
 class MonsterRandomizationPolicy(abc.ABC):
     @abc.abstractmethod
-    def shuffle(self, entries: list[tuple[int, "BtlEnmyPrmEntry"]]) -> None:
+    def shuffle(
+        self, stat_totals: npt.NDArray[np.int64], rng: random.Random
+    ) -> npt.NDArray[np.intp]:
+        """
+        Returns a permutation of the given entries, such that the k-th entry is replaced by the
+        entry at position permutation[k].
+        """
         raise NotImplementedError
 
+    def shuffle_batch(
+        self, stat_totals: npt.NDArray[np.int64], seeds: Sequence[int]
+    ) -> npt.NDArray[np.intp]:
+        """
+        Returns the permutation that shuffle gives with random.Random(seed) for each of the given
+        seeds, as an array with one row per seed.
+        """
+        permutations = np.empty((len(seeds), len(stat_totals)), dtype=np.intp)
+        for k, seed in enumerate(seeds):
+            permutations[k] = self.shuffle(stat_totals, random.Random(seed))
+
+        return permutations
+
     @staticmethod
     def build(
         definition: MonsterRandomizationPolicyDefinition,
@@ -125,8 +338,13 @@ class MonsterRandomizationPolicy(abc.ABC):
 @dataclass(frozen=True)
 class FullyRandomShuffle(MonsterRandomizationPolicy):
     @override
-    def shuffle(self, entries: list[tuple[int, "BtlEnmyPrmEntry"]]) -> None:
-        random.shuffle(entries)
+    def shuffle(
+        self, stat_totals: npt.NDArray[np.int64], rng: random.Random
+    ) -> npt.NDArray[np.intp]:
+        permutation = list(range(len(stat_totals)))
+        rng.shuffle(permutation)
+
+        return np.array(permutation, dtype=np.intp)
 
 
 @dataclass(frozen=True)
@@ -159,51 +377,63 @@ class BiasedByStatTotalShuffle(MonsterRandomizationPolicy):
     leniency: int
 
     @override
-    def shuffle(self, entries: list[tuple[int, "BtlEnmyPrmEntry"]]) -> None:
-        previous_entries = entries.copy()
+    def shuffle(
+        self, stat_totals: npt.NDArray[np.int64], rng: random.Random
+    ) -> npt.NDArray[np.intp]:
+        low, high = self.jitter_range
+        jitter = np.array([[rng.uniform(low, high) for _ in range(len(stat_totals))]])
 
-        # Determine the new ordering
-        weighted_entries = [
-            (i, entry.simple_stat_total, (a, entry))
-            for i, (a, entry) in enumerate(entries)
-        ]
-        weighted_entries.sort(key=lambda a: a[1])
+        permutation: npt.NDArray[np.intp] = self.shuffle_with_jitter(
+            stat_totals, jitter
+        )[0]
+        return permutation
 
-        biased_weighted_entries = [
-            (
-                weight + random.uniform(-self.leniency / 2, self.leniency / 2),
-                entry,
-            )
-            for _, weight, entry in weighted_entries
-        ]
-        biased_weighted_entries.sort(key=lambda a: a[0])
+    @override
+    def shuffle_batch(
+        self, stat_totals: npt.NDArray[np.int64], seeds: Sequence[int]
+    ) -> npt.NDArray[np.intp]:
+        # Compute the same values that rng.uniform would give for each seed, all at once
+        low, high = self.jitter_range
+        jitter = low + (high - low) * python_random_samples(seeds, len(stat_totals))
 
-        # Apply the new ordering
-        for k, (_, entry) in enumerate(biased_weighted_entries):
-            entries[weighted_entries[k][0]] = entry
+        return self.shuffle_with_jitter(stat_totals, jitter)
+
+    @property
+    def jitter_range(self) -> tuple[float, float]:
+        return -self.leniency / 2, self.leniency / 2
+
+    def shuffle_with_jitter(
+        self, stat_totals: npt.NDArray[np.int64], jitter: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.intp]:
+        """
+        Returns one permutation per row of jitter, where jitter[k][i] is the amount to bias the
+        stat total of the entry with the i-th lowest stat total by.
+        """
+        # Determine the new orderings. Stable sorts are used so that ties keep their original
+        # order.
+        by_stat_total = np.argsort(stat_totals, kind="stable")
+        by_biased_stat_total = np.argsort(
+            stat_totals[by_stat_total] + jitter, axis=1, kind="stable"
+        )
+
+        permutations = np.empty(jitter.shape, dtype=np.intp)
+        permutations[:, by_stat_total] = by_stat_total[by_biased_stat_total]
 
         # Check that we obeyed the hard limit on stat total change
-        num_violations = 0
-        example_violation = None
-        max_abs_diff = 0
-        for (_, before), (_, after) in zip(previous_entries, entries):
-            abs_diff = abs(after.simple_stat_total - before.simple_stat_total)
-            max_abs_diff = max(max_abs_diff, abs_diff)
-            if abs_diff > self.leniency:
-                example_violation = (before, after)
-                num_violations += 1
-
-        if num_violations > 0:
-            if example_violation is None:
-                raise AssertionError
-
-            before, after = example_violation
+        abs_diffs = np.abs(stat_totals[permutations] - stat_totals)
+        violations = np.argwhere(abs_diffs > self.leniency)
+        max_abs_diff = abs_diffs.max(initial=0)
+
+        if len(violations) > 0:
+            k, i = violations[0]
+            before = stat_totals[i]
+            after = stat_totals[permutations[k, i]]
 
             logging.warning(
-                f"Found {num_violations} encounter table entries that were swapped with encounters that have more stat difference than expected."
+                f"Found {len(violations)} encounter table entries that were swapped with encounters that have more stat difference than expected."
             )
             logging.warning(
-                f"For example an encounter with a stat total of {before.simple_stat_total} was swapped with a stat total of {after.simple_stat_total}. {abs(after.simple_stat_total - before.simple_stat_total)} > {self.leniency}"
+                f"For example an encounter with a stat total of {before} was swapped with a stat total of {after}. {abs(after - before)} > {self.leniency}"
             )
 
         if max_abs_diff == 0:
@@ -211,44 +441,163 @@ class BiasedByStatTotalShuffle(MonsterRandomizationPolicy):
                 f"The max absolute stat total diff between shuffled encounters was {max_abs_diff}. It's likely the shuffling did not work correctly."
             )
 
+        return permutations
+
+
+def python_random_samples(
+    seeds: Sequence[int], num_samples: int
+) -> npt.NDArray[np.float64]:
+    """
+    Returns the first num_samples values that random.Random(seed).random gives, as an array with
+    one row per seed.
+
+    Python's random.Random and numpy's RandomState use the same Mersenne Twister generator, so
+    this copies the state of each random.Random into a RandomState and then samples all the
+    values at once.
+    """
+    # Seeded, since seeding a RandomState from the OS is slow and the state gets replaced anyway
+    random_state = np.random.RandomState(0)
+
+    samples = np.empty((len(seeds), num_samples))
+    for k, seed in enumerate(seeds):
+        _, internal_state, _ = random.Random(seed).getstate()
+        random_state.set_state(
+            (
+                "MT19937",
+                np.array(internal_state[:-1], dtype=np.uint32),
+                internal_state[-1],
+                0,
+                0.0,
+            )
+        )
+        samples[k] = random_state.random_sample(num_samples)
+
+    return samples
+
+
+class InvalidBtlEnmyPrmMagicError(ValueError):
+    def __init__(self, magic: bytes) -> None:
+        super().__init__(
+            f"Invalid BtlEnmyPrm magic {magic!r}, expected {BTL_ENMY_PRM_MAGIC!r}. Make sure the file is a BtlEnmyPrm.bin file."
+        )
+
+
+class TruncatedBtlEnmyPrmError(ValueError):
+    def __init__(self, expected_num_entries: int, actual_num_entries: int) -> None:
+        super().__init__(
+            f"BtlEnmyPrm header says it has {expected_num_entries} entries, but only {actual_num_entries} were found."
+        )
+
+
+class BtlEnmyPrmFlagsLengthMismatchError(ValueError):
+    def __init__(self, num_flags: int, num_entries: int) -> None:
+        super().__init__(
+            f"BtlEnmyPrm info has {num_flags} entries, but the BtlEnmyPrm table has {num_entries} entries. Make sure the ROM is of Dragon Quest Monsters Joker 1."
+        )
+
 
-@dataclass
+def parse_btl_enmy_prm_header(header: bytes | bytearray | memoryview) -> int:
+    """
+    Validates the header of a BtlEnmyPrm.bin file and returns the number of entries in it.
+    """
+    if len(header) < BTL_ENMY_PRM_HEADER_STRUCT.size:
+        raise InvalidBtlEnmyPrmMagicError(bytes(header))
+
+    magic, length = BTL_ENMY_PRM_HEADER_STRUCT.unpack_from(header)
+    if magic != BTL_ENMY_PRM_MAGIC:
+        raise InvalidBtlEnmyPrmMagicError(magic)
+
+    assert isinstance(length, int)
+    return length
+
+
+def read_btl_enmy_prm_entries(input_stream: IO[bytes]) -> bytes:
+    """
+    Reads the header of a BtlEnmyPrm.bin file, and then the bytes of all of its entries.
+    """
+    length = parse_btl_enmy_prm_header(
+        input_stream.read(BTL_ENMY_PRM_HEADER_STRUCT.size)
+    )
+
+    data = input_stream.read(length * BTL_ENMY_PRM_ENTRY_STRUCT.size)
+    if len(data) != length * BTL_ENMY_PRM_ENTRY_STRUCT.size:
+        raise TruncatedBtlEnmyPrmError(
+            length, len(data) // BTL_ENMY_PRM_ENTRY_STRUCT.size
+        )
+
+    return data
+
+
+def iter_btl_enmy_prm(
+    source: IO[bytes] | bytes | bytearray | memoryview, chunk_size: int = 64
+) -> Iterator["BtlEnmyPrmEntryView"]:
+    """
+    Yields views of the entries of a BtlEnmyPrm.bin file one at a time, without loading the whole
+    table.
+
+    Streams are read chunk_size entries at a time, so memory use does not depend on the size of
+    the table. Buffers are not copied at all. Each view only keeps its own chunk alive.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield from BtlEnmyPrmTable.from_buffer(source)
+        return
+
+    length = parse_btl_enmy_prm_header(source.read(BTL_ENMY_PRM_HEADER_STRUCT.size))
+
+    num_read = 0
+    while num_read < length:
+        num_to_read = min(chunk_size, length - num_read)
+        data = source.read(num_to_read * BTL_ENMY_PRM_ENTRY_STRUCT.size)
+        if len(data) != num_to_read * BTL_ENMY_PRM_ENTRY_STRUCT.size:
+            raise TruncatedBtlEnmyPrmError(
+                length, num_read + len(data) // BTL_ENMY_PRM_ENTRY_STRUCT.size
+            )
+
+        yield from BtlEnmyPrmTable(data)
+        num_read += num_to_read
+
+
+@dataclass(slots=True)
 class ItemDrop:
     item_id: int
     chance_denominator_2_power: int
 
     def write_bin(self, output_stream: IO[bytes]) -> None:
-        output_stream.write(self.item_id.to_bytes(2, ENDIANESS))
-        output_stream.write(self.chance_denominator_2_power.to_bytes(2, ENDIANESS))
+        output_stream.write(
+            ITEM_DROP_STRUCT.pack(self.item_id, self.chance_denominator_2_power)
+        )
 
     @staticmethod
     def from_bin(input_stream: IO[bytes]) -> "ItemDrop":
-        item_id = int.from_bytes(input_stream.read(2), ENDIANESS)
-        chance_denominator_2_power = int.from_bytes(input_stream.read(2), ENDIANESS)
+        item_id, chance_denominator_2_power = ITEM_DROP_STRUCT.unpack(
+            input_stream.read(ITEM_DROP_STRUCT.size)
+        )
 
         return ItemDrop(
             item_id=item_id, chance_denominator_2_power=chance_denominator_2_power
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class EnemySkillEntry:
     unknown_a: int
     skill_id: int
 
     def write_bin(self, output_stream: IO[bytes]) -> None:
-        output_stream.write(self.unknown_a.to_bytes(2, ENDIANESS))
-        output_stream.write(self.skill_id.to_bytes(2, ENDIANESS))
+        output_stream.write(
+            ENEMY_SKILL_ENTRY_STRUCT.pack(self.unknown_a, self.skill_id)
+        )
 
     @staticmethod
     def from_bin(input_stream: IO[bytes]) -> "EnemySkillEntry":
-        unknown_a = int.from_bytes(input_stream.read(2), ENDIANESS)
-        skill_id = int.from_bytes(input_stream.read(2), ENDIANESS)
+        unknown_a, skill_id = ENEMY_SKILL_ENTRY_STRUCT.unpack(
+            input_stream.read(ENEMY_SKILL_ENTRY_STRUCT.size)
+        )
 
         return EnemySkillEntry(unknown_a=unknown_a, skill_id=skill_id)
 
 
-@dataclass
+@dataclass(slots=True)
 class BtlEnmyPrmEntry:
     species_id: int
     unknown_a: bytes
@@ -277,104 +626,390 @@ class BtlEnmyPrmEntry:
         return self.attack + self.defense + self.agility + self.wisdom
 
     def write_bin(self, output_stream: IO[bytes]) -> None:
-        output_stream.write(self.species_id.to_bytes(2, ENDIANESS))
-        output_stream.write(self.unknown_a)
-        for skill in self.skills:
-            skill.write_bin(output_stream)
-        for item_drop in self.item_drops:
-            item_drop.write_bin(output_stream)
-        output_stream.write(self.gold.to_bytes(2, ENDIANESS))
-        output_stream.write(self.unknown_b)
-        output_stream.write(self.exp.to_bytes(2, ENDIANESS))
-        output_stream.write(self.unknown_c)
-        output_stream.write(self.level.to_bytes(1, ENDIANESS))
-        output_stream.write(self.unknown_d)
-        output_stream.write(self.unknown_e.to_bytes(1, ENDIANESS))
-        output_stream.write(self.scout_chance.to_bytes(1, ENDIANESS))
-        output_stream.write(self.max_hp.to_bytes(2, ENDIANESS))
-        output_stream.write(self.max_mp.to_bytes(2, ENDIANESS))
-        output_stream.write(self.attack.to_bytes(2, ENDIANESS))
-        output_stream.write(self.defense.to_bytes(2, ENDIANESS))
-        output_stream.write(self.agility.to_bytes(2, ENDIANESS))
-        output_stream.write(self.wisdom.to_bytes(2, ENDIANESS))
-        output_stream.write(self.unknown_f)
-        for skill_set_id in self.skill_set_ids:
-            output_stream.write(skill_set_id.to_bytes(1, ENDIANESS))
-        output_stream.write(self.unknown_g)
+        output_stream.write(BTL_ENMY_PRM_ENTRY_STRUCT.pack(*self.to_values()))
+
+    def pack_into(self, buffer: bytearray | memoryview, offset: int) -> None:
+        BTL_ENMY_PRM_ENTRY_STRUCT.pack_into(buffer, offset, *self.to_values())
+
+    def to_values(self) -> tuple[int | bytes, ...]:
+        """
+        Returns the values of the entry in the order of BTL_ENMY_PRM_ENTRY_STRUCT.
+        """
+        return (
+            self.species_id,
+            self.unknown_a,
+            *(v for skill in self.skills for v in (skill.unknown_a, skill.skill_id)),
+            *(
+                v
+                for item_drop in self.item_drops
+                for v in (item_drop.item_id, item_drop.chance_denominator_2_power)
+            ),
+            self.gold,
+            self.unknown_b,
+            self.exp,
+            self.unknown_c,
+            self.level,
+            self.unknown_d,
+            self.unknown_e,
+            self.scout_chance,
+            self.max_hp,
+            self.max_mp,
+            self.attack,
+            self.defense,
+            self.agility,
+            self.wisdom,
+            self.unknown_f,
+            *self.skill_set_ids,
+            self.unknown_g,
+        )
 
     @staticmethod
     def from_bin(input_stream: IO[bytes]) -> "BtlEnmyPrmEntry":
-        species_id = int.from_bytes(input_stream.read(2), ENDIANESS)
-
-        unknown_a = input_stream.read(6)
-        skills = [EnemySkillEntry.from_bin(input_stream) for _ in range(0, 6)]
-        item_drops = [ItemDrop.from_bin(input_stream) for _ in range(0, 2)]
-        gold = int.from_bytes(input_stream.read(2), ENDIANESS)
-        unknown_b = input_stream.read(2)
-        exp = int.from_bytes(input_stream.read(2), ENDIANESS)
-        unknown_c = input_stream.read(2)
-        level = int.from_bytes(input_stream.read(1), ENDIANESS)
-        unknown_d = input_stream.read(1)
-
-        unknown_e = int.from_bytes(input_stream.read(1), ENDIANESS)
-        scout_chance = int.from_bytes(input_stream.read(1), ENDIANESS)
-        max_hp = int.from_bytes(input_stream.read(2), ENDIANESS)
-        max_mp = int.from_bytes(input_stream.read(2), ENDIANESS)
-        attack = int.from_bytes(input_stream.read(2), ENDIANESS)
-        defense = int.from_bytes(input_stream.read(2), ENDIANESS)
-        agility = int.from_bytes(input_stream.read(2), ENDIANESS)
-        wisdom = int.from_bytes(input_stream.read(2), ENDIANESS)
-
-        unknown_f = input_stream.read(20)
-        skill_set_ids = [int.from_bytes(input_stream.read(1)) for _ in range(0, 3)]
-
-        unknown_g = input_stream.read(1)
+        return BtlEnmyPrmEntry.from_buffer(
+            input_stream.read(BTL_ENMY_PRM_ENTRY_STRUCT.size)
+        )
 
+    @staticmethod
+    def from_buffer(
+        buffer: bytes | bytearray | memoryview, offset: int = 0
+    ) -> "BtlEnmyPrmEntry":
+        return BtlEnmyPrmEntry.from_values(
+            BTL_ENMY_PRM_ENTRY_STRUCT.unpack_from(buffer, offset)
+        )
+
+    @staticmethod
+    def from_values(values: tuple[Any, ...]) -> "BtlEnmyPrmEntry":
+        """
+        Builds an entry from values in the order of BTL_ENMY_PRM_ENTRY_STRUCT.
+        """
         return BtlEnmyPrmEntry(
-            species_id=species_id,
-            unknown_a=unknown_a,
-            skills=skills,
-            item_drops=item_drops,
-            gold=gold,
-            unknown_b=unknown_b,
-            exp=exp,
-            unknown_c=unknown_c,
-            level=level,
-            unknown_d=unknown_d,
-            unknown_e=unknown_e,
-            scout_chance=scout_chance,
-            max_hp=max_hp,
-            max_mp=max_mp,
-            attack=attack,
-            defense=defense,
-            agility=agility,
-            wisdom=wisdom,
-            unknown_f=unknown_f,
-            skill_set_ids=skill_set_ids,
-            unknown_g=unknown_g,
+            species_id=values[0],
+            unknown_a=values[1],
+            skills=[EnemySkillEntry(values[i], values[i + 1]) for i in range(2, 14, 2)],
+            item_drops=[ItemDrop(values[i], values[i + 1]) for i in range(14, 18, 2)],
+            gold=values[18],
+            unknown_b=values[19],
+            exp=values[20],
+            unknown_c=values[21],
+            level=values[22],
+            unknown_d=values[23],
+            unknown_e=values[24],
+            scout_chance=values[25],
+            max_hp=values[26],
+            max_mp=values[27],
+            attack=values[28],
+            defense=values[29],
+            agility=values[30],
+            wisdom=values[31],
+            unknown_f=values[32],
+            skill_set_ids=list(values[33:36]),
+            unknown_g=values[36],
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class BtlEnmyPrm:
     entries: list[BtlEnmyPrmEntry]
 
     def write_bin(self, output_stream: IO[bytes]) -> None:
-        magic = b"\x42\x45\x50\x54"
+        buffer = bytearray(
+            BTL_ENMY_PRM_HEADER_STRUCT.size
+            + len(self.entries) * BTL_ENMY_PRM_ENTRY_STRUCT.size
+        )
 
-        output_stream.write(magic)
-        output_stream.write(len(self.entries).to_bytes(4, ENDIANESS))
+        BTL_ENMY_PRM_HEADER_STRUCT.pack_into(
+            buffer, 0, BTL_ENMY_PRM_MAGIC, len(self.entries)
+        )
+        offset = BTL_ENMY_PRM_HEADER_STRUCT.size
         for entry in self.entries:
-            entry.write_bin(output_stream)
+            entry.pack_into(buffer, offset)
+            offset += BTL_ENMY_PRM_ENTRY_STRUCT.size
+
+        output_stream.write(buffer)
 
     @staticmethod
     def from_bin(input_stream: IO[bytes]) -> "BtlEnmyPrm":
-        int.from_bytes(input_stream.read(4), ENDIANESS)
-        length = int.from_bytes(input_stream.read(4), ENDIANESS)
-
-        entries = [BtlEnmyPrmEntry.from_bin(input_stream) for _ in range(0, length)]
+        data = read_btl_enmy_prm_entries(input_stream)
+        entries = [
+            BtlEnmyPrmEntry.from_values(values)
+            for values in BTL_ENMY_PRM_ENTRY_STRUCT.iter_unpack(data)
+        ]
 
         return BtlEnmyPrm(entries)
 
+    def to_table(self) -> "BtlEnmyPrmTable":
+        output_stream = io.BytesIO()
+        self.write_bin(output_stream)
+        output_stream.seek(0)
+
+        return BtlEnmyPrmTable.from_bin(output_stream)
+
+    def to_pd(self) -> pd.DataFrame:
+        return self.to_table().to_pd()
+
+
+class BtlEnmyPrmTable:
+    """
+    Columnar representation of BtlEnmyPrm.bin, with one column per entry field.
+
+    The columns are fields of a numpy structured array with the same layout as the entries in the
+    file, so shuffles and field swaps can be done as whole-column permutations and gathers.
+
+    The table is backed by the buffer it was loaded from, without copying it. The first change
+    copies the buffer once, and only the changed entries are re-encoded into that copy. Changed
+    entries are tracked, see dirty_indices.
+    """
+
+    def __init__(self, original: bytes | bytearray | memoryview) -> None:
+        self.original = memoryview(original).toreadonly()
+        self.original_records: npt.NDArray[np.void] = np.frombuffer(
+            self.original, dtype=BTL_ENMY_PRM_ENTRY_DTYPE
+        )
+
+        self._buffer: bytearray | None = None
+        self._records = self.original_records
+        self._dirty = np.zeros(len(self.original_records), dtype=np.bool_)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, index: int) -> "BtlEnmyPrmEntryView":
+        return BtlEnmyPrmEntryView(self, range(len(self))[index])
+
+    def __iter__(self) -> Iterator["BtlEnmyPrmEntryView"]:
+        for index in range(len(self)):
+            yield BtlEnmyPrmEntryView(self, index)
+
+    @property
+    def records(self) -> npt.NDArray[np.void]:
+        """
+        The current entries. Read-only until the table has been changed, use set_records and
+        set_field to make changes.
+        """
+        return self._records
+
+    @property
+    def dirty_mask(self) -> npt.NDArray[np.bool_]:
+        return self._dirty
+
+    @property
+    def dirty_indices(self) -> npt.NDArray[np.intp]:
+        return np.flatnonzero(self._dirty)
+
+    @property
+    def simple_stat_totals(self) -> npt.NDArray[np.int64]:
+        records = self.records
+        stat_totals: npt.NDArray[np.int64] = (
+            records["attack"].astype(np.int64)
+            + records["defense"]
+            + records["agility"]
+            + records["wisdom"]
+        )
+        return stat_totals
+
+    def set_records(self, indices: npt.NDArray[np.intp], values: npt.ArrayLike) -> None:
+        self._make_writable()
+        self._records[indices] = values
+        self._dirty[indices] = True
+
+    def set_field(
+        self, field_name: str, indices: npt.NDArray[np.intp], values: npt.ArrayLike
+    ) -> None:
+        self._make_writable()
+        self._records[field_name][indices] = values
+        self._dirty[indices] = True
+
+    def entry_bytes(self, index: int) -> memoryview:
+        """
+        Returns a view of the bytes of the given entry.
+        """
+        buffer = self.original if self._buffer is None else memoryview(self._buffer)
+        start = index * BTL_ENMY_PRM_ENTRY_DTYPE.itemsize
+        return buffer[start : start + BTL_ENMY_PRM_ENTRY_DTYPE.itemsize]
+
+    def writable_entry_bytes(self, index: int) -> memoryview:
+        """
+        Returns a writable view of the bytes of the given entry, marking the entry as dirty.
+        """
+        self._make_writable()
+        self._dirty[index] = True
+        return self.entry_bytes(index)
+
+    def _make_writable(self) -> None:
+        if self._buffer is not None:
+            return
+
+        self._buffer = bytearray(self.original)
+        self._records = np.frombuffer(self._buffer, dtype=BTL_ENMY_PRM_ENTRY_DTYPE)
+
+    def write_bin(self, output_stream: IO[bytes]) -> None:
+        output_stream.write(
+            BTL_ENMY_PRM_HEADER_STRUCT.pack(BTL_ENMY_PRM_MAGIC, len(self))
+        )
+        output_stream.write(self.original if self._buffer is None else self._buffer)
+
+    def patches(self) -> list[BytePatch]:
+        """
+        Returns the byte ranges of the BtlEnmyPrm.bin file that have been changed, with offsets
+        relative to the start of the file.
+        """
+        if self._buffer is None:
+            return []
+
+        return diff_bytes(
+            self.original, self._buffer, offset=BTL_ENMY_PRM_HEADER_STRUCT.size
+        )
+
+    @staticmethod
+    def from_bin(input_stream: IO[bytes]) -> "BtlEnmyPrmTable":
+        return BtlEnmyPrmTable(read_btl_enmy_prm_entries(input_stream))
+
+    @staticmethod
+    def from_buffer(buffer: bytes | bytearray | memoryview) -> "BtlEnmyPrmTable":
+        """
+        Loads the table from the bytes of a BtlEnmyPrm.bin file without copying them.
+        """
+        buffer = memoryview(buffer)
+        length = parse_btl_enmy_prm_header(buffer[: BTL_ENMY_PRM_HEADER_STRUCT.size])
+
+        start = BTL_ENMY_PRM_HEADER_STRUCT.size
+        end = start + length * BTL_ENMY_PRM_ENTRY_DTYPE.itemsize
+        if len(buffer) < end:
+            raise TruncatedBtlEnmyPrmError(
+                length, (len(buffer) - start) // BTL_ENMY_PRM_ENTRY_DTYPE.itemsize
+            )
+
+        return BtlEnmyPrmTable(buffer[start:end])
+
+    def to_btl_enmy_prm(self) -> BtlEnmyPrm:
+        output_stream = io.BytesIO()
+        self.write_bin(output_stream)
+        output_stream.seek(0)
+
+        return BtlEnmyPrm.from_bin(output_stream)
+
     def to_pd(self) -> pd.DataFrame:
-        return pd.DataFrame(self.entries)
+        """
+        Returns a DataFrame with a column per field. Fields with multiple values (ex. skills,
+        unknown byte blobs) get a column per value (ex. "skills_0_skill_id", "unknown_a_0").
+
+        The columns are views of the records, so no data is copied.
+        """
+        columns: dict[str, npt.NDArray[Any]] = {}
+        for name in self.records.dtype.names or ():
+            column = self.records[name]
+            if column.ndim == 1:
+                columns[name] = column
+                continue
+
+            for k in range(column.shape[1]):
+                value_column = column[:, k]
+                if value_column.dtype.names is None:
+                    columns[f"{name}_{k}"] = value_column
+                else:
+                    for sub_name in value_column.dtype.names:
+                        columns[f"{name}_{k}_{sub_name}"] = value_column[sub_name]
+
+        return pd.DataFrame(columns, copy=False)
+
+
+T = TypeVar("T")
+
+
+class EntryViewField(Generic[T]):
+    """
+    Field of BtlEnmyPrmEntryView, which is decoded from the bytes of the entry on each access.
+    """
+
+    def __init__(
+        self,
+        decode: Callable[[tuple[Any, ...]], T] = lambda values: values[0],
+        encode: Callable[[T], tuple[Any, ...]] = lambda value: (value,),
+    ) -> None:
+        self.decode = decode
+        self.encode = encode
+        self.struct = struct.Struct("<")
+        self.offset = 0
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.struct = BTL_ENMY_PRM_ENTRY_LAYOUT.field_struct(name)
+        self.offset = BTL_ENMY_PRM_ENTRY_LAYOUT.offset(name)
+
+    def __get__(self, view: "BtlEnmyPrmEntryView", owner: type | None = None) -> T:
+        return self.decode(self.struct.unpack_from(view.raw, self.offset))
+
+    def __set__(self, view: "BtlEnmyPrmEntryView", value: T) -> None:
+        self.struct.pack_into(
+            view.table.writable_entry_bytes(view.index),
+            self.offset,
+            *self.encode(value),
+        )
+
+
+class BtlEnmyPrmEntryView:
+    """
+    Lazy view of an entry in a BtlEnmyPrmTable. Fields are only decoded when they are accessed,
+    and setting a field encodes it straight into the table and marks the entry as dirty.
+    """
+
+    __slots__ = ("index", "table")
+
+    species_id = EntryViewField[int]()
+    unknown_a = EntryViewField[bytes]()
+    skills = EntryViewField[list[EnemySkillEntry]](
+        decode=lambda values: [
+            EnemySkillEntry(values[i], values[i + 1]) for i in range(0, 12, 2)
+        ],
+        encode=lambda skills: tuple(
+            v for skill in skills for v in (skill.unknown_a, skill.skill_id)
+        ),
+    )
+    item_drops = EntryViewField[list[ItemDrop]](
+        decode=lambda values: [
+            ItemDrop(values[i], values[i + 1]) for i in range(0, 4, 2)
+        ],
+        encode=lambda item_drops: tuple(
+            v
+            for item_drop in item_drops
+            for v in (item_drop.item_id, item_drop.chance_denominator_2_power)
+        ),
+    )
+    gold = EntryViewField[int]()
+    unknown_b = EntryViewField[bytes]()
+    exp = EntryViewField[int]()
+    unknown_c = EntryViewField[bytes]()
+    level = EntryViewField[int]()
+    unknown_d = EntryViewField[bytes]()
+    unknown_e = EntryViewField[int]()
+    scout_chance = EntryViewField[int]()
+    max_hp = EntryViewField[int]()
+    max_mp = EntryViewField[int]()
+    attack = EntryViewField[int]()
+    defense = EntryViewField[int]()
+    agility = EntryViewField[int]()
+    wisdom = EntryViewField[int]()
+    unknown_f = EntryViewField[bytes]()
+    skill_set_ids = EntryViewField[list[int]](decode=list, encode=tuple)
+    unknown_g = EntryViewField[bytes]()
+
+    def __init__(self, table: BtlEnmyPrmTable, index: int) -> None:
+        self.table = table
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f"BtlEnmyPrmEntryView(index={self.index}, entry={self.to_entry()})"
+
+    @property
+    def raw(self) -> memoryview:
+        return self.table.entry_bytes(self.index)
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.table.dirty_mask[self.index])
+
+    @property
+    def simple_stat_total(self) -> int:
+        return self.attack + self.defense + self.agility + self.wisdom
+
+    def to_entry(self) -> BtlEnmyPrmEntry:
+        return BtlEnmyPrmEntry.from_buffer(self.raw)
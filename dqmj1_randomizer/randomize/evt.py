@@ -1,21 +1,60 @@
+import abc
+import bisect
 import collections
-import copy
 import csv
 import enum
+import functools
 import io
+import itertools
+import operator
 import os
 import pathlib
 import re
-from dataclasses import dataclass
+import struct
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
 from typing import IO, Any, Literal, Optional
 
 from dqmj1_randomizer.randomize.character_encoding import CharacterEncoding
+from dqmj1_randomizer.randomize.patch import BytePatch
 
 ENDIANESS: Literal["little"] = "little"
 
 STRING_END = 0xFF
 STRING_END_PADDING = 0xCC
 
+EVT_MAGIC = b"\x53\x43\x52\x00"
+# The magic is followed by a fixed size data block, and then the code
+EVT_CODE_START = 0x1004
+
+# Type id and length
+INSTRUCTION_HEADER_STRUCT = struct.Struct("<II")
+U32_STRUCT = struct.Struct("<I")
+
+# Splits a line of a script on spaces, but ignores spaces in quotes
+# https://stackoverflow.com/questions/2785755/how-to-split-but-ignore-separators-in-quoted-strings-in-python
+SCRIPT_TOKEN_REGEX = re.compile(r"""(?:[^ "']|"[^"]*"|'[^']*')+""")
+
+# Contents of a bytes literal written by bytes_repr, which can be decoded as hex
+HEX_ESCAPES_REGEX = re.compile(r"(?:\\x[0-9a-fA-F]{2})*")
+
+ESCAPE_REGEX = re.compile(
+    r"\\(x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|[0-7]{1,3}|.)", re.DOTALL
+)
+SIMPLE_ESCAPES = {
+    "\\": "\\",
+    "'": "'",
+    '"': '"',
+    "a": "\a",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+    "\n": "",
+}
+
 LabelDict = dict[str, int]
 
 
@@ -24,6 +63,18 @@ class UnrecognizedValueLocationNameError(ValueError):
         super().__init__(f'Unrecognized ValueLocation name: "{name}"')
 
 
+class ScriptLiteralParseError(ValueError):
+    def __init__(self, literal: str) -> None:
+        super().__init__(f"Failed to parse literal: {literal}")
+
+
+class ScriptLineOutsideSectionError(ValueError):
+    def __init__(self, line_number: int, line: str) -> None:
+        super().__init__(
+            f'Line {line_number} is not in a .data or .code section: "{line}"'
+        )
+
+
 class ArgumentType(enum.Enum):
     U32 = enum.auto()
     String = enum.auto()
@@ -68,7 +119,359 @@ class ValueLocation(enum.Enum):
 at = ArgumentType
 
 
-@dataclass
+class ArgumentsCodec(abc.ABC):
+    """
+    Decodes and encodes the arguments of instructions with the given argument types.
+
+    Each instruction type compiles the codec for its arguments once (see compile_codec), so that
+    reading and writing instructions does not need to check the type of each argument.
+    """
+
+    __slots__ = ("argument_types",)
+
+    def __init__(self, argument_types: tuple[ArgumentType, ...]) -> None:
+        self.argument_types = argument_types
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Codecs can contain structs, which cannot be pickled, so recompile them instead
+        return (type(self), (self.argument_types,))
+
+    @abc.abstractmethod
+    def decode(
+        self,
+        buffer: bytes,
+        start: int,
+        end: int,
+        character_encoding: CharacterEncoding,
+    ) -> tuple[tuple[Any, ...], LabelDict]:
+        """
+        Returns the arguments in buffer[start:end], along with the labels that they point to.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def length(
+        self, arguments: tuple[Any, ...], character_encoding: CharacterEncoding
+    ) -> int:
+        """
+        Returns the length in bytes of the given arguments when written to an evt file.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def pack_into(
+        self,
+        buffer: bytearray,
+        offset: int,
+        arguments: tuple[Any, ...],
+        labels: LabelDict,
+        character_encoding: CharacterEncoding,
+    ) -> int:
+        """
+        Writes the arguments into the buffer at the given offset, and returns the offset of the
+        end of the arguments.
+        """
+        raise NotImplementedError
+
+
+class NoArgumentsCodec(ArgumentsCodec):
+    __slots__ = ()
+
+    def decode(
+        self,
+        buffer: bytes,
+        start: int,
+        end: int,
+        character_encoding: CharacterEncoding,
+    ) -> tuple[tuple[Any, ...], LabelDict]:
+        return (), {}
+
+    def length(
+        self, arguments: tuple[Any, ...], character_encoding: CharacterEncoding
+    ) -> int:
+        return 0
+
+    def pack_into(
+        self,
+        buffer: bytearray,
+        offset: int,
+        arguments: tuple[Any, ...],
+        labels: LabelDict,
+        character_encoding: CharacterEncoding,
+    ) -> int:
+        return offset
+
+
+class WordsCodec(ArgumentsCodec):
+    """
+    Arguments that are all 4 byte words (U32, ValueLocation, and InstructionLocation), which are
+    read and written with a single struct.
+    """
+
+    __slots__ = ("instruction_location_indices", "struct", "value_location_indices")
+
+    def __init__(self, argument_types: tuple[ArgumentType, ...]) -> None:
+        super().__init__(argument_types)
+
+        assert all(t in WORD_ARGUMENT_TYPES for t in argument_types)
+        self.struct = struct.Struct(f"<{len(argument_types)}I")
+        self.value_location_indices = tuple(
+            i for i, t in enumerate(argument_types) if t == at.ValueLocation
+        )
+        self.instruction_location_indices = tuple(
+            i for i, t in enumerate(argument_types) if t == at.InstructionLocation
+        )
+
+    def decode(
+        self,
+        buffer: bytes,
+        start: int,
+        end: int,
+        character_encoding: CharacterEncoding,
+    ) -> tuple[tuple[Any, ...], LabelDict]:
+        values = self.struct.unpack_from(buffer, start)
+        if not self.value_location_indices and not self.instruction_location_indices:
+            return values, {}
+
+        arguments = list(values)
+        labels = {}
+        for i in self.value_location_indices:
+            arguments[i] = ValueLocation(values[i])
+        for i in self.instruction_location_indices:
+            label = f"0x{values[i]:x}"
+            labels[label] = values[i]
+            arguments[i] = label
+
+        return tuple(arguments), labels
+
+    def length(
+        self, arguments: tuple[Any, ...], character_encoding: CharacterEncoding
+    ) -> int:
+        return self.struct.size
+
+    def pack_into(
+        self,
+        buffer: bytearray,
+        offset: int,
+        arguments: tuple[Any, ...],
+        labels: LabelDict,
+        character_encoding: CharacterEncoding,
+    ) -> int:
+        if not self.value_location_indices and not self.instruction_location_indices:
+            self.struct.pack_into(buffer, offset, *arguments)
+            return offset + self.struct.size
+
+        values = list(arguments)
+        for i in self.value_location_indices:
+            values[i] = arguments[i].value
+        for i in self.instruction_location_indices:
+            values[i] = labels[arguments[i]]
+
+        self.struct.pack_into(buffer, offset, *values)
+        return offset + self.struct.size
+
+
+class BytesCodec(ArgumentsCodec):
+    """
+    A single argument of raw bytes that takes up all of the data of the instruction.
+    """
+
+    __slots__ = ()
+
+    def decode(
+        self,
+        buffer: bytes,
+        start: int,
+        end: int,
+        character_encoding: CharacterEncoding,
+    ) -> tuple[tuple[Any, ...], LabelDict]:
+        return (buffer[start:end],), {}
+
+    def length(
+        self, arguments: tuple[Any, ...], character_encoding: CharacterEncoding
+    ) -> int:
+        return len(arguments[0])
+
+    def pack_into(
+        self,
+        buffer: bytearray,
+        offset: int,
+        arguments: tuple[Any, ...],
+        labels: LabelDict,
+        character_encoding: CharacterEncoding,
+    ) -> int:
+        end = offset + len(arguments[0])
+        check_buffer_fits(buffer, end)
+
+        buffer[offset:end] = arguments[0]
+        return end
+
+
+class AsciiStringCodec(ArgumentsCodec):
+    """
+    A single null terminated latin-1 string, padded to a multiple of 4 bytes.
+    """
+
+    __slots__ = ()
+
+    def decode(
+        self,
+        buffer: bytes,
+        start: int,
+        end: int,
+        character_encoding: CharacterEncoding,
+    ) -> tuple[tuple[Any, ...], LabelDict]:
+        string_end = buffer.find(0x00, start, end)
+        if string_end == -1:
+            string_end = end
+
+        return (buffer[start:string_end].decode("latin-1"),), {}
+
+    def length(
+        self, arguments: tuple[Any, ...], character_encoding: CharacterEncoding
+    ) -> int:
+        return padded_length(len(arguments[0]) + 1)
+
+    def pack_into(
+        self,
+        buffer: bytearray,
+        offset: int,
+        arguments: tuple[Any, ...],
+        labels: LabelDict,
+        character_encoding: CharacterEncoding,
+    ) -> int:
+        return pack_padded_into(
+            buffer, offset, arguments[0].encode("latin-1") + b"\x00"
+        )
+
+
+class StringCodec(ArgumentsCodec):
+    """
+    A single string in the character encoding of the game, padded to a multiple of 4 bytes.
+    """
+
+    __slots__ = ()
+
+    def decode(
+        self,
+        buffer: bytes,
+        start: int,
+        end: int,
+        character_encoding: CharacterEncoding,
+    ) -> tuple[tuple[Any, ...], LabelDict]:
+        return (character_encoding.bytes_to_string(memoryview(buffer)[start:end]),), {}
+
+    def length(
+        self, arguments: tuple[Any, ...], character_encoding: CharacterEncoding
+    ) -> int:
+        return padded_length(len(character_encoding.string_to_bytes(arguments[0])))
+
+    def pack_into(
+        self,
+        buffer: bytearray,
+        offset: int,
+        arguments: tuple[Any, ...],
+        labels: LabelDict,
+        character_encoding: CharacterEncoding,
+    ) -> int:
+        return pack_padded_into(
+            buffer, offset, character_encoding.string_to_bytes(arguments[0])
+        )
+
+
+class GenericCodec(ArgumentsCodec):
+    """
+    Any other combination of argument types, which is handled one argument at a time.
+    """
+
+    __slots__ = ()
+
+    def decode(
+        self,
+        buffer: bytes,
+        start: int,
+        end: int,
+        character_encoding: CharacterEncoding,
+    ) -> tuple[tuple[Any, ...], LabelDict]:
+        arguments: list[Any] = []
+        labels: LabelDict = {}
+
+        current = start
+        for argument_type in self.argument_types:
+            argument, argument_labels = compile_codec((argument_type,)).decode(
+                buffer, current, end, character_encoding
+            )
+            arguments.extend(argument)
+            labels.update(argument_labels)
+
+            if argument_type in WORD_ARGUMENT_TYPES:
+                current += U32_STRUCT.size
+            else:
+                # Variable length arguments take up the rest of the data
+                current = end
+
+        return tuple(arguments), labels
+
+    def length(
+        self, arguments: tuple[Any, ...], character_encoding: CharacterEncoding
+    ) -> int:
+        data_length = 0
+        for argument, argument_type in zip(arguments, self.argument_types):
+            length = compile_codec((argument_type,)).length(
+                (argument,), character_encoding
+            )
+            if argument_type == at.Bytes:
+                # Bytes take up all of the data, see pack_into
+                data_length = length
+            else:
+                data_length += length
+
+        return data_length
+
+    def pack_into(
+        self,
+        buffer: bytearray,
+        offset: int,
+        arguments: tuple[Any, ...],
+        labels: LabelDict,
+        character_encoding: CharacterEncoding,
+    ) -> int:
+        position = offset
+        for argument, argument_type in zip(arguments, self.argument_types):
+            if argument_type == at.Bytes:
+                # Bytes take up all of the data, so they overwrite any earlier arguments
+                position = offset
+
+            position = compile_codec((argument_type,)).pack_into(
+                buffer, position, (argument,), labels, character_encoding
+            )
+
+        return position
+
+
+WORD_ARGUMENT_TYPES = (at.U32, at.ValueLocation, at.InstructionLocation)
+
+
+@functools.cache
+def compile_codec(argument_types: tuple[ArgumentType, ...]) -> ArgumentsCodec:
+    """
+    Returns the codec for instructions with the given argument types.
+    """
+    if len(argument_types) == 0:
+        return NoArgumentsCodec(argument_types)
+    elif all(t in WORD_ARGUMENT_TYPES for t in argument_types):
+        return WordsCodec(argument_types)
+    elif argument_types == (at.Bytes,):
+        return BytesCodec(argument_types)
+    elif argument_types == (at.AsciiString,):
+        return AsciiStringCodec(argument_types)
+    elif argument_types == (at.String,):
+        return StringCodec(argument_types)
+
+    return GenericCodec(argument_types)
+
+
+@dataclass(frozen=True, slots=True)
 class RawInstruction:
     instruction_type: int
     data: bytes
@@ -87,21 +490,31 @@ class RawInstruction:
         return RawInstruction(instruction_type=instruction_type, data=data)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class InstructionType:
+    """
+    Type of event instruction. There is one shared, immutable instance per type id, see
+    Instruction.get_instruction_type.
+    """
+
     type_id: int
     name: str
-    arguments: list[ArgumentType]
+    arguments: tuple[ArgumentType, ...]
+
+    codec: ArgumentsCodec = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "codec", compile_codec(self.arguments))
 
     @staticmethod
     def from_dict(d: dict[str, Any]) -> "InstructionType":
         type_id = int(d["Id"][2:], 16)
         name = d["Name"]
-        arguments = [
+        arguments = tuple(
             ArgumentType[arg.strip()]
             for arg in d["Arguments"][1:-1].split(",")
             if arg.strip() != ""
-        ]
+        )
 
         return InstructionType(
             type_id=type_id,
@@ -124,6 +537,15 @@ INSTRUCTION_TYPES_BY_TYPE = {
 INSTRUCTION_TYPES_BY_NAME = {cmd_type.name: cmd_type for cmd_type in INSTRUCTION_TYPES}
 
 
+@functools.cache
+def unknown_instruction_type(type_id: int) -> InstructionType:
+    """
+    Returns the shared instruction type for a type id that is not in the instruction types file,
+    which keeps the arguments of the instruction as raw bytes.
+    """
+    return InstructionType(type_id, "UNKNOWN", (at.Bytes,))
+
+
 class IncorrectInstructionSizeError(ValueError):
     def __init__(
         self,
@@ -171,6 +593,20 @@ class EvtInstructionParseError(ValueError):
         super().__init__(f"Failed to parse instruction at: 0x{position:x}")
 
 
+class EvtInstructionWriteError(ValueError):
+    def __init__(self, position: int, expected_end: int, actual_end: int) -> None:
+        super().__init__(
+            f"Failed to write instruction at: 0x{position:x}\nExpected it to end at 0x{expected_end:x}, but it ended at 0x{actual_end:x}"
+        )
+
+
+class EvtBufferOverflowError(ValueError):
+    def __init__(self, end: int, buffer_length: int) -> None:
+        super().__init__(
+            f"Tried to write up to 0x{end:x}, past the end of the buffer at 0x{buffer_length:x}"
+        )
+
+
 class NotOutputtedScriptLabelsError(ValueError):
     def __init__(self, unprinted_labels: set[str], position: int) -> None:
         super().__init__(
@@ -178,20 +614,61 @@ class NotOutputtedScriptLabelsError(ValueError):
         )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Instruction:
+    """
+    Immutable event instruction. Use replace() to get a modified copy of an instruction.
+
+    Since instructions cannot be changed, they can be shared between events and scripts instead
+    of being copied.
+    """
+
     instruction_type: InstructionType
-    arguments: list[Any]
+    arguments: tuple[Any, ...]
+
+    # (character encoding, length) of the last call to length()
+    _length: Optional[tuple[CharacterEncoding, int]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @property
     def type_id(self) -> int:
         return self.instruction_type.type_id
 
     def length(self, character_encoding: CharacterEncoding) -> int:
-        stream = io.BytesIO()
-        self.write_evt(stream, collections.defaultdict(lambda: 0), character_encoding)
+        """
+        Returns the length of the instruction in bytes when written to an evt file, including the
+        type id and length fields.
+        """
+        cached = self._length
+        if cached is not None and cached[0] is character_encoding:
+            return cached[1]
 
-        return len(stream.getbuffer())
+        length = self.compute_length(character_encoding)
+        object.__setattr__(self, "_length", (character_encoding, length))
+
+        return length
+
+    def replace(
+        self,
+        instruction_type: Optional[InstructionType] = None,
+        arguments: Optional[tuple[Any, ...]] = None,
+    ) -> "Instruction":
+        """
+        Returns a copy of the instruction with the given type and/or arguments replaced. Anything
+        not replaced is shared with the original instruction rather than copied.
+        """
+        return Instruction(
+            instruction_type=(
+                self.instruction_type if instruction_type is None else instruction_type
+            ),
+            arguments=self.arguments if arguments is None else arguments,
+        )
+
+    def compute_length(self, character_encoding: CharacterEncoding) -> int:
+        return INSTRUCTION_HEADER_STRUCT.size + self.instruction_type.codec.length(
+            self.arguments, character_encoding
+        )
 
     @staticmethod
     def from_evt(
@@ -229,7 +706,7 @@ class Instruction:
         if instruction_id in instructions_by_type:
             return instructions_by_type[instruction_id]
 
-        return InstructionType(instruction_id, "UNKNOWN", [at.Bytes])
+        return unknown_instruction_type(instruction_id)
 
     def write_evt(
         self,
@@ -237,59 +714,72 @@ class Instruction:
         labels: LabelDict,
         character_encoding: CharacterEncoding,
     ) -> None:
-        instruction_id_bytes = self.type_id.to_bytes(4, ENDIANESS)
+        buffer = bytearray(self.length(character_encoding))
+        self.pack_into(buffer, 0, labels, character_encoding)
 
-        data = []
-        for argument, argument_type in zip(
-            self.arguments, self.instruction_type.arguments
-        ):
-            if argument_type == at.Bytes:
-                data = list(argument)
-            elif argument_type == at.AsciiString:
-                for c in argument:
-                    data.append(ord(c))
-                data.append(0x00)
-
-                num_string_bytes = len(argument) + 1
-                num_padding_bytes = (
-                    0 if num_string_bytes % 4 == 0 else 4 - num_string_bytes % 4
-                )
-                for _ in range(0, num_padding_bytes):
-                    data.append(0xCC)
-            elif argument_type == at.U32:
-                for b in argument.to_bytes(4, ENDIANESS):
-                    data.append(b)
-            elif argument_type == at.ValueLocation:
-                assert isinstance(argument, ValueLocation)
-                for b in argument.value.to_bytes(4, ENDIANESS):
-                    data.append(b)
-            elif argument_type == at.InstructionLocation:
-                assert isinstance(argument, str)
-                position = labels[argument]
-
-                for b in position.to_bytes(4, ENDIANESS):
-                    data.append(b)
-            elif argument_type == at.String:
-                string_bytes = character_encoding.string_to_bytes(argument)
-                for b in string_bytes:
-                    data.append(b)
-
-                num_padding_bytes = (
-                    0 if len(string_bytes) % 4 == 0 else 4 - len(string_bytes) % 4
-                )
-                for _ in range(0, num_padding_bytes):
-                    data.append(0xCC)
-            else:
-                raise NotImplementedError(f"{argument_type}")
+        output_stream.write(buffer)
 
-        length = len(data) + 8
-        length_bytes = length.to_bytes(4, ENDIANESS)
+    def pack_into(
+        self,
+        buffer: bytearray,
+        offset: int,
+        labels: LabelDict,
+        character_encoding: CharacterEncoding,
+    ) -> int:
+        """
+        Writes the instruction into the buffer at the given offset, and returns the offset of the
+        end of the instruction.
+        """
+        length = self.length(character_encoding)
+        INSTRUCTION_HEADER_STRUCT.pack_into(
+            buffer, offset, self.instruction_type.type_id, length
+        )
+        position = self.instruction_type.codec.pack_into(
+            buffer,
+            offset + INSTRUCTION_HEADER_STRUCT.size,
+            self.arguments,
+            labels,
+            character_encoding,
+        )
 
-        data_bytes = bytearray(data)
+        if position != offset + length:
+            raise EvtInstructionWriteError(offset, offset + length, position)
 
-        output_stream.write(instruction_id_bytes)
-        output_stream.write(length_bytes)
-        output_stream.write(data_bytes)
+        return position
+
+    @staticmethod
+    def from_buffer(
+        buffer: bytes, offset: int, character_encoding: CharacterEncoding
+    ) -> Optional[tuple["Instruction", LabelDict, int]]:
+        """
+        Reads the instruction that starts at the given offset of the buffer. Returns the
+        instruction, the labels it points to, and the offset of the next instruction, or None if
+        there are no instructions left.
+        """
+        if len(buffer) - offset < U32_STRUCT.size:
+            return None
+
+        type_id, length = INSTRUCTION_HEADER_STRUCT.unpack_from(buffer, offset)
+        end = min(offset + length, len(buffer))
+
+        instruction, labels = Instruction.decode(
+            Instruction.get_instruction_type(type_id),
+            buffer,
+            offset + INSTRUCTION_HEADER_STRUCT.size,
+            end,
+            character_encoding,
+        )
+        if instruction.length(character_encoding) != end - offset:
+            raise IncorrectInstructionSizeError.from_data(
+                instruction,
+                character_encoding,
+                RawInstruction(
+                    instruction_type=type_id,
+                    data=buffer[offset + INSTRUCTION_HEADER_STRUCT.size : end],
+                ),
+            )
+
+        return instruction, labels, end
 
     @staticmethod
     def from_raw(
@@ -297,51 +787,29 @@ class Instruction:
         instruction_type: InstructionType,
         character_encoding: CharacterEncoding,
     ) -> Optional[tuple["Instruction", LabelDict]]:
-        arguments: list[Any] = []
-
-        labels = {}
+        return Instruction.decode(
+            instruction_type=instruction_type,
+            buffer=raw.data,
+            start=0,
+            end=len(raw.data),
+            character_encoding=character_encoding,
+        )
 
-        current = 0
-        for argument_type in instruction_type.arguments:
-            if argument_type == at.Bytes:
-                arguments.append(raw.data[current:])
-                current += len(raw.data)
-            elif argument_type == at.AsciiString:
-                string_bytes = raw.data[current:]
-                string_character_bytes = []
-                for b in string_bytes:
-                    if b == 0x00:
-                        break
-
-                    string_character_bytes.append(b)
-
-                arguments.append("".join(chr(b) for b in string_character_bytes))
-                current += len(string_bytes)
-            elif argument_type == at.String:
-                string = character_encoding.bytes_to_string(raw.data[current:])
-
-                arguments.append(string)
-                current += len(raw.data)
-            elif argument_type == at.U32:
-                value = int.from_bytes(raw.data[current : current + 4], ENDIANESS)
-
-                arguments.append(value)
-                current += 4
-            elif argument_type == at.ValueLocation:
-                value = int.from_bytes(raw.data[current : current + 4], ENDIANESS)
-
-                arguments.append(ValueLocation(value))
-                current += 4
-            elif argument_type == at.InstructionLocation:
-                value = int.from_bytes(raw.data[current : current + 4], ENDIANESS)
-
-                label = f"0x{value:x}"
-                labels[label] = value
-
-                arguments.append(label)
-                current += 4
-            else:
-                raise AssertionError(f"Unhandled arg type: {argument_type}")  # noqa: TRY003
+    @staticmethod
+    def decode(
+        instruction_type: InstructionType,
+        buffer: bytes,
+        start: int,
+        end: int,
+        character_encoding: CharacterEncoding,
+    ) -> tuple["Instruction", LabelDict]:
+        """
+        Decodes the arguments of an instruction from buffer[start:end], without copying the data
+        of the instruction.
+        """
+        arguments, labels = instruction_type.codec.decode(
+            buffer, start, end, character_encoding
+        )
 
         return (
             Instruction(instruction_type=instruction_type, arguments=arguments),
@@ -350,29 +818,18 @@ class Instruction:
 
     @staticmethod
     def from_script(line: str) -> Optional["Instruction"]:
-        # Split on spaces, but ignore spaces in quotes
-        # https://stackoverflow.com/questions/2785755/how-to-split-but-ignore-separators-in-quoted-strings-in-python
-        pattern = re.compile(r"""((?:[^ "']|"[^"]*"|'[^']*')+)""")
-
-        parts = pattern.split(line.strip())
-        parts = [p for p in parts if len(p.strip()) > 0]
-
-        instruction_name = parts[0]
-        instruction_type = Instruction.get_instruction_type_by_name(instruction_name)
+        parts = SCRIPT_TOKEN_REGEX.findall(line.strip())
 
-        arguments: list[Any] = []
-        for i, arg_type in enumerate(instruction_type.arguments):
-            try:
-                if arg_type == at.ValueLocation:
-                    arguments.append(ValueLocation.from_script(parts[i + 1]))
-                elif arg_type == at.InstructionLocation:
-                    arguments.append(parts[i + 1])
-                else:
-                    arguments.append(eval(parts[i + 1]))
-            except IndexError as e:
-                raise ScriptInstructionParseIndexError(i + 1, parts) from e
+        instruction_type, argument_parsers = script_instruction_parsers(parts[0])
+        if len(parts) <= len(argument_parsers):
+            raise ScriptInstructionParseIndexError(len(parts), parts)
 
-        return Instruction(instruction_type=instruction_type, arguments=arguments)
+        return Instruction(
+            instruction_type=instruction_type,
+            arguments=tuple(
+                [parse(part) for parse, part in zip(argument_parsers, parts[1:])]
+            ),
+        )
 
     def to_script(self) -> str:
         stream = io.StringIO()
@@ -422,52 +879,234 @@ class Instruction:
         return INSTRUCTION_TYPES_BY_NAME
 
 
-def bytes_repr(bs: bytes) -> str:
+def padded_length(length: int) -> int:
+    """
+    Returns the given length rounded up to a multiple of 4, which strings are padded to.
+    """
+    return length + (-length % 4)
+
+
+def check_buffer_fits(buffer: bytearray, end: int) -> None:
+    """
+    Makes sure that a write up to the given end stays within the buffer, since slice assignment
+    past the end of a bytearray silently grows it instead of failing.
+    """
+    if end > len(buffer):
+        raise EvtBufferOverflowError(end, len(buffer))
+
+
+def pack_padded_into(buffer: bytearray, offset: int, bs: bytes) -> int:
+    """
+    Writes the bytes into the buffer at the given offset, padded to a multiple of 4 bytes, and
+    returns the offset of the end of the padding.
+    """
+    end = offset + len(bs)
+    padded_end = offset + padded_length(len(bs))
+    check_buffer_fits(buffer, padded_end)
+
+    buffer[offset:end] = bs
+    buffer[end:padded_end] = bytes([STRING_END_PADDING]) * (padded_end - end)
+
+    return padded_end
+
+
+def bytes_repr(bs: bytes | memoryview) -> str:
     return 'b"' + "".join([f"\\x{b:02x}" for b in bs]) + '"'
 
 
-@dataclass
+def parse_int_literal(literal: str) -> int:
+    """
+    Parses an integer literal, ex. "0x1f" or "31".
+    """
+    try:
+        value = int(literal, 0)
+    except ValueError as e:
+        raise ScriptLiteralParseError(literal) from e
+
+    # Integer arguments are written as unsigned 32 bit values
+    if not 0 <= value <= 0xFFFFFFFF:
+        raise ScriptLiteralParseError(literal)
+
+    return value
+
+
+def parse_string_literal(literal: str) -> str:
+    """
+    Parses a quoted string literal, handling the same escape sequences as Python.
+    """
+    if len(literal) < 2 or literal[0] not in "\"'" or literal[-1] != literal[0]:
+        raise ScriptLiteralParseError(literal)
+
+    return unescape(literal[1:-1], allow_unicode_escapes=True)
+
+
+def parse_bytes_literal(literal: str) -> bytes:
+    """
+    Parses a bytes literal, ex. b"\\x01\\x02", handling the same escape sequences as Python.
+    """
+    if (
+        len(literal) < 3
+        or literal[0] != "b"
+        or literal[1] not in "\"'"
+        or literal[-1] != literal[1]
+    ):
+        raise ScriptLiteralParseError(literal)
+
+    contents = literal[2:-1]
+
+    # Bytes written by bytes_repr are all hex escapes, so they can be decoded in one go
+    if HEX_ESCAPES_REGEX.fullmatch(contents):
+        return bytes.fromhex(contents.replace("\\x", ""))
+
+    if not contents.isascii():
+        raise ScriptLiteralParseError(literal)
+
+    return unescape(contents, allow_unicode_escapes=False).encode("latin-1")
+
+
+def unescape(contents: str, allow_unicode_escapes: bool) -> str:
+    """
+    Replaces the escape sequences in the contents of a string or bytes literal with the
+    characters they stand for.
+    """
+    if "\\" not in contents:
+        return contents
+
+    def replace(match: re.Match[str]) -> str:
+        escape = match.group(1)
+        if escape[0] in "01234567":
+            value = int(escape, 8)
+            return chr(value if allow_unicode_escapes else value & 0xFF)
+        elif len(escape) == 1:
+            # Unrecognized escapes are left as-is, like Python does
+            return SIMPLE_ESCAPES.get(escape, "\\" + escape)
+        elif escape[0] == "x" or (escape[0] in "uU" and allow_unicode_escapes):
+            return chr(int(escape[1:], 16))
+
+        # Unicode escapes are not supported in bytes literals
+        return "\\" + escape
+
+    return ESCAPE_REGEX.sub(replace, contents)
+
+
+SCRIPT_ARGUMENT_PARSERS: dict[ArgumentType, Callable[[str], Any]] = {
+    at.U32: parse_int_literal,
+    at.String: parse_string_literal,
+    at.AsciiString: parse_string_literal,
+    at.Bytes: parse_bytes_literal,
+    at.ValueLocation: ValueLocation.from_script,
+    at.InstructionLocation: str,
+}
+
+
+@functools.cache
+def script_instruction_parsers(
+    instruction_name: str,
+) -> tuple[InstructionType, tuple[Callable[[str], Any], ...]]:
+    """
+    Returns the instruction type with the given name, along with the functions to parse each of
+    its arguments from a script.
+    """
+    instruction_type = Instruction.get_instruction_type_by_name(instruction_name)
+
+    return instruction_type, tuple(
+        SCRIPT_ARGUMENT_PARSERS[argument_type]
+        for argument_type in instruction_type.arguments
+    )
+
+
+@dataclass(slots=True)
 class Script:
     entries: list[Instruction | str]
-    data: bytes
+    data: bytes | memoryview
 
     def to_event(self, character_encoding: CharacterEncoding) -> "Event":
         instructions = []
-        labels = {}
-        position = 0x0
+        label_indices = {}
         for entry in self.entries:
             if isinstance(entry, Instruction):
-                instructions.append(copy.deepcopy(entry))
-                position += entry.length(character_encoding)
+                instructions.append(entry)
             else:
-                labels[entry] = position
+                label_indices[entry] = len(instructions)
 
-        return Event(instructions=instructions, data=self.data, labels=labels)
+        event = Event(instructions=instructions, data=self.data, labels={})
+        offsets = event.instruction_offsets(character_encoding)
+        event.labels = {label: offsets[i] for label, i in label_indices.items()}
 
+        return event
 
-@dataclass
+
+@dataclass(slots=True)
 class Event:
     instructions: list[Instruction]
-    data: bytes
+    data: bytes | memoryview
     labels: LabelDict
 
+    # (instructions, character encoding, offsets) of the last call to instruction_offsets(), so
+    # that the offsets are recomputed if any instruction is added, removed, or replaced.
+    # Instructions are immutable, so comparing them by identity is enough.
+    _offsets: Optional[tuple[tuple[Instruction, ...], CharacterEncoding, list[int]]] = (
+        field(default=None, init=False, repr=False, compare=False)
+    )
+
     @property
     def labels_by_position(self) -> dict[int, str]:
         return {pos: label for label, pos in self.labels.items()}
 
+    def instruction_offsets(self, character_encoding: CharacterEncoding) -> list[int]:
+        """
+        Returns the offset of the start of each instruction relative to the start of the code,
+        followed by the offset of the end of the code.
+        """
+        cached = self._offsets
+        if (
+            cached is not None
+            and cached[1] is character_encoding
+            and len(cached[0]) == len(self.instructions)
+            and all(map(operator.is_, cached[0], self.instructions))
+        ):
+            return cached[2]
+
+        offsets = list(
+            itertools.accumulate(
+                (
+                    instruction.length(character_encoding)
+                    for instruction in self.instructions
+                ),
+                initial=0x0,
+            )
+        )
+        self._offsets = (tuple(self.instructions), character_encoding, offsets)
+
+        return offsets
+
+    def get_instruction_index_at_ptr(
+        self, pointer: int, character_encoding: CharacterEncoding
+    ) -> Optional[int]:
+        """
+        Returns the index of the instruction that starts at the given offset relative to the start
+        of the code, if there is one.
+        """
+        offsets = self.instruction_offsets(character_encoding)
+
+        index = bisect.bisect_left(offsets, pointer)
+        if index < len(self.instructions) and offsets[index] == pointer:
+            return index
+
+        return None
+
     def to_script(self, character_encoding: CharacterEncoding) -> Script:
         entries: list[Instruction | str] = []
 
         labels_by_position = self.labels_by_position
 
-        position = 0x0
-        for instruction in self.instructions:
+        offsets = self.instruction_offsets(character_encoding)
+        for instruction, position in zip(self.instructions, offsets):
             if position in labels_by_position:
                 label = labels_by_position[position]
                 entries.append(label)
 
-            entries.append(copy.deepcopy(instruction))
-            position += instruction.length(character_encoding)
+            entries.append(instruction)
 
         return Script(entries=entries, data=self.data)
 
@@ -475,23 +1114,31 @@ class Event:
     def from_evt(
         input_stream: IO[bytes], character_encoding: CharacterEncoding
     ) -> "Event":
-        input_stream.read(4)
-        data = input_stream.read(0x1004 - 4)
+        return Event.from_buffer(input_stream.read(), character_encoding)
+
+    @staticmethod
+    def from_buffer(buffer: bytes, character_encoding: CharacterEncoding) -> "Event":
+        """
+        Parses the bytes of an evt file. The data of the event is a view of the buffer rather than
+        a copy.
+        """
+        data = memoryview(buffer)[len(EVT_MAGIC) : EVT_CODE_START]
 
         instructions = []
         labels = {}
+        offset = EVT_CODE_START
         while True:
             try:
-                result = Instruction.from_evt(input_stream, character_encoding)
+                result = Instruction.from_buffer(buffer, offset, character_encoding)
             except Exception as e:
-                position = input_stream.tell()
-                raise EvtInstructionParseError(position) from e
+                raise EvtInstructionParseError(offset) from e
             if result is None:
                 break
 
-            instruction, new_labels = result
+            instruction, new_labels, offset = result
             instructions.append(instruction)
-            labels.update(new_labels)
+            if new_labels:
+                labels.update(new_labels)
 
         return Event(instructions=instructions, data=data, labels=labels)
 
@@ -499,12 +1146,11 @@ class Event:
     def from_script(
         input_stream: IO[str], character_encoding: CharacterEncoding
     ) -> "Event":
-        data: Optional[Any] = None
+        data: Optional[bytes] = None
         instructions: list[Instruction] = []
-        labels: LabelDict = {}
-        current_section: Optional[str]
-        current_instruction_ptr = 0x0
-        for line in input_stream:
+        label_indices: dict[str, int] = {}
+        current_section: Optional[str] = None
+        for line_number, line in enumerate(input_stream, start=1):
             line = line.strip()
             if line == "":
                 continue
@@ -520,29 +1166,31 @@ class Event:
 
             if line.endswith(":"):
                 label_name = line[:-1]
-                assert label_name not in labels
+                assert label_name not in label_indices
 
-                labels[label_name] = current_instruction_ptr
+                label_indices[label_name] = len(instructions)
                 continue
 
             if current_section == "data":
                 assert line.startswith('b"')
 
-                data = eval(line)
+                data = parse_bytes_literal(line)
                 continue
             elif current_section == "code":
                 instruction = Instruction.from_script(line)
                 assert instruction is not None
 
                 instructions.append(instruction)
-                current_instruction_ptr += instruction.length(character_encoding)
             else:
-                raise AssertionError
+                raise ScriptLineOutsideSectionError(line_number, line)
 
         assert data is not None
-        assert isinstance(data, bytes)
 
-        return Event(data=data, instructions=instructions, labels=labels)
+        event = Event(data=data, instructions=instructions, labels={})
+        offsets = event.instruction_offsets(character_encoding)
+        event.labels = {label: offsets[i] for label, i in label_indices.items()}
+
+        return event
 
     def write_script(
         self, output_stream: IO[str], character_encoding: CharacterEncoding
@@ -557,8 +1205,8 @@ class Event:
         output_stream.write(".code:\n")
 
         outputted_labels = []
-        position = 0x0
-        for instruction in self.instructions:
+        offsets = self.instruction_offsets(character_encoding)
+        for instruction, position in zip(self.instructions, offsets):
             if position in labels_by_position:
                 label = labels_by_position[position]
                 output_stream.write(f"  {label}:\n")
@@ -566,32 +1214,222 @@ class Event:
                 outputted_labels.append(label)
 
             output_stream.write(f"    {instruction.to_script()}\n")
-            position += instruction.length(character_encoding)
 
         assert len(outputted_labels) == len(set(outputted_labels))
         if len(outputted_labels) != len(self.labels):
             unprinted_labels = set(self.labels) - set(outputted_labels)
-            raise NotOutputtedScriptLabelsError(unprinted_labels, position)
+            raise NotOutputtedScriptLabelsError(unprinted_labels, offsets[-1])
 
     def write_evt(
         self, output_stream: IO[bytes], character_encoding: CharacterEncoding
     ) -> None:
-        output_stream.write(b"\x53\x43\x52\x00")
-        output_stream.write(self.data)
+        output_stream.write(self.to_evt(character_encoding))
+
+    def to_evt(self, character_encoding: CharacterEncoding) -> bytearray:
+        """
+        Returns the bytes of the event as an evt file. The whole file is written into a single
+        buffer of the right size.
+
+        The lengths of the instructions are taken from the instructions themselves rather than
+        from instruction_offsets(), and each instruction is checked to end where it should.
+        """
+        code_start = len(EVT_MAGIC) + len(self.data)
+        code_length = sum(
+            instruction.length(character_encoding) for instruction in self.instructions
+        )
+
+        buffer = bytearray(code_start + code_length)
+        buffer[0 : len(EVT_MAGIC)] = EVT_MAGIC
+        buffer[len(EVT_MAGIC) : code_start] = self.data
+
+        offset = code_start
         for instruction in self.instructions:
-            instruction.write_evt(output_stream, self.labels, character_encoding)
+            offset = instruction.pack_into(
+                buffer, offset, self.labels, character_encoding
+            )
+
+        return buffer
 
     def get_instruction_at_ptr(
         self, pointer: int, character_encoding: CharacterEncoding
     ) -> Optional[Instruction]:
-        start = 0x1004
-        offsetted_pointer = pointer + start
+        index = self.get_instruction_index_at_ptr(pointer, character_encoding)
+        if index is None:
+            return None
 
-        current_location = start
-        for instruction in self.instructions:
-            if current_location == offsetted_pointer:
-                return instruction
+        return self.instructions[index]
 
-            current_location += instruction.length(character_encoding)
 
-        return None
+class LazyEvent:
+    """
+    Event that only reads the headers (type id, offset, and length) of its instructions up front.
+
+    The arguments of an instruction are only decoded the first time it is accessed, and
+    instructions that are never accessed or replaced are written back out as their original bytes.
+    This is useful when only the types of the instructions are needed, ex. to find and replace
+    specific instructions.
+
+    Like Event, pointers to instructions are not updated when instructions change size.
+    """
+
+    def __init__(self, buffer: bytes, character_encoding: CharacterEncoding) -> None:
+        self.buffer = buffer
+        self.character_encoding = character_encoding
+        self.data = memoryview(buffer)[len(EVT_MAGIC) : EVT_CODE_START]
+        self.labels: LabelDict = {}
+
+        self.type_ids: list[int] = []
+        self.offsets: list[int] = []
+        self.lengths: list[int] = []
+
+        for offset, type_id, length in scan_instruction_headers(buffer):
+            self.type_ids.append(type_id)
+            self.offsets.append(offset)
+            self.lengths.append(length)
+
+        self._instructions: dict[int, Instruction] = {}
+
+    def __len__(self) -> int:
+        return len(self.type_ids)
+
+    def __getitem__(self, index: int) -> Instruction:
+        """
+        Returns the instruction at the given index, decoding it if it has not been yet.
+        """
+        index = range(len(self))[index]
+
+        instruction = self._instructions.get(index)
+        if instruction is None:
+            try:
+                result = Instruction.from_buffer(
+                    self.buffer, self.offsets[index], self.character_encoding
+                )
+            except Exception as e:
+                raise EvtInstructionParseError(self.offsets[index]) from e
+            assert result is not None
+
+            instruction, labels, _ = result
+            self.labels.update(labels)
+            self._instructions[index] = instruction
+
+        return instruction
+
+    def __setitem__(self, index: int, instruction: Instruction) -> None:
+        """
+        Replaces the instruction at the given index. Any labels that the new instruction points to
+        must be in labels.
+        """
+        self._instructions[range(len(self))[index]] = instruction
+
+    def instruction_type(self, index: int) -> InstructionType:
+        return Instruction.get_instruction_type(self.type_ids[index])
+
+    def instruction_data(self, index: int) -> memoryview:
+        """
+        Returns a view of the original bytes of the arguments of the instruction at the given
+        index.
+        """
+        start = self.offsets[index] + INSTRUCTION_HEADER_STRUCT.size
+        end = self.offsets[index] + self.lengths[index]
+        return memoryview(self.buffer)[start:end]
+
+    def is_decoded(self, index: int) -> bool:
+        return index in self._instructions
+
+    def to_event(self) -> Event:
+        """
+        Decodes all of the instructions into an Event.
+        """
+        instructions = [self[i] for i in range(len(self))]
+
+        return Event(instructions=instructions, data=self.data, labels=self.labels)
+
+    def write_evt(self, output_stream: IO[bytes]) -> None:
+        output_stream.write(self.to_evt())
+
+    def to_evt(self) -> bytearray:
+        """
+        Returns the bytes of the event as an evt file. Instructions that were never accessed or
+        replaced are copied over from the original bytes.
+        """
+        code_start = len(EVT_MAGIC) + len(self.data)
+
+        lengths = list(self.lengths)
+        for index, instruction in self._instructions.items():
+            lengths[index] = instruction.length(self.character_encoding)
+
+        original = memoryview(self.buffer)
+        if lengths == self.lengths:
+            # No sizes changed, so only the decoded instructions need to be written
+            buffer = bytearray(original[: code_start + sum(lengths)])
+            for index, instruction in self._instructions.items():
+                instruction.pack_into(
+                    buffer, self.offsets[index], self.labels, self.character_encoding
+                )
+
+            return buffer
+
+        buffer = bytearray(code_start + sum(lengths))
+        buffer[:code_start] = original[:code_start]
+
+        offset = code_start
+        for index, length in enumerate(lengths):
+            decoded = self._instructions.get(index)
+            if decoded is None:
+                start = self.offsets[index]
+                buffer[offset : offset + length] = original[start : start + length]
+            else:
+                decoded.pack_into(buffer, offset, self.labels, self.character_encoding)
+
+            offset += length
+
+        return buffer
+
+    @staticmethod
+    def from_evt(
+        input_stream: IO[bytes], character_encoding: CharacterEncoding
+    ) -> "LazyEvent":
+        return LazyEvent(input_stream.read(), character_encoding)
+
+    @staticmethod
+    def from_buffer(
+        buffer: bytes, character_encoding: CharacterEncoding
+    ) -> "LazyEvent":
+        return LazyEvent(buffer, character_encoding)
+
+
+def scan_instruction_headers(buffer: bytes) -> Iterator[tuple[int, int, int]]:
+    """
+    Yields the offset, type id, and length of each instruction in the given evt file, reading
+    only the instruction headers.
+    """
+    offset = EVT_CODE_START
+    while len(buffer) - offset >= U32_STRUCT.size:
+        try:
+            type_id, length = INSTRUCTION_HEADER_STRUCT.unpack_from(buffer, offset)
+        except struct.error as e:
+            raise EvtInstructionParseError(offset) from e
+        if length < INSTRUCTION_HEADER_STRUCT.size or offset + length > len(buffer):
+            raise EvtInstructionParseError(offset)
+
+        yield offset, type_id, length
+
+        offset += length
+
+
+def instruction_type_patches(
+    buffer: bytes, old_type_id: int, new_type_id: int
+) -> list[BytePatch]:
+    """
+    Returns patches that change the type id of every instruction of the old type to the new type,
+    ex. to disable instructions by replacing them with a nop.
+
+    Only the 4 byte type id of each instruction is overwritten, so the new type must read the same
+    arguments as the old one (or ignore them). Instruction sizes and pointers are unchanged.
+    """
+    new_type_id_bytes = U32_STRUCT.pack(new_type_id)
+    return [
+        BytePatch(offset, new_type_id_bytes)
+        for offset, type_id, _ in scan_instruction_headers(buffer)
+        if type_id == old_type_id
+    ]
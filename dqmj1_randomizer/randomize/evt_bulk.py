@@ -0,0 +1,390 @@
+import concurrent.futures
+import hashlib
+import io
+import json
+import logging
+import pathlib
+from collections.abc import Callable, Iterator, Mapping
+from dataclasses import dataclass, field
+from typing import Optional
+
+import ndspy.rom
+
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt import Event
+
+MANIFEST_FILENAME = "manifest.json"
+BUILD_MANIFEST_FILENAME = "build_manifest.json"
+BUILD_DIRECTORY_NAME = ".build"
+SCRIPT_SUFFIX = ".script"
+
+# Increase this when the script format changes, so that existing scripts are rewritten
+SCRIPT_FORMAT_VERSION = 1
+
+# Filename -> {"evt": hash of the evt file, "script": hash of the script file}
+Manifest = dict[str, dict[str, str]]
+
+
+class EventWorkerError(ValueError):
+    """
+    Error from converting an event in a worker process, or from running the worker itself (ex. if
+    it was killed). Only keeps the message of the original error, since errors that take other
+    arguments cannot be sent back from the workers.
+    """
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+
+    @staticmethod
+    def from_error(error: Exception) -> "EventWorkerError":
+        return EventWorkerError(f"{type(error).__name__}: {error}")
+
+
+@dataclass
+class DisassembleResult:
+    """
+    Filenames of the events that were written, skipped because their scripts were already up to
+    date, or that failed to disassemble (along with the error).
+    """
+
+    written: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class AssembleResult:
+    """
+    The assembled .evt files (by filename), along with the filenames of the events that were
+    compiled, skipped because they were already up to date in the build directory, or that failed
+    to compile (along with the error).
+    """
+
+    evt_files: dict[str, bytes] = field(default_factory=dict)
+    compiled: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+def disassemble_rom_events(
+    rom: ndspy.rom.NintendoDSRom,
+    output_directory: pathlib.Path,
+    character_encoding_name: str,
+    max_workers: Optional[int] = None,
+) -> DisassembleResult:
+    """
+    Disassembles all of the .evt files in the ROM into script files in the output directory. See
+    disassemble_events.
+    """
+    evt_files = {
+        filename: rom.getFileByName(filename)
+        for filename in rom.filenames.files
+        if filename.endswith(".evt")
+    }
+
+    return disassemble_events(
+        evt_files, output_directory, character_encoding_name, max_workers
+    )
+
+
+def disassemble_events(
+    evt_files: Mapping[str, bytes],
+    output_directory: pathlib.Path,
+    character_encoding_name: str,
+    max_workers: Optional[int] = None,
+) -> DisassembleResult:
+    """
+    Disassembles the given .evt files (by filename) into script files in the output directory,
+    using a pool of worker processes. Each script is written as soon as its worker finishes.
+
+    A manifest of the hashes of the evt and script files is kept in the output directory, and
+    events whose evt file and script file both match the manifest are skipped.
+
+    The scripts of events that fail to disassemble, or that are in the manifest but not in the
+    given evt files, are deleted so that they are not assembled again.
+    """
+    manifest_filepath = output_directory / MANIFEST_FILENAME
+    manifest = load_manifest(manifest_filepath, character_encoding_name)
+    new_manifest: Manifest = {}
+    result = DisassembleResult()
+
+    for filename in manifest.keys() - evt_files.keys():
+        get_script_filepath(output_directory, filename).unlink(missing_ok=True)
+
+    to_disassemble = {}
+    for filename, data in evt_files.items():
+        evt_hash = hash_bytes(data)
+
+        entry = manifest.get(filename)
+        if entry is not None and entry["evt"] == evt_hash:
+            script_filepath = get_script_filepath(output_directory, filename)
+            if (
+                script_filepath.exists()
+                and hash_bytes(script_filepath.read_bytes()) == entry["script"]
+            ):
+                new_manifest[filename] = entry
+                result.skipped.append(filename)
+                continue
+
+        to_disassemble[filename] = (data, evt_hash)
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    try:
+        for filename, script in run_in_workers(
+            disassemble_event,
+            {filename: data for filename, (data, _) in to_disassemble.items()},
+            character_encoding_name,
+            max_workers,
+        ):
+            if isinstance(script, EventWorkerError):
+                logging.warning(f"Failed to disassemble {filename}: {script}")
+                result.failed[filename] = str(script)
+                get_script_filepath(output_directory, filename).unlink(missing_ok=True)
+                continue
+
+            script_filepath = get_script_filepath(output_directory, filename)
+            script_filepath.parent.mkdir(parents=True, exist_ok=True)
+            script_filepath.write_bytes(script)
+
+            new_manifest[filename] = {
+                "evt": to_disassemble[filename][1],
+                "script": hash_bytes(script),
+            }
+            result.written.append(filename)
+    finally:
+        # Written even if disassembly is interrupted, so that finished scripts are not redone
+        write_manifest(manifest_filepath, character_encoding_name, new_manifest)
+
+    return result
+
+
+def assemble_rom_events(
+    rom: ndspy.rom.NintendoDSRom,
+    script_directory: pathlib.Path,
+    character_encoding_name: str,
+    max_workers: Optional[int] = None,
+    build_directory: Optional[pathlib.Path] = None,
+) -> AssembleResult:
+    """
+    Assembles the script files in the script directory and writes the resulting .evt files into
+    the ROM. See assemble_events.
+    """
+    result = assemble_events(
+        script_directory, character_encoding_name, max_workers, build_directory
+    )
+
+    for filename, data in result.evt_files.items():
+        rom.setFileByName(filename, data)
+
+    return result
+
+
+def assemble_events(
+    script_directory: pathlib.Path,
+    character_encoding_name: str,
+    max_workers: Optional[int] = None,
+    build_directory: Optional[pathlib.Path] = None,
+) -> AssembleResult:
+    """
+    Assembles all of the script files in the script directory (ex. from disassemble_events) into
+    .evt files, using a pool of worker processes.
+
+    The assembled .evt files are kept in the build directory (by default a directory within the
+    script directory) along with a build manifest of the hashes of the script and evt files, so
+    that only scripts that changed since the last build are recompiled.
+    """
+    if build_directory is None:
+        build_directory = script_directory / BUILD_DIRECTORY_NAME
+
+    manifest_filepath = build_directory / BUILD_MANIFEST_FILENAME
+    manifest = load_manifest(manifest_filepath, character_encoding_name)
+    new_manifest: Manifest = {}
+    result = AssembleResult()
+
+    to_assemble = {}
+    for script_filepath in sorted(script_directory.rglob(f"*{SCRIPT_SUFFIX}")):
+        filename = get_evt_filename(script_directory, script_filepath)
+        script = script_filepath.read_bytes()
+        script_hash = hash_bytes(script)
+
+        entry = manifest.get(filename)
+        if entry is not None and entry["script"] == script_hash:
+            evt_filepath = get_evt_filepath(build_directory, filename)
+            if evt_filepath.exists():
+                data = evt_filepath.read_bytes()
+                if hash_bytes(data) == entry["evt"]:
+                    new_manifest[filename] = entry
+                    result.evt_files[filename] = data
+                    result.skipped.append(filename)
+                    continue
+
+        to_assemble[filename] = (script, script_hash)
+
+    build_directory.mkdir(parents=True, exist_ok=True)
+    try:
+        for filename, evt_data in run_in_workers(
+            assemble_event,
+            {filename: script for filename, (script, _) in to_assemble.items()},
+            character_encoding_name,
+            max_workers,
+        ):
+            if isinstance(evt_data, EventWorkerError):
+                logging.warning(f"Failed to assemble {filename}: {evt_data}")
+                result.failed[filename] = str(evt_data)
+                continue
+
+            evt_filepath = get_evt_filepath(build_directory, filename)
+            evt_filepath.parent.mkdir(parents=True, exist_ok=True)
+            evt_filepath.write_bytes(evt_data)
+
+            new_manifest[filename] = {
+                "evt": hash_bytes(evt_data),
+                "script": to_assemble[filename][1],
+            }
+            result.evt_files[filename] = evt_data
+            result.compiled.append(filename)
+    finally:
+        # Written even if assembly is interrupted, so that finished events are not redone
+        write_manifest(manifest_filepath, character_encoding_name, new_manifest)
+
+    return result
+
+
+def run_in_workers(
+    function: Callable[[bytes, str], bytes],
+    inputs: Mapping[str, bytes],
+    character_encoding_name: str,
+    max_workers: Optional[int],
+) -> Iterator[tuple[str, bytes | EventWorkerError]]:
+    """
+    Runs the function on each of the inputs (by filename) in a pool of worker processes. Yields
+    the filename and the output (or error) of each input as soon as its worker finishes.
+    """
+    if len(inputs) == 0:
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        try:
+            futures = {
+                executor.submit(function, data, character_encoding_name): filename
+                for filename, data in inputs.items()
+            }
+
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    output = future.result()
+                except EventWorkerError as e:
+                    yield futures[future], e
+                    continue
+                except Exception as e:
+                    # ex. BrokenProcessPool if a worker died, which fails each remaining input
+                    # rather than stopping the whole run
+                    yield futures[future], EventWorkerError.from_error(e)
+                    continue
+
+                yield futures[future], output
+        finally:
+            # Don't wait for the remaining inputs if we are stopped early
+            executor.shutdown(cancel_futures=True)
+
+
+def disassemble_event(data: bytes, character_encoding_name: str) -> bytes:
+    """
+    Returns the script of the given .evt file, encoded as UTF-8.
+
+    Runs in the worker processes, so it takes and returns plain bytes rather than Events, which
+    keep views of their input data that cannot be sent between processes.
+    """
+    character_encoding = CHARACTER_ENCODINGS[character_encoding_name]
+
+    output_stream = io.StringIO()
+    try:
+        event = Event.from_buffer(data, character_encoding)
+        event.write_script(output_stream, character_encoding)
+    except Exception as e:
+        # Any error from a malformed event is reported as a failure of that event, see
+        # assemble_event
+        raise EventWorkerError.from_error(e) from e
+
+    return output_stream.getvalue().encode("utf-8")
+
+
+def assemble_event(script: bytes, character_encoding_name: str) -> bytes:
+    """
+    Returns the .evt file of the given script, which is encoded as UTF-8.
+
+    Runs in the worker processes, see disassemble_event.
+    """
+    character_encoding = CHARACTER_ENCODINGS[character_encoding_name]
+
+    try:
+        event = Event.from_script(
+            io.StringIO(script.decode("utf-8")), character_encoding
+        )
+        return bytes(event.to_evt(character_encoding))
+    except Exception as e:
+        # Scripts are edited by hand, so any error (ex. a struct.error from an argument that does
+        # not fit its type) is reported as a failure of this script rather than stopping the build
+        raise EventWorkerError.from_error(e) from e
+
+
+def get_script_filepath(output_directory: pathlib.Path, filename: str) -> pathlib.Path:
+    return output_directory / pathlib.PurePosixPath(filename).with_suffix(SCRIPT_SUFFIX)
+
+
+def get_evt_filename(
+    script_directory: pathlib.Path, script_filepath: pathlib.Path
+) -> str:
+    """
+    Returns the filename of the event in the ROM for the given script file. Inverse of
+    get_script_filepath.
+    """
+    return script_filepath.relative_to(script_directory).with_suffix(".evt").as_posix()
+
+
+def get_evt_filepath(build_directory: pathlib.Path, filename: str) -> pathlib.Path:
+    return build_directory / pathlib.PurePosixPath(filename)
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_manifest(
+    manifest_filepath: pathlib.Path, character_encoding_name: str
+) -> Manifest:
+    """
+    Returns the manifest in the given file, or an empty manifest if there is not a usable one, ex.
+    if it was written with a different script format version or character encoding.
+    """
+    if not manifest_filepath.exists():
+        return {}
+
+    try:
+        with manifest_filepath.open("r", encoding="utf-8") as input_stream:
+            contents = json.load(input_stream)
+    except json.JSONDecodeError:
+        logging.warning(f"Ignoring invalid manifest: {manifest_filepath}")
+        return {}
+
+    if (
+        contents.get("version") != SCRIPT_FORMAT_VERSION
+        or contents.get("character_encoding") != character_encoding_name
+    ):
+        return {}
+
+    files: Manifest = contents["files"]
+    return files
+
+
+def write_manifest(
+    manifest_filepath: pathlib.Path, character_encoding_name: str, manifest: Manifest
+) -> None:
+    contents = {
+        "version": SCRIPT_FORMAT_VERSION,
+        "character_encoding": character_encoding_name,
+        "files": dict(sorted(manifest.items())),
+    }
+
+    with manifest_filepath.open("w", encoding="utf-8") as output_stream:
+        json.dump(contents, output_stream, indent=4)
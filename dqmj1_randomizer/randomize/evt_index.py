@@ -0,0 +1,355 @@
+import hashlib
+import json
+import logging
+import pathlib
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import ndspy.rom
+
+from dqmj1_randomizer.randomize.character_encoding import (
+    CHARACTER_ENCODINGS,
+    CharacterEncoding,
+)
+from dqmj1_randomizer.randomize.evt import (
+    INSTRUCTION_HEADER_STRUCT,
+    ArgumentType,
+    Instruction,
+    scan_instruction_headers,
+)
+
+INDEX_SUFFIX = ".evt_index.json"
+
+# Increase this when the index format changes, so that existing indexes are rebuilt
+INDEX_FORMAT_VERSION = 2
+
+INDEXED_ARGUMENT_TYPES = (
+    ArgumentType.String,
+    ArgumentType.AsciiString,
+    ArgumentType.InstructionLocation,
+)
+
+
+@dataclass(frozen=True)
+class InstructionReference:
+    filename: str
+    offset: int
+    type_id: int
+
+
+@dataclass(frozen=True)
+class StringReference:
+    filename: str
+    offset: int
+    string: str
+
+
+@dataclass
+class FileIndex:
+    """
+    The instructions of a single .evt file, along with their decoded string arguments and jump
+    targets (as stored in the instructions). Offsets are of the start of each instruction within
+    the file.
+    """
+
+    evt_hash: str
+    offsets: list[int]
+    type_ids: list[int]
+    strings: list[tuple[int, str]]
+    jumps: list[tuple[int, int]]
+
+    @staticmethod
+    def from_evt(
+        data: bytes, evt_hash: str, character_encoding: CharacterEncoding
+    ) -> "FileIndex":
+        """
+        Indexes the given .evt file, whose sha256 hash is evt_hash. Only the instructions that have
+        string or instruction location arguments are decoded, the rest are read from their headers.
+        """
+        file_index = FileIndex(
+            evt_hash=evt_hash,
+            offsets=[],
+            type_ids=[],
+            strings=[],
+            jumps=[],
+        )
+
+        for offset, type_id, length in scan_instruction_headers(data):
+            file_index.offsets.append(offset)
+            file_index.type_ids.append(type_id)
+
+            instruction_type = Instruction.get_instruction_type(type_id)
+            if not any(t in INDEXED_ARGUMENT_TYPES for t in instruction_type.arguments):
+                continue
+
+            instruction, labels = Instruction.decode(
+                instruction_type,
+                data,
+                offset + INSTRUCTION_HEADER_STRUCT.size,
+                offset + length,
+                character_encoding,
+            )
+            for argument_type, argument in zip(
+                instruction_type.arguments, instruction.arguments
+            ):
+                if argument_type == ArgumentType.InstructionLocation:
+                    file_index.jumps.append((offset, labels[argument]))
+                elif argument_type in INDEXED_ARGUMENT_TYPES:
+                    file_index.strings.append((offset, argument))
+
+        return file_index
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "evt_hash": self.evt_hash,
+            "offsets": self.offsets,
+            "type_ids": self.type_ids,
+            "strings": self.strings,
+            "jumps": self.jumps,
+        }
+
+    @staticmethod
+    def from_json(contents: dict[str, Any]) -> "FileIndex":
+        return FileIndex(
+            evt_hash=contents["evt_hash"],
+            offsets=contents["offsets"],
+            type_ids=contents["type_ids"],
+            strings=[(offset, string) for offset, string in contents["strings"]],
+            jumps=[(offset, target) for offset, target in contents["jumps"]],
+        )
+
+
+@dataclass
+class FailedFile:
+    """
+    A .evt file that could not be indexed, along with the error. Kept in the index so that the
+    file is not retried until its contents change.
+    """
+
+    evt_hash: str
+    error: str
+
+    def to_json(self) -> dict[str, Any]:
+        return {"evt_hash": self.evt_hash, "error": self.error}
+
+    @staticmethod
+    def from_json(contents: dict[str, Any]) -> "FailedFile":
+        return FailedFile(evt_hash=contents["evt_hash"], error=contents["error"])
+
+
+class EventIndex:
+    """
+    Index of the instructions of many .evt files (by filename), for finding the events that use a
+    given instruction type, string, or jump target without parsing every event.
+
+    Can be saved to and loaded from a file, and when rebuilt only the events whose contents changed
+    are reindexed. Events that fail to be indexed are kept in failed (by filename) rather than in
+    files.
+    """
+
+    def __init__(
+        self,
+        files: dict[str, FileIndex],
+        failed: Optional[dict[str, FailedFile]] = None,
+    ) -> None:
+        self.files = files
+        self.failed = failed if failed is not None else {}
+
+        # Type id -> filename -> offsets of the instructions of that type
+        self.offsets_by_type_id: dict[int, dict[str, list[int]]] = {}
+        for filename, file_index in files.items():
+            for offset, type_id in zip(file_index.offsets, file_index.type_ids):
+                self.offsets_by_type_id.setdefault(type_id, {}).setdefault(
+                    filename, []
+                ).append(offset)
+
+    @staticmethod
+    def build(
+        evt_files: Mapping[str, bytes],
+        character_encoding: CharacterEncoding,
+        previous: Optional["EventIndex"] = None,
+    ) -> "EventIndex":
+        """
+        Indexes the given .evt files (by filename). Files that have the same contents as in the
+        previous index (if given) are not reindexed, including ones that previously failed.
+
+        The previous index must have been built with the same character encoding.
+        """
+        previous_files = previous.files if previous is not None else {}
+        previous_failed = previous.failed if previous is not None else {}
+
+        files = {}
+        failed = {}
+        for filename, data in evt_files.items():
+            evt_hash = hashlib.sha256(data).hexdigest()
+
+            file_index = previous_files.get(filename)
+            if file_index is not None and file_index.evt_hash == evt_hash:
+                files[filename] = file_index
+                continue
+
+            failed_file = previous_failed.get(filename)
+            if failed_file is not None and failed_file.evt_hash == evt_hash:
+                failed[filename] = failed_file
+                continue
+
+            try:
+                files[filename] = FileIndex.from_evt(data, evt_hash, character_encoding)
+            except Exception as e:
+                # One malformed event should not stop the rest from being indexed, see
+                # evt_bulk.disassemble_events
+                logging.warning(f"Failed to index {filename}: {e}")
+                failed[filename] = FailedFile(evt_hash, f"{type(e).__name__}: {e}")
+
+        return EventIndex(files, failed)
+
+    def instructions(
+        self, type_id: Optional[int] = None, filename: Optional[str] = None
+    ) -> list[InstructionReference]:
+        """
+        Returns the instructions of the given type and/or in the given file, in order of filename
+        and offset.
+        """
+        if type_id is None:
+            filenames = sorted(self.files) if filename is None else [filename]
+            return [
+                InstructionReference(name, offset, instruction_type_id)
+                for name in filenames
+                for offset, instruction_type_id in zip(
+                    self.files[name].offsets, self.files[name].type_ids
+                )
+            ]
+
+        offsets_by_filename = self.offsets_by_type_id.get(type_id, {})
+        if filename is not None:
+            offsets_by_filename = {filename: offsets_by_filename.get(filename, [])}
+
+        return [
+            InstructionReference(name, offset, type_id)
+            for name, offsets in sorted(offsets_by_filename.items())
+            for offset in offsets
+        ]
+
+    def filenames_with_instruction(self, type_id: int) -> list[str]:
+        return sorted(self.offsets_by_type_id.get(type_id, {}))
+
+    def find_strings(self, substring: str) -> list[StringReference]:
+        """
+        Returns the string arguments that contain the given substring, in order of filename and
+        offset.
+        """
+        return [
+            StringReference(filename, offset, string)
+            for filename, file_index in sorted(self.files.items())
+            for offset, string in file_index.strings
+            if substring in string
+        ]
+
+    def jumps_to(self, filename: str, target: int) -> list[int]:
+        """
+        Returns the offsets of the instructions in the given file that jump to the given target.
+        """
+        return [
+            offset
+            for offset, jump_target in self.files[filename].jumps
+            if jump_target == target
+        ]
+
+    @staticmethod
+    def load(
+        index_filepath: pathlib.Path, character_encoding_name: str
+    ) -> Optional["EventIndex"]:
+        """
+        Returns the index in the given file, or None if there is not a usable one, ex. if it was
+        written with a different index format version or character encoding.
+        """
+        if not index_filepath.exists():
+            return None
+
+        try:
+            with index_filepath.open("r", encoding="utf-8") as input_stream:
+                contents = json.load(input_stream)
+        except json.JSONDecodeError:
+            logging.warning(f"Ignoring invalid event index: {index_filepath}")
+            return None
+
+        if (
+            contents.get("version") != INDEX_FORMAT_VERSION
+            or contents.get("character_encoding") != character_encoding_name
+        ):
+            return None
+
+        return EventIndex(
+            {
+                filename: FileIndex.from_json(file_contents)
+                for filename, file_contents in contents["files"].items()
+            },
+            {
+                filename: FailedFile.from_json(failed_contents)
+                for filename, failed_contents in contents["failed"].items()
+            },
+        )
+
+    def save(self, index_filepath: pathlib.Path, character_encoding_name: str) -> None:
+        contents = {
+            "version": INDEX_FORMAT_VERSION,
+            "character_encoding": character_encoding_name,
+            "files": {
+                filename: file_index.to_json()
+                for filename, file_index in sorted(self.files.items())
+            },
+            "failed": {
+                filename: failed_file.to_json()
+                for filename, failed_file in sorted(self.failed.items())
+            },
+        }
+
+        with index_filepath.open("w", encoding="utf-8") as output_stream:
+            json.dump(contents, output_stream)
+
+
+def build_rom_event_index(
+    rom: ndspy.rom.NintendoDSRom,
+    character_encoding_name: str,
+    index_filepath: Optional[pathlib.Path] = None,
+) -> EventIndex:
+    """
+    Indexes all of the .evt files in the ROM. If an index file is given, then the events that are
+    unchanged since it was saved are not reindexed (or retried, if they failed), and the index file
+    is updated if any events changed.
+    """
+    evt_files = {
+        filename: rom.getFileByName(filename)
+        for filename in rom.filenames.files
+        if filename.endswith(".evt")
+    }
+
+    previous = None
+    if index_filepath is not None:
+        previous = EventIndex.load(index_filepath, character_encoding_name)
+
+    index = EventIndex.build(
+        evt_files, CHARACTER_ENCODINGS[character_encoding_name], previous
+    )
+
+    if index_filepath is not None and (
+        previous is None
+        or previous.files != index.files
+        or previous.failed != index.failed
+    ):
+        try:
+            index.save(index_filepath, character_encoding_name)
+        except OSError:
+            # The index is only a cache, so it is fine if it cannot be saved, ex. if the ROM is in
+            # a read-only directory
+            logging.warning(f"Failed to save event index: {index_filepath}")
+
+    return index
+
+
+def get_index_filepath(rom_filepath: pathlib.Path) -> pathlib.Path:
+    """
+    Returns the filepath of the event index kept next to the given ROM.
+    """
+    return rom_filepath.with_name(rom_filepath.name + INDEX_SUFFIX)
@@ -0,0 +1,154 @@
+import struct
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+
+from dqmj1_randomizer.randomize.regions import Region
+
+
+@dataclass(frozen=True, slots=True)
+class Scalar:
+    """
+    Little-endian integer value.
+    """
+
+    fmt: str
+    dtype: str
+
+    @property
+    def size(self) -> int:
+        return struct.calcsize("<" + self.fmt)
+
+
+U8 = Scalar("B", "u1")
+U16 = Scalar("H", "<u2")
+U32 = Scalar("I", "<u4")
+
+
+@dataclass(frozen=True, slots=True)
+class Blob:
+    """
+    Fixed number of raw bytes, ex. for data whose meaning is not known yet.
+
+    The struct of a layout unpacks blobs as bytes copies rather than as views of the buffer, since
+    struct can only pack bytes objects, and views would see later changes to a mutable buffer and
+    keep it from being resized. Use RecordLayout.frombuffer to access records without copying.
+    """
+
+    size: int
+
+
+@dataclass(frozen=True, slots=True)
+class Field:
+    """
+    Named field of a record. Fields with a count other than 1 are arrays of that many values.
+    """
+
+    name: str
+    type: "Scalar | Blob | RecordLayout"
+    count: int = 1
+
+    @property
+    def size(self) -> int:
+        return self.type.size * self.count
+
+
+class RecordLayout:
+    """
+    Layout of a fixed-size record in a .bin table, as a list of fields.
+
+    The layout is compiled once into both a struct (for packing and unpacking whole records at a
+    time) and a numpy structured dtype (for columnar access to tables of records), which always
+    agree on the size and offsets of the fields.
+    """
+
+    def __init__(self, fields: Sequence[Field]) -> None:
+        names = [f.name for f in fields]
+        assert len(set(names)) == len(names), f"Duplicate field names: {names}"
+
+        self.fields = tuple(fields)
+        self.fmt = "".join(field_fmt(f) for f in self.fields)
+        self.struct = struct.Struct("<" + self.fmt)
+        self.dtype: np.dtype[np.void] = np.dtype([field_dtype(f) for f in self.fields])
+        assert self.struct.size == self.dtype.itemsize
+
+    @property
+    def size(self) -> int:
+        return self.struct.size
+
+    def offset(self, name: str) -> int:
+        fields = self.dtype.fields
+        assert fields is not None
+
+        offset = fields[name][1]
+        assert isinstance(offset, int)
+        return offset
+
+    def field_struct(self, name: str) -> struct.Struct:
+        """
+        Returns a struct for just the given field, to be used at offset(name) within a record.
+        """
+        (f,) = (f for f in self.fields if f.name == name)
+        return struct.Struct("<" + field_fmt(f))
+
+    def frombuffer(
+        self, buffer: Any, count: int = -1, offset: int = 0
+    ) -> npt.NDArray[np.void]:
+        """
+        Returns the records in the given buffer as a structured array, without copying them.
+        """
+        return np.frombuffer(buffer, dtype=self.dtype, count=count, offset=offset)
+
+
+class RegionalRecordLayout:
+    """
+    Record layout that differs between regions of the game. Regions without their own layout use
+    the default one.
+    """
+
+    def __init__(
+        self, default: RecordLayout, overrides: dict[Region, RecordLayout] | None = None
+    ) -> None:
+        self.layouts = {
+            region: (overrides or {}).get(region, default) for region in Region
+        }
+
+        field_names = {
+            tuple(f.name for f in layout.fields) for layout in self.layouts.values()
+        }
+        assert len(field_names) == 1, "All regions must have the same fields"
+
+    def __getitem__(self, region: Region) -> RecordLayout:
+        return self.layouts[region]
+
+
+def field_fmt(f: Field) -> str:
+    if isinstance(f.type, Scalar):
+        return f"{f.count}{f.type.fmt}" if f.count != 1 else f.type.fmt
+    elif isinstance(f.type, Blob):
+        return f"{f.type.size}s" * f.count
+    else:
+        return f.type.fmt * f.count
+
+
+def field_dtype(f: Field) -> tuple[Any, ...]:
+    if isinstance(f.type, Scalar):
+        field_type: Any = f.type.dtype
+        shape: tuple[int, ...] = ()
+    elif isinstance(f.type, Blob):
+        field_type = "u1"
+        shape = (f.type.size,)
+    else:
+        field_type = f.type.dtype
+        shape = ()
+
+    if f.count != 1:
+        shape = (f.count, *shape)
+
+    if shape == ():
+        return (f.name, field_type)
+    else:
+        return (f.name, field_type, shape)
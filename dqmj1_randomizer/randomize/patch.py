@@ -0,0 +1,65 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+
+Buffer = bytes | bytearray | memoryview
+
+
+@dataclass(frozen=True, slots=True)
+class BytePatch:
+    """
+    A run of bytes to write over a file, starting at the given offset.
+    """
+
+    offset: int
+    data: bytes
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.data)
+
+
+class PatchOutOfBoundsError(ValueError):
+    def __init__(self, patch: BytePatch, length: int) -> None:
+        super().__init__(
+            f"Patch for bytes {patch.offset:#x} to {patch.end:#x} does not fit in data of length {length:#x}."
+        )
+
+
+def diff_bytes(original: Buffer, modified: Buffer, offset: int = 0) -> list[BytePatch]:
+    """
+    Returns the runs of bytes that differ between the two buffers, which must be the same length.
+    The offset is added to the offsets of all the patches, ex. for buffers that come after a
+    header.
+    """
+    assert len(original) == len(modified)
+
+    changed = np.frombuffer(original, dtype=np.uint8) != np.frombuffer(
+        modified, dtype=np.uint8
+    )
+
+    # Runs start where changed goes from False to True, and end where it goes back to False
+    edges = np.flatnonzero(np.diff(changed, prepend=False, append=False))
+    starts = edges[0::2].tolist()
+    ends = edges[1::2].tolist()
+
+    modified_view = memoryview(modified).cast("B")
+    return [
+        BytePatch(offset + start, bytes(modified_view[start:end]))
+        for start, end in zip(starts, ends)
+    ]
+
+
+def apply_patches(data: Buffer, patches: Iterable[BytePatch]) -> bytearray:
+    """
+    Returns a copy of the data with the patches written over it.
+    """
+    output = bytearray(data)
+    for patch in patches:
+        if patch.offset < 0 or patch.end > len(output):
+            raise PatchOutOfBoundsError(patch, len(output))
+
+        output[patch.offset : patch.end] = patch.data
+
+    return output
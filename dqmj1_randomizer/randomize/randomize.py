@@ -9,10 +9,13 @@ import pandas as pd
 from pubsub import pub  # type: ignore
 
 from dqmj1_randomizer.data import data_path
-from dqmj1_randomizer.randomize.btl_enmy_prm import randomize_btl_enmy_prm
-from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
-from dqmj1_randomizer.randomize.evt import Event, Instruction, InstructionType, Script
-from dqmj1_randomizer.randomize.skill_tbl import SkillSetTable, shuffle_skill_tbl
+from dqmj1_randomizer.randomize.btl_enmy_prm import btl_enmy_prm_patches
+from dqmj1_randomizer.randomize.evt import (
+    INSTRUCTION_TYPES_BY_NAME,
+    instruction_type_patches,
+)
+from dqmj1_randomizer.randomize.patch import BytePatch, apply_patches
+from dqmj1_randomizer.randomize.skill_tbl import skill_tbl_patches
 from dqmj1_randomizer.state import State
 
 
@@ -45,6 +48,14 @@ class FailedToFindExpectedRomSubFileError(RandomizationError):
 
 
 class Task(abc.ABC):
+    """
+    A step of the randomization that updates the ROM.
+
+    Tasks must not use the global random module. Each task instead draws from its own
+    random.Random seeded with State.seed, so that tasks do not affect each other's results and
+    can safely run concurrently.
+    """
+
     @abc.abstractmethod
     def run(self, state: State, rom: ndspy.rom.NintendoDSRom) -> None:
         raise NotImplementedError
@@ -111,72 +122,77 @@ def load_rom_files(rom: ndspy.rom.NintendoDSRom) -> None:
         pass
 
 
-class RandomizeBtlEnmyPrmTbl(Task):
+class TableTask(Task):
+    """
+    A task that randomizes a single table file in the ROM.
+
+    Table tasks report the byte ranges of the file that they change as patches against the
+    original file, which are then written over it. The patches can also be used without a ROM,
+    ex. to generate ROM patches or to compare the outputs of many seeds.
+    """
+
+    filepath: str
+    description: str
+
+    @abc.abstractmethod
+    def patches(self, state: State, original_data: bytes) -> list[BytePatch]:
+        raise NotImplementedError
+
     def run(self, state: State, rom: ndspy.rom.NintendoDSRom) -> None:
-        filepath = "BtlEnmyPrm.bin"
         try:
-            original_data = rom.getFileByName(filepath)
+            original_data = rom.getFileByName(self.filepath)
         except ValueError as e:
             raise FailedToFindExpectedRomSubFileError(
-                "BtlEnmyPrm.bin", "enemy encounters"
+                self.filepath, self.description
             ) from e
 
-        input_stream = io.BytesIO(original_data)
-        output_stream = io.BytesIO()
-        randomize_btl_enmy_prm(
-            state=state, input_stream=input_stream, output_stream=output_stream
+        patches = self.patches(state, original_data)
+
+        rom.setFileByName(self.filepath, bytes(apply_patches(original_data, patches)))
+        logging.info(
+            f"Successfully updated: {self.filepath} ({len(patches)} changed byte ranges)"
         )
 
-        rom.setFileByName(filepath, output_stream.getvalue())
-        logging.info(f"Successfully updated: {filepath}")
+        pub.sendMessage("randomize.progress")
 
     def estimate_steps(self, state: State, rom: ndspy.rom.NintendoDSRom) -> int:
         return 1
 
 
-class RandomizeSkillTbl(Task):
-    def run(self, state: State, rom: ndspy.rom.NintendoDSRom) -> None:
-        random.seed(state.seed)
+class RandomizeBtlEnmyPrmTbl(TableTask):
+    filepath = "BtlEnmyPrm.bin"
+    description = "enemy encounters"
 
-        info_filepath = data_path / "skill_tbl_info.csv"
-        logging.info(f"Loading SkillTbl info file: {info_filepath}")
-        data = pd.read_csv(info_filepath)
-        logging.info("Successfully loaded SkillTbl info file.")
+    def patches(self, state: State, original_data: bytes) -> list[BytePatch]:
+        return btl_enmy_prm_patches(state, original_data)
 
-        filepath = "SkillTbl.bin"
-        try:
-            original_data = rom.getFileByName(filepath)
-        except ValueError as e:
-            raise FailedToFindExpectedRomSubFileError(
-                "SkillTbl.bin", "skill sets"
-            ) from e
 
-        input_stream = io.BytesIO(original_data)
-        skill_sets = SkillSetTable.from_bin(input_stream, region=state.region)
+class RandomizeSkillTbl(TableTask):
+    filepath = "SkillTbl.bin"
+    description = "skill sets"
 
-        shuffle_skill_tbl(state, data, skill_sets)
+    def patches(self, state: State, original_data: bytes) -> list[BytePatch]:
+        rng = random.Random(state.seed)
 
-        output_stream = io.BytesIO()
-        skill_sets.write_bin(output_stream)
+        info_filepath = data_path / "skill_tbl_info.csv"
+        logging.info(f"Loading SkillTbl info file: {info_filepath}")
+        data = pd.read_csv(info_filepath)
+        logging.info("Successfully loaded SkillTbl info file.")
 
-        rom.setFileByName(filepath, output_stream.getvalue())
-        logging.info(f"Successfully updated: {filepath}")
+        return skill_tbl_patches(state, data, original_data, rng)
 
-        pub.sendMessage("randomize.progress")
 
-    def estimate_steps(self, state: State, rom: ndspy.rom.NintendoDSRom) -> int:
-        return 1
+SHOW_DIALOG = INSTRUCTION_TYPES_BY_NAME["ShowDialog"]
+NOP_AA = INSTRUCTION_TYPES_BY_NAME["NopAA"]
 
 
 class RemoveDialog(Task):
     def run(self, state: State, rom: ndspy.rom.NintendoDSRom) -> None:
-        random.seed(state.seed)
-
-        character_encoding = CHARACTER_ENCODINGS["North America / Europe"]
+        rng = random.Random(state.seed)
 
         # Shuffle the filenames in order to make the progress bar more accurate
         filenames = rom.filenames.files.copy()
-        random.shuffle(filenames)
+        rng.shuffle(filenames)
 
         # Load event files
         logging.info("Loading event files.")
@@ -184,26 +200,15 @@ class RemoveDialog(Task):
             if not filename.endswith(".evt"):
                 continue
 
-            input_stream = io.BytesIO(rom.getFileByName(filename))
-            event = Event.from_evt(input_stream, character_encoding=character_encoding)
-
-            script = event.to_script(character_encoding)
-
-            # Replace ShowDialogue commands with Nop's of the same size
-            for entry in script.entries:
-                if (
-                    isinstance(entry, Instruction)
-                    and entry.instruction_type.name == "ShowDialog"
-                ):
-                    entry.instruction_type.type_id = 0xAA  # NopAA
-
-            # Write the updated events to the ROM
-            output_stream = io.BytesIO()
-            script.to_event(character_encoding).write_evt(
-                output_stream, character_encoding
+            # Replace ShowDialogue commands with Nop's of the same size, by patching just their
+            # type ids in the raw file
+            data = rom.getFileByName(filename)
+            patches = instruction_type_patches(
+                data, SHOW_DIALOG.type_id, NOP_AA.type_id
             )
 
-            rom.setFileByName(filename, output_stream.getbuffer())
+            # Write the updated events to the ROM
+            rom.setFileByName(filename, apply_patches(data, patches))
 
             pub.sendMessage("randomize.progress")
 
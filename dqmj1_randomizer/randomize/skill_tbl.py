@@ -3,10 +3,20 @@ import logging
 import random
 from collections.abc import Iterable
 from dataclasses import dataclass
-from typing import IO, Callable, TypeVar, cast
+from typing import IO, Any, Callable, TypeVar, cast
 
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 
+from dqmj1_randomizer.randomize.layout import (
+    U8,
+    Blob,
+    Field,
+    RecordLayout,
+    RegionalRecordLayout,
+)
+from dqmj1_randomizer.randomize.patch import BytePatch, diff_bytes
 from dqmj1_randomizer.randomize.regions import Region
 from dqmj1_randomizer.state import State
 
@@ -21,14 +31,43 @@ SKILL_SIZE_IN_BYTES = 12
 TRAITS_OFFSET = 164
 TRAIT_SIZE_IN_BYTES = 4
 
+
+def skill_set_layout(size_in_bytes: int) -> RecordLayout:
+    return RecordLayout(
+        [
+            Field("can_upgrade", U8),
+            Field("unknown_a", Blob(SKILLS_OFFSET - 1)),
+            Field("skills", Blob(SKILL_SIZE_IN_BYTES), count=NUM_SKILLS_PER_SKILL_SET),
+            Field("traits", Blob(TRAIT_SIZE_IN_BYTES), count=NUM_SKILLS_PER_SKILL_SET),
+            Field(
+                "unknown_b",
+                Blob(
+                    size_in_bytes
+                    - TRAITS_OFFSET
+                    - NUM_SKILLS_PER_SKILL_SET * TRAIT_SIZE_IN_BYTES
+                ),
+            ),
+        ]
+    )
+
+
+SKILL_SET_LAYOUT = RegionalRecordLayout(
+    default=skill_set_layout(SKILL_SET_SIZE_IN_BYTES_NA_EU),
+    overrides={Region.Japan: skill_set_layout(SKILL_SET_SIZE_IN_BYTES_JP)},
+)
+assert SKILL_SET_LAYOUT[Region.Japan].offset("skills") == SKILLS_OFFSET
+assert SKILL_SET_LAYOUT[Region.Japan].offset("traits") == TRAITS_OFFSET
+
 T = TypeVar("T")
 
 
 class Byteable(abc.ABC):
+    __slots__ = ()
+
     raw: bytearray
 
 
-@dataclass
+@dataclass(slots=True)
 class Skill(Byteable):
     raw: bytearray
 
@@ -36,7 +75,7 @@ class Skill(Byteable):
         return all(byte == 0x0 for byte in self.raw)
 
 
-@dataclass
+@dataclass(slots=True)
 class Trait(Byteable):
     raw: bytearray
 
@@ -44,7 +83,7 @@ class Trait(Byteable):
         return all(byte == 0x0 for byte in self.raw)
 
 
-@dataclass
+@dataclass(slots=True)
 class SkillSet(Byteable):
     raw: bytearray
 
@@ -95,47 +134,80 @@ class SkillSet(Byteable):
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SkillSetTable(Byteable):
     raw: bytearray
     region: Region
 
     @property
     def skill_sets(self) -> list[SkillSet]:
-        if self.region == Region.Japan:
-            return extract_data_bytes(
-                all_bytes=self.raw,
-                offset=SKILL_SETS_OFFSET,
-                data_size=SKILL_SET_SIZE_IN_BYTES_JP,
-                num_data=NUM_SKILL_SETS,
-                constructor=lambda b: SkillSet(b),
-            )
-        else:
-            return extract_data_bytes(
-                all_bytes=self.raw,
-                offset=SKILL_SETS_OFFSET,
-                data_size=SKILL_SET_SIZE_IN_BYTES_NA_EU,
-                num_data=NUM_SKILL_SETS,
-                constructor=lambda b: SkillSet(b),
-            )
+        return extract_data_bytes(
+            all_bytes=self.raw,
+            offset=SKILL_SETS_OFFSET,
+            data_size=self.skill_set_size,
+            num_data=NUM_SKILL_SETS,
+            constructor=lambda b: SkillSet(b),
+        )
 
     @skill_sets.setter
     def skill_sets(self, new_skill_sets: list[SkillSet]) -> None:
         assert len(new_skill_sets) == NUM_SKILL_SETS
-        if self.region == Region.Japan:
-            set_data_bytes(
-                all_bytes=self.raw,
-                offset=SKILL_SETS_OFFSET,
-                data_size=SKILL_SET_SIZE_IN_BYTES_JP,
-                data=new_skill_sets,
-            )
-        else:
-            set_data_bytes(
-                all_bytes=self.raw,
-                offset=SKILL_SETS_OFFSET,
-                data_size=SKILL_SET_SIZE_IN_BYTES_NA_EU,
-                data=new_skill_sets,
-            )
+        set_data_bytes(
+            all_bytes=self.raw,
+            offset=SKILL_SETS_OFFSET,
+            data_size=self.skill_set_size,
+            data=new_skill_sets,
+        )
+
+    @property
+    def layout(self) -> RecordLayout:
+        return SKILL_SET_LAYOUT[self.region]
+
+    @property
+    def skill_set_size(self) -> int:
+        return self.layout.size
+
+    @property
+    def records(self) -> npt.NDArray[np.void]:
+        """
+        The skill sets, as a structured array with the fields of SKILL_SET_LAYOUT. This is a view
+        of raw, so changes to it are made to raw as well.
+        """
+        return self.layout.frombuffer(
+            self.raw, count=NUM_SKILL_SETS, offset=SKILL_SETS_OFFSET
+        )
+
+    @property
+    def skills(self) -> npt.NDArray[np.uint8]:
+        """
+        The bytes of the skills, as a (skill set, slot, byte) view of raw.
+        """
+        skills: npt.NDArray[np.uint8] = self.records["skills"]
+        return skills
+
+    @property
+    def traits(self) -> npt.NDArray[np.uint8]:
+        """
+        The bytes of the traits, as a (skill set, slot, byte) view of raw.
+        """
+        traits: npt.NDArray[np.uint8] = self.records["traits"]
+        return traits
+
+    def skill_offset(self, skill_set_index: int, slot_index: int) -> int:
+        return (
+            SKILL_SETS_OFFSET
+            + skill_set_index * self.skill_set_size
+            + self.layout.offset("skills")
+            + slot_index * SKILL_SIZE_IN_BYTES
+        )
+
+    def trait_offset(self, skill_set_index: int, slot_index: int) -> int:
+        return (
+            SKILL_SETS_OFFSET
+            + skill_set_index * self.skill_set_size
+            + self.layout.offset("traits")
+            + slot_index * TRAIT_SIZE_IN_BYTES
+        )
 
     @staticmethod
     def from_bin(input_stream: IO[bytes], region: Region) -> "SkillSetTable":
@@ -144,54 +216,105 @@ class SkillSetTable(Byteable):
     def write_bin(self, output_stream: IO[bytes]) -> None:
         output_stream.write(self.raw)
 
+    def to_pd(self) -> pd.DataFrame:
+        """
+        Returns a DataFrame with a row per skill and trait slot, with a column per byte of the
+        skill (ex. "skill_0") and trait (ex. "trait_0").
+        """
+        skills = self.skills.reshape(-1, SKILL_SIZE_IN_BYTES)
+        traits = self.traits.reshape(-1, TRAIT_SIZE_IN_BYTES)
+
+        columns: dict[str, npt.NDArray[Any]] = {
+            "skill_set_index": np.repeat(
+                np.arange(NUM_SKILL_SETS), NUM_SKILLS_PER_SKILL_SET
+            ),
+            "slot_index": np.tile(np.arange(NUM_SKILLS_PER_SKILL_SET), NUM_SKILL_SETS),
+            "can_upgrade": np.repeat(
+                self.records["can_upgrade"] != 0, NUM_SKILLS_PER_SKILL_SET
+            ),
+        }
+        for k in range(SKILL_SIZE_IN_BYTES):
+            columns[f"skill_{k}"] = skills[:, k]
+        for k in range(TRAIT_SIZE_IN_BYTES):
+            columns[f"trait_{k}"] = traits[:, k]
+
+        return pd.DataFrame(columns)
+
 
 def shuffle_skill_tbl(
-    state: State, data: pd.DataFrame, skill_sets_table: SkillSetTable
+    state: State,
+    data: pd.DataFrame,
+    skill_sets_table: SkillSetTable,
+    rng: random.Random,
 ) -> None:
-    skill_sets = skill_sets_table.skill_sets
-
     # Find all the skills and traits we want to randomize
-    skill_and_trait_entries = {}
-    for skill_set_index, skill_set in enumerate(skill_sets):
-        if data["exclude"][skill_set_index] == "y":
-            continue
-
-        for skill_and_trait_index, (skill, trait) in enumerate(
-            zip(skill_set.skills, skill_set.traits)
-        ):
-            if skill.is_empty() and trait.is_empty():
-                continue
-
-            skill_and_trait_entries[(skill_set_index, skill_and_trait_index)] = (
-                skill,
-                trait,
-            )
-
-    # Perform the shuffle
-    indices = skill_and_trait_entries.keys()
-    values = list(skill_and_trait_entries.values())
-    random.shuffle(values)
-
-    # Apply the shuffle, making sure to do so to fully copies as to not overwrite data we want to
-    # also read from.
-    shuffled_skill_sets = skill_sets_table.skill_sets
-    for (skill_set_index, skill_and_trait_index), (skill, trait) in zip(
-        indices, values
-    ):
-        skill_set = shuffled_skill_sets[skill_set_index]
-
-        skills = skill_set.skills
-        traits = skill_set.traits
-
-        skills[skill_and_trait_index] = skill
-        traits[skill_and_trait_index] = trait
-
-        skill_set.skills = skills
-        skill_set.traits = traits
-
-        shuffled_skill_sets[skill_set_index] = skill_set
-
-    skill_sets_table.skill_sets = shuffled_skill_sets
+    skill_set_indices, slot_indices = find_skill_and_trait_slots(data, skill_sets_table)
+
+    # Perform the shuffle. Shuffling the slot indices draws the same random numbers as shuffling
+    # the skills and traits themselves would, so seeds give the same results as before.
+    sources = list(range(len(skill_set_indices)))
+    rng.shuffle(sources)
+
+    skill_sets_table.raw = move_skills_and_traits(
+        skill_sets_table,
+        targets=(skill_set_indices, slot_indices),
+        sources=(skill_set_indices[sources], slot_indices[sources]),
+    )
+
+
+def skill_tbl_patches(
+    state: State,
+    data: pd.DataFrame,
+    original_data: bytes,
+    rng: random.Random,
+) -> list[BytePatch]:
+    """
+    Randomizes the given SkillTbl.bin file, and returns the changed byte ranges instead of the
+    whole randomized file.
+    """
+    skill_sets_table = SkillSetTable(raw=bytearray(original_data), region=state.region)
+    shuffle_skill_tbl(state, data, skill_sets_table, rng)
+
+    return diff_bytes(original_data, skill_sets_table.raw)
+
+
+def find_skill_and_trait_slots(
+    data: pd.DataFrame, skill_sets_table: SkillSetTable
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+    """
+    Returns the skill set indices and slot indices of the non-empty skill and trait slots in skill
+    sets that are not excluded, in order.
+    """
+    excluded = (data["exclude"] == "y").to_numpy()[:NUM_SKILL_SETS]
+
+    non_empty = skill_sets_table.skills.any(axis=2) | skill_sets_table.traits.any(
+        axis=2
+    )
+    non_empty[excluded] = False
+
+    skill_set_indices, slot_indices = np.nonzero(non_empty)
+    return skill_set_indices, slot_indices
+
+
+def move_skills_and_traits(
+    skill_sets_table: SkillSetTable,
+    targets: tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]],
+    sources: tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]],
+) -> bytearray:
+    """
+    Returns a copy of the skill sets table data where the skill and trait in each target slot are
+    replaced with the ones from the corresponding source slot of the original data.
+
+    Targets and sources are given as (skill set indices, slot indices).
+    """
+    output = SkillSetTable(
+        raw=bytearray(skill_sets_table.raw), region=skill_sets_table.region
+    )
+
+    output.skills[targets] = skill_sets_table.skills[sources]
+    output.traits[targets] = skill_sets_table.traits[sources]
+
+    return output.raw
 
 
 def extract_data_bytes(
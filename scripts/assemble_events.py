@@ -0,0 +1,63 @@
+# ruff: noqa: T201
+import argparse
+import pathlib
+import sys
+import time
+
+import ndspy.rom
+
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt_bulk import assemble_rom_events
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--rom", type=pathlib.Path, required=True)
+    parser.add_argument("--script_directory", type=pathlib.Path, required=True)
+    parser.add_argument("--output_rom", type=pathlib.Path, required=True)
+    parser.add_argument(
+        "--character_encoding",
+        choices=list(CHARACTER_ENCODINGS),
+        default="North America / Europe",
+    )
+    parser.add_argument("--max_workers", type=int, default=None)
+    parser.add_argument(
+        "--build_directory",
+        type=pathlib.Path,
+        default=None,
+        help="Where to keep the assembled events between builds. Defaults to a directory within the script directory.",
+    )
+
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+
+    rom = ndspy.rom.NintendoDSRom.fromFile(args.rom)
+    result = assemble_rom_events(
+        rom,
+        args.script_directory,
+        args.character_encoding,
+        args.max_workers,
+        args.build_directory,
+    )
+
+    for filename, error in sorted(result.failed.items()):
+        print(f"Failed to assemble {filename}: {error}")
+
+    print(
+        f"Compiled {len(result.compiled)} scripts, skipped {len(result.skipped)} up to date scripts, {len(result.failed)} failed"
+    )
+
+    if len(result.failed) > 0:
+        print("Not writing the ROM, since some scripts failed to assemble.")
+        sys.exit(1)
+
+    rom.saveToFile(args.output_rom)
+
+    seconds = time.perf_counter() - start
+    print(f"Wrote ROM to {args.output_rom} ({seconds:.1f}s)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
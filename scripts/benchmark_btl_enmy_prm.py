@@ -0,0 +1,48 @@
+# ruff: noqa: T201
+import argparse
+import io
+import pathlib
+import sys
+import timeit
+
+from dqmj1_randomizer.randomize.btl_enmy_prm import BtlEnmyPrm
+
+DEFAULT_INPUT_FILEPATH = (
+    pathlib.Path(__file__).parent.parent
+    / "regression_tests"
+    / "inputs"
+    / "dummy_BtlEnmyPrm.bin"
+)
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--input_filepath", type=pathlib.Path, default=DEFAULT_INPUT_FILEPATH
+    )
+    parser.add_argument("--iterations", type=int, default=200)
+
+    args = parser.parse_args(argv)
+
+    with args.input_filepath.open("rb") as input_stream:
+        data = input_stream.read()
+
+    btl_enmy_prm = BtlEnmyPrm.from_bin(io.BytesIO(data))
+    num_records = len(btl_enmy_prm.entries)
+
+    def decode() -> None:
+        BtlEnmyPrm.from_bin(io.BytesIO(data))
+
+    def encode() -> None:
+        btl_enmy_prm.write_bin(io.BytesIO())
+
+    print(f"{num_records} records, {args.iterations} iterations")
+    for name, function in [("decode", decode), ("encode", encode)]:
+        seconds = timeit.timeit(function, number=args.iterations)
+        records_per_second = num_records * args.iterations / seconds
+        print(f"{name}: {records_per_second:,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,76 @@
+# ruff: noqa: T201
+import argparse
+import io
+import pathlib
+import sys
+import timeit
+from typing import Callable
+
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt import Event
+
+DEFAULT_INPUT_FILEPATH = (
+    pathlib.Path(__file__).parent.parent
+    / "regression_tests"
+    / "inputs"
+    / "dummy_event.evt"
+)
+
+CHARACTER_ENCODING = CHARACTER_ENCODINGS["North America / Europe"]
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--input_filepath", type=pathlib.Path, default=DEFAULT_INPUT_FILEPATH
+    )
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+
+    args = parser.parse_args(argv)
+
+    with args.input_filepath.open("rb") as input_stream:
+        data = input_stream.read()
+
+    event = Event.from_evt(io.BytesIO(data), CHARACTER_ENCODING)
+    num_instructions = len(event.instructions)
+
+    script_stream = io.StringIO()
+    event.write_script(script_stream, CHARACTER_ENCODING)
+    script = script_stream.getvalue()
+    num_lines = script.count("\n")
+
+    def from_evt() -> None:
+        Event.from_evt(io.BytesIO(data), CHARACTER_ENCODING)
+
+    def write_evt() -> None:
+        event.write_evt(io.BytesIO(), CHARACTER_ENCODING)
+
+    def write_script() -> None:
+        event.write_script(io.StringIO(), CHARACTER_ENCODING)
+
+    def from_script() -> None:
+        Event.from_script(io.StringIO(script), CHARACTER_ENCODING)
+
+    # (name, function, number of items processed per call, name of the items)
+    benchmarks: list[tuple[str, Callable[[], None], int, str]] = [
+        ("from_evt", from_evt, num_instructions, "instructions"),
+        ("write_evt", write_evt, num_instructions, "instructions"),
+        ("write_script", write_script, num_lines, "lines"),
+        ("from_script", from_script, num_lines, "lines"),
+    ]
+
+    print(
+        f"{num_instructions} instructions, {num_lines} script lines, {args.iterations} iterations"
+    )
+    for name, function, num_items, items_name in benchmarks:
+        seconds = min(
+            timeit.repeat(function, number=args.iterations, repeat=args.repeats)
+        )
+        items_per_second = num_items * args.iterations / seconds
+        print(f"{name}: {items_per_second:,.0f} {items_name}/s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,96 @@
+# ruff: noqa: T201
+import argparse
+import gc
+import io
+import pathlib
+import sys
+import tracemalloc
+from typing import Any, Callable
+
+import ndspy.rom
+
+from dqmj1_randomizer.randomize.btl_enmy_prm import BtlEnmyPrm, BtlEnmyPrmTable
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt import Event
+
+INPUTS_DIR = pathlib.Path(__file__).parent.parent / "regression_tests" / "inputs"
+
+CHARACTER_ENCODING = CHARACTER_ENCODINGS["North America / Europe"]
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--btl_enmy_prm_filepath",
+        type=pathlib.Path,
+        default=INPUTS_DIR / "dummy_BtlEnmyPrm.bin",
+    )
+    parser.add_argument(
+        "--evt_filepath", type=pathlib.Path, default=INPUTS_DIR / "dummy_event.evt"
+    )
+    parser.add_argument(
+        "--rom",
+        type=pathlib.Path,
+        help="If given, measures the event files in this ROM instead of --evt_filepath.",
+    )
+    parser.add_argument("--copies", type=int, default=10)
+
+    args = parser.parse_args(argv)
+
+    with args.btl_enmy_prm_filepath.open("rb") as input_stream:
+        btl_enmy_prm_data = input_stream.read()
+
+    if args.rom is not None:
+        rom = ndspy.rom.NintendoDSRom.fromFile(args.rom)
+        evt_files = [
+            rom.getFileByName(filename)
+            for filename in rom.filenames.files
+            if filename.endswith(".evt")
+        ]
+    else:
+        with args.evt_filepath.open("rb") as input_stream:
+            evt_files = [input_stream.read()]
+
+    num_bytes = measure(
+        lambda: BtlEnmyPrm.from_bin(io.BytesIO(btl_enmy_prm_data)), args.copies
+    )
+    print(f"BtlEnmyPrm: {num_bytes:,.0f} bytes per table")
+
+    num_bytes = measure(
+        lambda: BtlEnmyPrmTable.from_bin(io.BytesIO(btl_enmy_prm_data)), args.copies
+    )
+    print(f"BtlEnmyPrmTable: {num_bytes:,.0f} bytes per table")
+
+    events: list[Event] = []
+    num_bytes = measure(
+        lambda: events.extend(
+            Event.from_evt(io.BytesIO(data), CHARACTER_ENCODING) for data in evt_files
+        ),
+        1,
+    )
+    num_instructions = sum(len(event.instructions) for event in events)
+    print(
+        f"Event: {num_bytes / len(evt_files):,.0f} bytes per event, {num_bytes / num_instructions:,.0f} bytes per instruction ({len(evt_files)} events)"
+    )
+
+
+def measure(function: Callable[[], Any], copies: int) -> float:
+    """
+    Returns the average number of bytes kept alive by the result of the given function.
+    """
+    gc.collect()
+    tracemalloc.start()
+
+    before, _ = tracemalloc.get_traced_memory()
+    results = [function() for _ in range(copies)]
+    after, _ = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+    del results
+
+    return (after - before) / copies
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,45 @@
+# ruff: noqa: T201
+import argparse
+import pathlib
+import sys
+import time
+
+import ndspy.rom
+
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt_bulk import disassemble_rom_events
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--rom", type=pathlib.Path, required=True)
+    parser.add_argument("--output_directory", type=pathlib.Path, required=True)
+    parser.add_argument(
+        "--character_encoding",
+        choices=list(CHARACTER_ENCODINGS),
+        default="North America / Europe",
+    )
+    parser.add_argument("--max_workers", type=int, default=None)
+
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+
+    rom = ndspy.rom.NintendoDSRom.fromFile(args.rom)
+    result = disassemble_rom_events(
+        rom, args.output_directory, args.character_encoding, args.max_workers
+    )
+
+    seconds = time.perf_counter() - start
+
+    for filename, error in sorted(result.failed.items()):
+        print(f"Failed to disassemble {filename}: {error}")
+
+    print(
+        f"Wrote {len(result.written)} scripts, skipped {len(result.skipped)} up to date scripts, {len(result.failed)} failed ({seconds:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,92 @@
+import argparse
+import pathlib
+import random
+import string
+import sys
+from typing import Any
+
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt import (
+    INSTRUCTION_TYPES,
+    ArgumentType,
+    Event,
+    Instruction,
+    ValueLocation,
+)
+
+# Characters that are encoded as a single byte and decode back to themselves
+STRING_CHARACTERS = string.ascii_letters + string.digits + " .,!?"
+
+CHARACTER_ENCODING = CHARACTER_ENCODINGS["North America / Europe"]
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--output_filepath", type=pathlib.Path, required=True)
+    parser.add_argument("--num_instructions", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+
+    instructions = []
+    for _ in range(0, args.num_instructions):
+        instruction_type = random.choice(INSTRUCTION_TYPES)
+        arguments = tuple(
+            random_argument(argument_type)
+            for argument_type in instruction_type.arguments
+        )
+        instructions.append(
+            Instruction(instruction_type=instruction_type, arguments=arguments)
+        )
+
+    # Point all jumps at the start of some instruction
+    positions = []
+    position = 0x0
+    for instruction in instructions:
+        positions.append(position)
+        position += instruction.length(CHARACTER_ENCODING)
+
+    labels = {}
+    for j, instruction in enumerate(instructions):
+        labeled_arguments = list(instruction.arguments)
+        for i, argument_type in enumerate(instruction.instruction_type.arguments):
+            if argument_type == ArgumentType.InstructionLocation:
+                target = random.choice(positions)
+                label = f"0x{target:x}"
+
+                labeled_arguments[i] = label
+                labels[label] = target
+
+        instructions[j] = instruction.replace(arguments=tuple(labeled_arguments))
+
+    event = Event(
+        instructions=instructions, data=random.randbytes(0x1000), labels=labels
+    )
+
+    with args.output_filepath.open("wb") as output_stream:
+        event.write_evt(output_stream, CHARACTER_ENCODING)
+
+
+def random_argument(argument_type: ArgumentType) -> Any:
+    if argument_type == ArgumentType.U32:
+        return random.getrandbits(32)
+    elif argument_type == ArgumentType.ValueLocation:
+        return random.choice(list(ValueLocation))
+    elif argument_type == ArgumentType.InstructionLocation:
+        # Placeholder, replaced once the positions of the instructions are known
+        return "0x0"
+    elif argument_type == ArgumentType.Bytes:
+        return random.randbytes(4 * random.randint(0, 8))
+    elif argument_type == ArgumentType.AsciiString:
+        return "".join(random.choices(string.ascii_letters, k=random.randint(0, 12)))
+    elif argument_type == ArgumentType.String:
+        return "".join(random.choices(STRING_CHARACTERS, k=random.randint(0, 40)))
+
+    raise NotImplementedError(f"{argument_type}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,64 @@
+# ruff: noqa: T201
+import argparse
+import pathlib
+import sys
+
+import ndspy.rom
+
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt import Instruction
+from dqmj1_randomizer.randomize.evt_index import (
+    build_rom_event_index,
+    get_index_filepath,
+)
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--rom", type=pathlib.Path, required=True)
+    parser.add_argument(
+        "--character_encoding",
+        choices=list(CHARACTER_ENCODINGS),
+        default="North America / Europe",
+    )
+    parser.add_argument(
+        "--type_id",
+        type=lambda x: int(x, 0),
+        default=None,
+        help="Only show instructions of this type, ex. 0x5A.",
+    )
+    parser.add_argument(
+        "--filename", default=None, help="Only show instructions in this event file."
+    )
+    parser.add_argument(
+        "--string",
+        default=None,
+        help="Show the string arguments that contain this text, instead of instructions.",
+    )
+
+    args = parser.parse_args(argv)
+
+    rom = ndspy.rom.NintendoDSRom.fromFile(args.rom)
+    index = build_rom_event_index(
+        rom, args.character_encoding, get_index_filepath(args.rom)
+    )
+
+    for filename, failed_file in sorted(index.failed.items()):
+        print(f"Failed to index {filename}: {failed_file.error}", file=sys.stderr)
+
+    if args.string is not None:
+        for string_reference in index.find_strings(args.string):
+            if args.filename is None or string_reference.filename == args.filename:
+                print(
+                    f"{string_reference.filename} 0x{string_reference.offset:x}: {string_reference.string}"
+                )
+        return
+
+    for reference in index.instructions(args.type_id, args.filename):
+        name = Instruction.get_instruction_type(reference.type_id).name
+        print(f"{reference.filename} 0x{reference.offset:x}: {name}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,35 @@
+import random
+
+from dqmj1_randomizer.randomize.regions import Region
+from dqmj1_randomizer.randomize.skill_tbl import (
+    NUM_SKILL_SETS,
+    NUM_SKILLS_PER_SKILL_SET,
+    SKILL_SIZE_IN_BYTES,
+    TRAIT_SIZE_IN_BYTES,
+    SkillSetTable,
+)
+
+
+def create_skill_sets_table(region: Region, seed: int) -> SkillSetTable:
+    rng = random.Random(seed)
+
+    skill_sets_table = SkillSetTable(raw=bytearray(), region=region)
+    skill_sets_table.raw = bytearray(
+        rng.randbytes(skill_sets_table.skill_offset(NUM_SKILL_SETS, 0))
+    )
+
+    # Clear out some of the slots, so that there are empty ones to skip over
+    for skill_set_index in range(NUM_SKILL_SETS):
+        for slot_index in range(NUM_SKILLS_PER_SKILL_SET):
+            if rng.random() < 0.3:
+                offset = skill_sets_table.skill_offset(skill_set_index, slot_index)
+                skill_sets_table.raw[offset : offset + SKILL_SIZE_IN_BYTES] = bytes(
+                    SKILL_SIZE_IN_BYTES
+                )
+
+                offset = skill_sets_table.trait_offset(skill_set_index, slot_index)
+                skill_sets_table.raw[offset : offset + TRAIT_SIZE_IN_BYTES] = bytes(
+                    TRAIT_SIZE_IN_BYTES
+                )
+
+    return skill_sets_table
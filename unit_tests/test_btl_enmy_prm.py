@@ -1,11 +1,40 @@
+import concurrent.futures
 import io
+import pathlib
+import random
 import unittest
 
+import numpy as np
+import pandas as pd
+
 from dqmj1_randomizer.randomize.btl_enmy_prm import (
+    BiasedByStatTotalShuffle,
     BtlEnmyPrm,
     BtlEnmyPrmEntry,
+    BtlEnmyPrmFlag,
+    BtlEnmyPrmFlagsLengthMismatchError,
+    BtlEnmyPrmTable,
     EnemySkillEntry,
+    InvalidBtlEnmyPrmMagicError,
     ItemDrop,
+    TruncatedBtlEnmyPrmError,
+    btl_enmy_prm_patches,
+    compile_btl_enmy_prm_flags,
+    find_encounter_mappings,
+    find_entries_to_shuffle,
+    iter_btl_enmy_prm,
+    load_btl_enmy_prm_flags,
+    plan_btl_enmy_prm_shuffle,
+    randomize_btl_enmy_prm,
+)
+from dqmj1_randomizer.randomize.patch import apply_patches
+from dqmj1_randomizer.state import BiasedByStatTotalMonsterShuffle, Monsters, State
+
+DUMMY_BTL_ENMY_PRM_FILEPATH = (
+    pathlib.Path(__file__).parent.parent
+    / "regression_tests"
+    / "inputs"
+    / "dummy_BtlEnmyPrm.bin"
 )
 
 
@@ -431,3 +460,358 @@ class TestBtlEnmyPrm(unittest.TestCase):
             b"\x00"
         )
         self.assertEqual(expected, actual)
+
+    def test_round_trip(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            expected = input_stream.read()
+
+        btl_enmy_prm = BtlEnmyPrm.from_bin(io.BytesIO(expected))
+        output_stream = io.BytesIO()
+
+        btl_enmy_prm.write_bin(output_stream)
+
+        actual = output_stream.getbuffer().tobytes()
+
+        self.assertEqual(880, len(btl_enmy_prm.entries))
+        self.assertEqual(expected, actual)
+
+
+class TestBtlEnmyPrmTable(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            expected = input_stream.read()
+
+        table = BtlEnmyPrmTable.from_bin(io.BytesIO(expected))
+        output_stream = io.BytesIO()
+
+        table.write_bin(output_stream)
+
+        actual = output_stream.getbuffer().tobytes()
+
+        self.assertEqual(880, len(table))
+        self.assertEqual(expected, actual)
+
+    def test_columns_match_entries(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            data = input_stream.read()
+
+        entries = BtlEnmyPrm.from_bin(io.BytesIO(data)).entries
+        table = BtlEnmyPrmTable.from_bin(io.BytesIO(data))
+
+        self.assertEqual(
+            [entry.simple_stat_total for entry in entries],
+            table.simple_stat_totals.tolist(),
+        )
+        self.assertEqual(
+            [entry.item_drops[1].item_id for entry in entries],
+            table.records["item_drops"]["item_id"][:, 1].tolist(),
+        )
+        self.assertEqual(entries, table.to_btl_enmy_prm().entries)
+
+    def test_to_pd_does_not_copy(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            table = BtlEnmyPrmTable.from_bin(input_stream)
+
+        entries_df = table.to_pd()
+
+        self.assertEqual(len(table), len(entries_df))
+        self.assertTrue(np.shares_memory(entries_df["gold"].to_numpy(), table.records))
+        self.assertTrue(
+            np.shares_memory(entries_df["skills_5_skill_id"].to_numpy(), table.records)
+        )
+        self.assertEqual(
+            table.records["skill_set_ids"][:, 2].tolist(),
+            entries_df["skill_set_ids_2"].tolist(),
+        )
+
+    def test_unchanged_table_is_not_copied(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            table = BtlEnmyPrmTable.from_bin(input_stream)
+
+        self.assertFalse(table.records.flags.writeable)
+        self.assertTrue(np.shares_memory(table.records, table.original_records))
+        self.assertEqual([], table.dirty_indices.tolist())
+
+
+class TestBtlEnmyPrmEntryView(unittest.TestCase):
+    def test_fields_match_entry(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            data = input_stream.read()
+
+        entries = BtlEnmyPrm.from_bin(io.BytesIO(data)).entries
+        table = BtlEnmyPrmTable.from_bin(io.BytesIO(data))
+
+        for entry, view in zip(entries, table):
+            self.assertEqual(entry.species_id, view.species_id)
+            self.assertEqual(entry.skills, view.skills)
+            self.assertEqual(entry.item_drops, view.item_drops)
+            self.assertEqual(entry.unknown_f, view.unknown_f)
+            self.assertEqual(entry.skill_set_ids, view.skill_set_ids)
+            self.assertEqual(entry.simple_stat_total, view.simple_stat_total)
+            self.assertEqual(entry, view.to_entry())
+
+    def test_set_field_marks_dirty(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            data = input_stream.read()
+
+        table = BtlEnmyPrmTable.from_bin(io.BytesIO(data))
+        original_gold = table[3].gold
+
+        table[3].gold = 1234
+        table[5].item_drops = [ItemDrop(1, 2), ItemDrop(3, 4)]
+
+        self.assertEqual(1234, table[3].gold)
+        self.assertEqual(original_gold, table.original_records["gold"][3])
+        self.assertEqual([ItemDrop(1, 2), ItemDrop(3, 4)], table[5].item_drops)
+        self.assertEqual([3, 5], table.dirty_indices.tolist())
+        self.assertTrue(table[3].is_dirty)
+        self.assertFalse(table[4].is_dirty)
+
+        output_stream = io.BytesIO()
+        table.write_bin(output_stream)
+
+        entries = BtlEnmyPrm.from_bin(io.BytesIO(data)).entries
+        entries[3].gold = 1234
+        entries[5].item_drops = [ItemDrop(1, 2), ItemDrop(3, 4)]
+        expected_stream = io.BytesIO()
+        BtlEnmyPrm(entries).write_bin(expected_stream)
+
+        self.assertEqual(expected_stream.getvalue(), output_stream.getvalue())
+
+
+class TestBtlEnmyPrmFlags(unittest.TestCase):
+    def setUp(self) -> None:
+        self.data = pd.DataFrame(
+            {
+                "id": [0, 1, 2, 3, 4, 5, 6],
+                "is_boss": [None, "y", "y", None, None, None, None],
+                "is_starter": [None, None, None, "y", None, None, None],
+                "is_gift_monster": [None, None, None, None, "y", None, None],
+                "is_gift_incarnus": [None, None, None, None, None, "y", None],
+                "exclude": ["y", None, None, None, None, None, None],
+                "swap_drop": [None, None, "y", None, None, None, None],
+            }
+        )
+
+    def test_compile_btl_enmy_prm_flags(self) -> None:
+        actual = compile_btl_enmy_prm_flags(self.data).tolist()
+
+        expected = [
+            BtlEnmyPrmFlag.EXCLUDE,
+            BtlEnmyPrmFlag.BOSS,
+            BtlEnmyPrmFlag.BOSS | BtlEnmyPrmFlag.SWAP_DROP,
+            BtlEnmyPrmFlag.STARTER,
+            BtlEnmyPrmFlag.GIFT_MONSTER,
+            BtlEnmyPrmFlag.GIFT_INCARNUS,
+            0,
+        ]
+        self.assertEqual(expected, actual)
+
+    def test_find_entries_to_shuffle(self) -> None:
+        flags = compile_btl_enmy_prm_flags(self.data)
+
+        include_all = Monsters(
+            include_bosses=True, include_starters=True, include_gift_monsters=True
+        )
+        exclude_all = Monsters(
+            include_bosses=False, include_starters=False, include_gift_monsters=False
+        )
+
+        self.assertEqual(
+            [1, 2, 3, 4, 6], find_entries_to_shuffle(include_all, flags).tolist()
+        )
+        self.assertEqual([6], find_entries_to_shuffle(exclude_all, flags).tolist())
+
+
+class TestBiasedByStatTotalShuffle(unittest.TestCase):
+    def test_shuffle_batch_matches_shuffle(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            stat_totals = BtlEnmyPrmTable.from_bin(input_stream).simple_stat_totals
+
+        seeds = [0, 1, 42, 2**40 + 7]
+        for leniency in [0, 10, 200]:
+            policy = BiasedByStatTotalShuffle(leniency)
+
+            actual = policy.shuffle_batch(stat_totals, seeds)
+
+            for seed, permutation in zip(seeds, actual):
+                expected = policy.shuffle(stat_totals, random.Random(seed))
+
+                self.assertEqual(expected.tolist(), permutation.tolist())
+
+    def test_find_encounter_mappings(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            data = input_stream.read()
+
+        flags = load_btl_enmy_prm_flags()
+        seeds = [3, 42]
+        state = State(
+            monsters=Monsters(
+                randomize=True,
+                include_bosses=False,
+                transfer_boss_item_drops=False,
+                include_starters=True,
+                include_gift_monsters=True,
+                randomization_policy=BiasedByStatTotalMonsterShuffle(50),
+            )
+        )
+
+        mappings = find_encounter_mappings(
+            state, flags, BtlEnmyPrmTable(data[8:]), seeds
+        )
+
+        original = BtlEnmyPrmTable(data[8:])
+        for seed, mapping in zip(seeds, mappings):
+            state.seed = seed
+            output_stream = io.BytesIO()
+            randomize_btl_enmy_prm(state, io.BytesIO(data), output_stream)
+            output_stream.seek(0)
+
+            randomized = BtlEnmyPrmTable.from_bin(output_stream)
+
+            self.assertEqual(
+                original.records[mapping].tobytes(), randomized.records.tobytes()
+            )
+
+
+class TestRandomizeBtlEnmyPrm(unittest.TestCase):
+    def test_concurrent_runs_match_serial_runs(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            data = input_stream.read()
+
+        def run(seed: int) -> bytes:
+            state = State(
+                seed=seed,
+                monsters=Monsters(
+                    randomize=True,
+                    include_bosses=True,
+                    transfer_boss_item_drops=True,
+                    include_starters=True,
+                    include_gift_monsters=True,
+                    randomization_policy=BiasedByStatTotalMonsterShuffle(50),
+                ),
+            )
+            output_stream = io.BytesIO()
+            randomize_btl_enmy_prm(state, io.BytesIO(data), output_stream)
+            return output_stream.getvalue()
+
+        seeds = list(range(8))
+        expected = [run(seed) for seed in seeds]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            actual = list(executor.map(run, seeds))
+
+        self.assertEqual(expected, actual)
+
+    def test_patches_match_full_output(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            data = input_stream.read()
+
+        state = State(
+            seed=7,
+            monsters=Monsters(
+                randomize=True,
+                include_bosses=True,
+                transfer_boss_item_drops=True,
+                include_starters=True,
+                include_gift_monsters=True,
+                randomization_policy=BiasedByStatTotalMonsterShuffle(50),
+            ),
+        )
+
+        output_stream = io.BytesIO()
+        randomize_btl_enmy_prm(state, io.BytesIO(data), output_stream)
+
+        patches = btl_enmy_prm_patches(state, data)
+
+        self.assertGreater(len(patches), 0)
+        self.assertTrue(all(patch.offset >= 8 for patch in patches))
+        self.assertEqual(output_stream.getvalue(), apply_patches(data, patches))
+
+    def test_plan_only_touches_moved_entries(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            table = BtlEnmyPrmTable.from_bin(input_stream)
+
+        state = State(
+            monsters=Monsters(
+                randomize=True,
+                include_bosses=False,
+                transfer_boss_item_drops=True,
+                include_starters=True,
+                include_gift_monsters=True,
+                swap_gold_drops=True,
+                randomization_policy=BiasedByStatTotalMonsterShuffle(20),
+            ),
+        )
+
+        plan = plan_btl_enmy_prm_shuffle(
+            state, load_btl_enmy_prm_flags(), table, random.Random(42)
+        )
+        plan.apply(table)
+
+        self.assertTrue(np.all(plan.indices != plan.sources))
+        self.assertEqual(plan.indices.tolist(), table.dirty_indices.tolist())
+        self.assertEqual(
+            table.original_records["gold"][plan.indices].tolist(),
+            table.records["gold"][plan.indices].tolist(),
+        )
+
+    def test_flags_must_match_table_length(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            table = BtlEnmyPrmTable.from_bin(input_stream)
+
+        state = State(
+            monsters=Monsters(
+                randomize=True,
+                include_bosses=True,
+                transfer_boss_item_drops=True,
+                include_starters=True,
+                include_gift_monsters=True,
+                randomization_policy=BiasedByStatTotalMonsterShuffle(20),
+            ),
+        )
+
+        flags = load_btl_enmy_prm_flags()
+        for wrong_flags in [flags[:-1], np.concatenate([flags, flags[:1]])]:
+            with self.assertRaises(BtlEnmyPrmFlagsLengthMismatchError):
+                plan_btl_enmy_prm_shuffle(state, wrong_flags, table, random.Random(42))
+
+            with self.assertRaises(BtlEnmyPrmFlagsLengthMismatchError):
+                find_encounter_mappings(state, wrong_flags, table, [42])
+
+
+class TestIterBtlEnmyPrm(unittest.TestCase):
+    def test_stream_and_buffer_match_table(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            data = input_stream.read()
+
+        expected = BtlEnmyPrm.from_bin(io.BytesIO(data)).entries
+
+        from_stream = [
+            view.to_entry()
+            for view in iter_btl_enmy_prm(io.BytesIO(data), chunk_size=100)
+        ]
+        from_buffer = [view.to_entry() for view in iter_btl_enmy_prm(data)]
+
+        self.assertEqual(expected, from_stream)
+        self.assertEqual(expected, from_buffer)
+
+    def test_invalid_magic(self) -> None:
+        with self.assertRaises(InvalidBtlEnmyPrmMagicError):
+            list(iter_btl_enmy_prm(io.BytesIO(b"ABCD\x00\x00\x00\x00")))
+
+        with self.assertRaises(InvalidBtlEnmyPrmMagicError):
+            BtlEnmyPrm.from_bin(io.BytesIO(b"BEP"))
+
+    def test_truncated(self) -> None:
+        with DUMMY_BTL_ENMY_PRM_FILEPATH.open("rb") as input_stream:
+            data = input_stream.read()[:-1]
+
+        with self.assertRaises(TruncatedBtlEnmyPrmError):
+            list(iter_btl_enmy_prm(io.BytesIO(data)))
+
+        with self.assertRaises(TruncatedBtlEnmyPrmError):
+            list(iter_btl_enmy_prm(data))
+
+        with self.assertRaises(TruncatedBtlEnmyPrmError):
+            BtlEnmyPrmTable.from_bin(io.BytesIO(data))
@@ -0,0 +1,583 @@
+import ast
+import collections
+import dataclasses
+import io
+import pathlib
+import pickle
+import struct
+import unittest
+
+from dqmj1_randomizer.randomize.character_encoding import (
+    CHARACTER_ENCODINGS,
+    CharacterEncoding,
+)
+from dqmj1_randomizer.randomize.evt import (
+    INSTRUCTION_TYPES,
+    INSTRUCTION_TYPES_BY_NAME,
+    ArgumentType,
+    Event,
+    EvtBufferOverflowError,
+    EvtInstructionParseError,
+    GenericCodec,
+    Instruction,
+    InstructionType,
+    LazyEvent,
+    Script,
+    ScriptInstructionParseIndexError,
+    ScriptLineOutsideSectionError,
+    ScriptLiteralParseError,
+    ValueLocation,
+    compile_codec,
+    instruction_type_patches,
+    parse_bytes_literal,
+    parse_int_literal,
+    parse_string_literal,
+    unknown_instruction_type,
+)
+from dqmj1_randomizer.randomize.patch import apply_patches
+
+DUMMY_EVENT_FILEPATH = (
+    pathlib.Path(__file__).parent.parent
+    / "regression_tests"
+    / "inputs"
+    / "dummy_event.evt"
+)
+
+CHARACTER_ENCODING = CHARACTER_ENCODINGS["North America / Europe"]
+
+
+def load_dummy_event_bytes() -> bytes:
+    with DUMMY_EVENT_FILEPATH.open("rb") as input_stream:
+        return input_stream.read()
+
+
+class TestEvent(unittest.TestCase):
+    def test_evt_round_trip(self) -> None:
+        data = load_dummy_event_bytes()
+
+        event = Event.from_evt(io.BytesIO(data), CHARACTER_ENCODING)
+
+        output_stream = io.BytesIO()
+        event.write_evt(output_stream, CHARACTER_ENCODING)
+
+        self.assertEqual(data, output_stream.getvalue())
+
+    def test_to_evt_with_short_data(self) -> None:
+        event = Event.from_evt(io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING)
+        event.data = b"\x01\x02\x03"
+
+        output_stream = io.BytesIO()
+        for instruction in event.instructions:
+            instruction.write_evt(output_stream, event.labels, CHARACTER_ENCODING)
+
+        self.assertEqual(
+            b"SCR\x00\x01\x02\x03" + output_stream.getvalue(),
+            event.to_evt(CHARACTER_ENCODING),
+        )
+
+    def test_from_buffer_data_is_a_view(self) -> None:
+        data = load_dummy_event_bytes()
+
+        event = Event.from_buffer(data, CHARACTER_ENCODING)
+
+        self.assertIsInstance(event.data, memoryview)
+        self.assertEqual(data[4:0x1004], event.data)
+
+    def test_from_buffer_incorrect_instruction_size(self) -> None:
+        data = bytearray(load_dummy_event_bytes())
+
+        # Make the first instruction claim to be 4 bytes longer than it is
+        (length,) = struct.unpack_from("<I", data, 0x1004 + 4)
+        struct.pack_into("<I", data, 0x1004 + 4, length + 4)
+
+        with self.assertRaises(EvtInstructionParseError):
+            Event.from_buffer(bytes(data), CHARACTER_ENCODING)
+
+    def test_script_round_trip(self) -> None:
+        data = load_dummy_event_bytes()
+
+        event = Event.from_evt(io.BytesIO(data), CHARACTER_ENCODING)
+
+        script_stream = io.StringIO()
+        event.write_script(script_stream, CHARACTER_ENCODING)
+        script_stream.seek(0)
+
+        event = Event.from_script(script_stream, CHARACTER_ENCODING)
+        output_stream = io.BytesIO()
+        event.write_evt(output_stream, CHARACTER_ENCODING)
+
+        self.assertEqual(data, output_stream.getvalue())
+
+    def test_from_script_line_outside_section(self) -> None:
+        script = 'Nop0\n.data:\n    b"\\x00"\n'
+
+        with self.assertRaisesRegex(ScriptLineOutsideSectionError, "Line 1"):
+            Event.from_script(io.StringIO(script), CHARACTER_ENCODING)
+
+    def test_to_script_and_back(self) -> None:
+        data = load_dummy_event_bytes()
+
+        event = Event.from_evt(io.BytesIO(data), CHARACTER_ENCODING)
+        script = event.to_script(CHARACTER_ENCODING)
+        self.assertIsInstance(script, Script)
+
+        output_stream = io.BytesIO()
+        script.to_event(CHARACTER_ENCODING).write_evt(output_stream, CHARACTER_ENCODING)
+
+        self.assertEqual(data, output_stream.getvalue())
+
+    def test_script_conversions_share_instructions(self) -> None:
+        event = Event.from_evt(io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING)
+
+        script = event.to_script(CHARACTER_ENCODING)
+        script_instructions = [e for e in script.entries if isinstance(e, Instruction)]
+        for instruction, script_instruction in zip(
+            event.instructions, script_instructions, strict=True
+        ):
+            self.assertIs(instruction, script_instruction)
+
+        for instruction, event_instruction in zip(
+            script_instructions,
+            script.to_event(CHARACTER_ENCODING).instructions,
+            strict=True,
+        ):
+            self.assertIs(instruction, event_instruction)
+
+    def test_instructions_have_no_dict(self) -> None:
+        event = Event.from_evt(io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING)
+
+        self.assertFalse(hasattr(event, "__dict__"))
+        self.assertFalse(hasattr(event.instructions[0], "__dict__"))
+
+
+class TestInstruction(unittest.TestCase):
+    def test_length_matches_written_length(self) -> None:
+        event = Event.from_evt(io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING)
+
+        for instruction in event.instructions:
+            output_stream = io.BytesIO()
+            instruction.write_evt(
+                output_stream, collections.defaultdict(lambda: 0), CHARACTER_ENCODING
+            )
+
+            self.assertEqual(
+                len(output_stream.getvalue()),
+                instruction.length(CHARACTER_ENCODING),
+                instruction,
+            )
+
+    def test_length_is_cached_per_character_encoding(self) -> None:
+        instruction = Instruction(
+            instruction_type=INSTRUCTION_TYPES_BY_NAME["SetDialog"],
+            arguments=("aaaa",),
+        )
+
+        # Encodings that are freed and recreated, so may be given the same ids
+        for i in range(10):
+            bytes_per_char = 1 + i % 2
+            character_encoding = CharacterEncoding(
+                byte_to_char_map=[(list(range(1, bytes_per_char + 1)), "a")]
+            )
+
+            self.assertEqual(
+                instruction.compute_length(character_encoding),
+                instruction.length(character_encoding),
+            )
+            del character_encoding
+
+    def test_pack_into_does_not_grow_buffer(self) -> None:
+        for instruction in [
+            Instruction(INSTRUCTION_TYPES_BY_NAME["SetDialog"], ("Hello there",)),
+            Instruction(INSTRUCTION_TYPES_BY_NAME["LoadPos"], ("hello_there",)),
+            Instruction(unknown_instruction_type(0x12345), (b"\x01" * 16,)),
+        ]:
+            buffer = bytearray(instruction.length(CHARACTER_ENCODING) - 4)
+            with self.assertRaises(EvtBufferOverflowError):
+                instruction.pack_into(buffer, 0, {}, CHARACTER_ENCODING)
+
+            self.assertEqual(instruction.length(CHARACTER_ENCODING) - 4, len(buffer))
+
+    def test_replace(self) -> None:
+        instruction = Instruction(
+            instruction_type=INSTRUCTION_TYPES_BY_NAME["SetDialog"],
+            arguments=("Hi",),
+        )
+        self.assertEqual(12, instruction.length(CHARACTER_ENCODING))
+
+        replaced = instruction.replace(arguments=("Hello there",))
+        self.assertEqual(20, replaced.length(CHARACTER_ENCODING))
+        self.assertEqual(12, instruction.length(CHARACTER_ENCODING))
+
+        nop = instruction.replace(instruction_type=INSTRUCTION_TYPES_BY_NAME["NopAA"])
+        self.assertIs(instruction.arguments, nop.arguments)
+        self.assertEqual(
+            INSTRUCTION_TYPES_BY_NAME["SetDialog"], instruction.instruction_type
+        )
+
+    def test_instructions_are_immutable(self) -> None:
+        instruction = Instruction(
+            instruction_type=INSTRUCTION_TYPES_BY_NAME["SetDialog"],
+            arguments=("Hi",),
+        )
+
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            instruction.arguments = ("Hello there",)  # type: ignore[misc]
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            instruction.instruction_type.type_id = 0xAA  # type: ignore[misc]
+
+    def test_instruction_types_are_shared(self) -> None:
+        event = Event.from_evt(io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING)
+
+        for instruction in event.instructions:
+            self.assertIs(
+                Instruction.get_instruction_type(instruction.type_id),
+                instruction.instruction_type,
+            )
+
+        self.assertIs(
+            Instruction.get_instruction_type(0xFFFF),
+            Instruction.get_instruction_type(0xFFFF),
+        )
+
+    def test_from_script(self) -> None:
+        instruction = Instruction.from_script('SetDialog  "Hello there"')
+        self.assertEqual(
+            Instruction(
+                instruction_type=INSTRUCTION_TYPES_BY_NAME["SetDialog"],
+                arguments=("Hello there",),
+            ),
+            instruction,
+        )
+
+        for instruction in Event.from_evt(
+            io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING
+        ).instructions:
+            self.assertEqual(
+                instruction, Instruction.from_script(instruction.to_script())
+            )
+
+    def test_from_script_value_locations(self) -> None:
+        instruction = Instruction.from_script("SetFlagTrue Pool_1 0x2 Const 3")
+        assert instruction is not None
+
+        self.assertEqual(
+            (ValueLocation.One, 0x2, ValueLocation.Constant, 0x3),
+            instruction.arguments,
+        )
+
+    def test_from_script_missing_argument(self) -> None:
+        with self.assertRaises(ScriptInstructionParseIndexError):
+            Instruction.from_script("SetDialog")
+
+    def test_from_script_invalid_literal(self) -> None:
+        with self.assertRaises(ScriptLiteralParseError):
+            Instruction.from_script("SetDialog Hello")
+
+
+class TestArgumentsCodec(unittest.TestCase):
+    def test_instruction_types_have_specialized_codecs(self) -> None:
+        for instruction_type in INSTRUCTION_TYPES:
+            self.assertNotIsInstance(
+                instruction_type.codec, GenericCodec, instruction_type
+            )
+
+    def test_matches_generic_codec(self) -> None:
+        event = Event.from_evt(io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING)
+        labels: dict[str, int] = collections.defaultdict(lambda: 0x10)
+
+        for instruction in event.instructions:
+            codec = instruction.instruction_type.codec
+            generic_codec = GenericCodec(instruction.instruction_type.arguments)
+
+            length = codec.length(instruction.arguments, CHARACTER_ENCODING)
+            self.assertEqual(
+                length,
+                generic_codec.length(instruction.arguments, CHARACTER_ENCODING),
+            )
+
+            buffer = bytearray(length)
+            codec.pack_into(
+                buffer, 0, instruction.arguments, labels, CHARACTER_ENCODING
+            )
+            generic_buffer = bytearray(length)
+            generic_codec.pack_into(
+                generic_buffer, 0, instruction.arguments, labels, CHARACTER_ENCODING
+            )
+            self.assertEqual(generic_buffer, buffer)
+
+            self.assertEqual(
+                generic_codec.decode(bytes(buffer), 0, length, CHARACTER_ENCODING),
+                codec.decode(bytes(buffer), 0, length, CHARACTER_ENCODING),
+            )
+
+    def test_mixed_argument_types(self) -> None:
+        instruction_type = InstructionType(
+            0x1234,
+            "Mixed",
+            (ArgumentType.U32, ArgumentType.InstructionLocation, ArgumentType.String),
+        )
+        self.assertIsInstance(instruction_type.codec, GenericCodec)
+
+        instruction = Instruction(
+            instruction_type=instruction_type, arguments=(0x5, "0x20", "Hi")
+        )
+        buffer = bytearray(instruction.length(CHARACTER_ENCODING))
+        instruction.pack_into(buffer, 0, {"0x20": 0x20}, CHARACTER_ENCODING)
+
+        self.assertEqual(
+            (instruction, {"0x20": 0x20}),
+            Instruction.decode(
+                instruction_type, bytes(buffer), 8, len(buffer), CHARACTER_ENCODING
+            ),
+        )
+
+    def test_missing_arguments_are_not_written(self) -> None:
+        for name in ["NopAA", "SetFlagTrue", "SetDialog"]:
+            instruction = Instruction(INSTRUCTION_TYPES_BY_NAME[name], ())
+
+            with self.assertRaises((IndexError, struct.error)):
+                instruction.write_evt(io.BytesIO(), {}, CHARACTER_ENCODING)
+
+        instruction = Instruction(INSTRUCTION_TYPES_BY_NAME["ShowDialog"], ())
+        output_stream = io.BytesIO()
+        instruction.write_evt(output_stream, {}, CHARACTER_ENCODING)
+        self.assertEqual(struct.pack("<II", 0x27, 8), output_stream.getvalue())
+
+    def test_codecs_are_shared_and_can_be_pickled(self) -> None:
+        instruction_type = INSTRUCTION_TYPES_BY_NAME["SetFlagTrue"]
+
+        self.assertIs(compile_codec(instruction_type.arguments), instruction_type.codec)
+
+        unpickled = pickle.loads(pickle.dumps(instruction_type))
+        self.assertEqual(instruction_type, unpickled)
+        data = struct.pack("<IIII", 1, 0x20, 2, 0x30)
+        self.assertEqual(
+            instruction_type.codec.decode(data, 0, len(data), CHARACTER_ENCODING),
+            unpickled.codec.decode(data, 0, len(data), CHARACTER_ENCODING),
+        )
+
+
+class TestScriptLiterals(unittest.TestCase):
+    def test_parse_int_literal(self) -> None:
+        for literal in ["0x1f", "0X1F", "31", "0", "0o17", "0b101", "0xFFFFFFFF"]:
+            self.assertEqual(ast.literal_eval(literal), parse_int_literal(literal))
+
+        # Values that do not fit in an unsigned 32 bit argument
+        for literal in ["", "0x", "1f", '"1"', "-0x1", "-1", "0x100000000"]:
+            with self.assertRaises(ScriptLiteralParseError):
+                parse_int_literal(literal)
+
+    def test_parse_string_literal(self) -> None:
+        for literal in [
+            '""',
+            '"Hello there"',
+            "'Hello there'",
+            r'"a\nb\tc\\d"',
+            r'"\x41\u00e9\U0001F600\101\0"',
+            '"caf\u00e9 ♪"',
+        ]:
+            self.assertEqual(ast.literal_eval(literal), parse_string_literal(literal))
+
+        # Unrecognized escapes are left as-is
+        self.assertEqual("a \\q b", parse_string_literal(r'"a \q b"'))
+
+        for literal in ["", '"', "abc", "\"abc'"]:
+            with self.assertRaises(ScriptLiteralParseError):
+                parse_string_literal(literal)
+
+    def test_parse_bytes_literal(self) -> None:
+        for literal in [
+            'b""',
+            'b"\\x00\\x01\\xfF"',
+            "b'\\x00'",
+            'b"abc"',
+            r'b"a\nb\\c\0\101"',
+        ]:
+            self.assertEqual(ast.literal_eval(literal), parse_bytes_literal(literal))
+
+        # Unrecognized escapes are left as-is
+        self.assertEqual(b"\\u00e9", parse_bytes_literal(r'b"\u00e9"'))
+
+        for literal in ["", 'b"', '"abc"', "b\"abc'", 'b"é"']:
+            with self.assertRaises(ScriptLiteralParseError):
+                parse_bytes_literal(literal)
+
+
+class TestEventOffsets(unittest.TestCase):
+    def test_instruction_offsets(self) -> None:
+        event = Event.from_evt(io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING)
+
+        offsets = event.instruction_offsets(CHARACTER_ENCODING)
+
+        self.assertEqual(len(event.instructions) + 1, len(offsets))
+        self.assertEqual(0x0, offsets[0])
+        self.assertEqual(len(load_dummy_event_bytes()) - 0x1004, offsets[-1])
+        for i, instruction in enumerate(event.instructions):
+            self.assertEqual(
+                offsets[i] + instruction.length(CHARACTER_ENCODING), offsets[i + 1]
+            )
+
+    def test_get_instruction_at_ptr(self) -> None:
+        event = Event.from_evt(io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING)
+        offsets = event.instruction_offsets(CHARACTER_ENCODING)
+
+        for i in [0, 1, 500, len(event.instructions) - 1]:
+            self.assertEqual(
+                i, event.get_instruction_index_at_ptr(offsets[i], CHARACTER_ENCODING)
+            )
+            self.assertIs(
+                event.instructions[i],
+                event.get_instruction_at_ptr(offsets[i], CHARACTER_ENCODING),
+            )
+
+        # Pointers into the middle of an instruction or past the end of the code
+        self.assertIsNone(
+            event.get_instruction_at_ptr(offsets[3] + 4, CHARACTER_ENCODING)
+        )
+        self.assertIsNone(event.get_instruction_at_ptr(offsets[-1], CHARACTER_ENCODING))
+
+    def test_offsets_are_recomputed_when_instructions_are_added(self) -> None:
+        event = Event.from_evt(io.BytesIO(load_dummy_event_bytes()), CHARACTER_ENCODING)
+        end = event.instruction_offsets(CHARACTER_ENCODING)[-1]
+
+        instruction = Instruction(
+            instruction_type=INSTRUCTION_TYPES_BY_NAME["SetDialog"],
+            arguments=("Hi",),
+        )
+        event.instructions.append(instruction)
+
+        self.assertEqual(
+            end + instruction.length(CHARACTER_ENCODING),
+            event.instruction_offsets(CHARACTER_ENCODING)[-1],
+        )
+        self.assertIs(
+            instruction, event.get_instruction_at_ptr(end, CHARACTER_ENCODING)
+        )
+
+    def test_offsets_are_recomputed_when_instructions_are_replaced(self) -> None:
+        data = load_dummy_event_bytes()
+        event = Event.from_buffer(data, CHARACTER_ENCODING)
+        self.assertEqual(data, event.to_evt(CHARACTER_ENCODING))
+
+        index = next(
+            i
+            for i, instruction in enumerate(event.instructions)
+            if instruction.instruction_type == INSTRUCTION_TYPES_BY_NAME["SetDialog"]
+        )
+        old_length = event.instructions[index].length(CHARACTER_ENCODING)
+        event.instructions[index] = event.instructions[index].replace(
+            arguments=("a" * 64,)
+        )
+        new_length = event.instructions[index].length(CHARACTER_ENCODING)
+        self.assertGreater(new_length, old_length)
+
+        data = bytes(event.to_evt(CHARACTER_ENCODING))
+        self.assertEqual(
+            len(load_dummy_event_bytes()) + new_length - old_length, len(data)
+        )
+        self.assertEqual(
+            event.instructions, Event.from_buffer(data, CHARACTER_ENCODING).instructions
+        )
+
+
+class TestLazyEvent(unittest.TestCase):
+    def test_evt_round_trip(self) -> None:
+        data = load_dummy_event_bytes()
+
+        event = LazyEvent.from_buffer(data, CHARACTER_ENCODING)
+
+        self.assertEqual(data, event.to_evt())
+        self.assertFalse(any(event.is_decoded(i) for i in range(len(event))))
+
+    def test_matches_event(self) -> None:
+        data = load_dummy_event_bytes()
+
+        expected = Event.from_buffer(data, CHARACTER_ENCODING)
+        event = LazyEvent.from_buffer(data, CHARACTER_ENCODING)
+
+        self.assertEqual(len(expected.instructions), len(event))
+        for i in [0, 1, 500, len(event) - 1]:
+            self.assertEqual(
+                expected.instructions[i].instruction_type, event.instruction_type(i)
+            )
+            self.assertEqual(expected.instructions[i], event[i])
+
+        self.assertEqual(expected.instructions, event.to_event().instructions)
+
+    def test_replace_with_same_size_instruction(self) -> None:
+        data = load_dummy_event_bytes()
+
+        expected = Event.from_buffer(data, CHARACTER_ENCODING)
+        event = LazyEvent.from_buffer(data, CHARACTER_ENCODING)
+
+        offsets = expected.instruction_offsets(CHARACTER_ENCODING)
+
+        nop = INSTRUCTION_TYPES_BY_NAME["NopAA"]
+        for i in range(len(event)):
+            if event.instruction_type(i).name == "ShowDialog":
+                event[i] = Instruction(
+                    instruction_type=nop,
+                    arguments=(bytes(event.instruction_data(i)),),
+                )
+                expected.instructions[i] = Instruction(
+                    instruction_type=nop,
+                    arguments=(
+                        data[0x1004 + offsets[i] + 8 : 0x1004 + offsets[i + 1]],
+                    ),
+                )
+
+        self.assertEqual(expected.to_evt(CHARACTER_ENCODING), event.to_evt())
+
+    def test_replace_with_different_size_instruction(self) -> None:
+        data = load_dummy_event_bytes()
+
+        expected = Event.from_buffer(data, CHARACTER_ENCODING)
+        event = LazyEvent.from_buffer(data, CHARACTER_ENCODING)
+
+        instruction = Instruction(
+            instruction_type=INSTRUCTION_TYPES_BY_NAME["SetDialog"],
+            arguments=("Hello there",),
+        )
+        expected.instructions[3] = instruction
+        event[3] = instruction
+
+        self.assertEqual(expected.to_evt(CHARACTER_ENCODING), event.to_evt())
+        self.assertFalse(event.is_decoded(4))
+
+    def test_incorrect_instruction_size(self) -> None:
+        data = bytearray(load_dummy_event_bytes())
+
+        # Make the last instruction claim to go past the end of the file
+        event = LazyEvent.from_buffer(bytes(data), CHARACTER_ENCODING)
+        offset = event.offsets[-1]
+        struct.pack_into("<I", data, offset + 4, event.lengths[-1] + 4)
+
+        with self.assertRaises(EvtInstructionParseError):
+            LazyEvent.from_buffer(bytes(data), CHARACTER_ENCODING)
+
+
+class TestInstructionTypePatches(unittest.TestCase):
+    def test_matches_script_round_trip(self) -> None:
+        data = load_dummy_event_bytes()
+        show_dialog = INSTRUCTION_TYPES_BY_NAME["ShowDialog"]
+        nop = INSTRUCTION_TYPES_BY_NAME["NopAA"]
+
+        # Replace the instructions by decoding the whole event
+        script = Event.from_buffer(data, CHARACTER_ENCODING).to_script(
+            CHARACTER_ENCODING
+        )
+        num_replaced = 0
+        for i, entry in enumerate(script.entries):
+            if isinstance(entry, Instruction) and entry.instruction_type == show_dialog:
+                # ShowDialog has no arguments, so the nop has no data
+                script.entries[i] = entry.replace(
+                    instruction_type=nop, arguments=(b"",)
+                )
+                num_replaced += 1
+        expected = script.to_event(CHARACTER_ENCODING).to_evt(CHARACTER_ENCODING)
+
+        patches = instruction_type_patches(data, show_dialog.type_id, nop.type_id)
+
+        self.assertGreater(num_replaced, 0)
+        self.assertEqual(num_replaced, len(patches))
+        self.assertEqual(expected, apply_patches(data, patches))
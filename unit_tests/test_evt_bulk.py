@@ -0,0 +1,327 @@
+import io
+import pathlib
+import struct
+import tempfile
+import unittest
+
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt import Event
+from dqmj1_randomizer.randomize.evt_bulk import (
+    BUILD_DIRECTORY_NAME,
+    BUILD_MANIFEST_FILENAME,
+    MANIFEST_FILENAME,
+    EventWorkerError,
+    assemble_events,
+    disassemble_events,
+    get_script_filepath,
+    run_in_workers,
+)
+
+DUMMY_EVENT_FILEPATH = (
+    pathlib.Path(__file__).parent.parent
+    / "regression_tests"
+    / "inputs"
+    / "dummy_event.evt"
+)
+
+CHARACTER_ENCODING_NAME = "North America / Europe"
+CHARACTER_ENCODING = CHARACTER_ENCODINGS[CHARACTER_ENCODING_NAME]
+
+
+def load_dummy_event_bytes() -> bytes:
+    with DUMMY_EVENT_FILEPATH.open("rb") as input_stream:
+        return input_stream.read()
+
+
+def create_evt_files() -> dict[str, bytes]:
+    data = load_dummy_event_bytes()
+
+    # Same event, but with a different data block
+    other_data = bytearray(data)
+    other_data[4:8] = b"\x01\x02\x03\x04"
+
+    return {"a.evt": data, "b.evt": bytes(other_data)}
+
+
+def fail_on_empty(data: bytes, character_encoding_name: str) -> bytes:
+    if len(data) == 0:
+        raise struct.error("empty")
+
+    return data
+
+
+def to_script(data: bytes) -> str:
+    output_stream = io.StringIO()
+    Event.from_buffer(data, CHARACTER_ENCODING).write_script(
+        output_stream, CHARACTER_ENCODING
+    )
+
+    return output_stream.getvalue()
+
+
+class TestDisassembleEvents(unittest.TestCase):
+    def test_writes_scripts(self) -> None:
+        evt_files = create_evt_files()
+
+        with tempfile.TemporaryDirectory() as output_directory:
+            result = disassemble_events(
+                evt_files,
+                pathlib.Path(output_directory),
+                CHARACTER_ENCODING_NAME,
+                max_workers=2,
+            )
+
+            self.assertEqual(["a.evt", "b.evt"], sorted(result.written))
+            self.assertEqual([], result.skipped)
+            self.assertEqual({}, result.failed)
+
+            for filename, data in evt_files.items():
+                script_filepath = get_script_filepath(
+                    pathlib.Path(output_directory), filename
+                )
+                self.assertEqual(
+                    to_script(data), script_filepath.read_text(encoding="utf-8")
+                )
+
+    def test_skips_up_to_date_scripts(self) -> None:
+        evt_files = create_evt_files()
+
+        with tempfile.TemporaryDirectory() as output_directory_str:
+            output_directory = pathlib.Path(output_directory_str)
+            disassemble_events(evt_files, output_directory, CHARACTER_ENCODING_NAME)
+
+            result = disassemble_events(
+                evt_files, output_directory, CHARACTER_ENCODING_NAME
+            )
+            self.assertEqual([], result.written)
+            self.assertEqual(["a.evt", "b.evt"], sorted(result.skipped))
+
+            # Changed evt files and edited script files are both rewritten
+            evt_files["a.evt"] = (
+                evt_files["a.evt"][:4] + b"\xff" + evt_files["a.evt"][5:]
+            )
+            get_script_filepath(output_directory, "b.evt").write_text("edited")
+
+            result = disassemble_events(
+                evt_files, output_directory, CHARACTER_ENCODING_NAME
+            )
+            self.assertEqual(["a.evt", "b.evt"], sorted(result.written))
+            self.assertEqual(
+                to_script(evt_files["b.evt"]),
+                get_script_filepath(output_directory, "b.evt").read_text(
+                    encoding="utf-8"
+                ),
+            )
+
+            # Switching the character encoding invalidates the manifest
+            result = disassemble_events(evt_files, output_directory, "Japan")
+            self.assertEqual([], result.skipped)
+
+    def test_failed_events_are_reported(self) -> None:
+        evt_files = create_evt_files()
+
+        with tempfile.TemporaryDirectory() as output_directory_str:
+            output_directory = pathlib.Path(output_directory_str)
+            disassemble_events(evt_files, output_directory, CHARACTER_ENCODING_NAME)
+
+            # Make the first instruction claim to be 4 bytes longer than it is
+            data = bytearray(evt_files["a.evt"])
+            (length,) = struct.unpack_from("<I", data, 0x1004 + 4)
+            struct.pack_into("<I", data, 0x1004 + 4, length + 4)
+            evt_files["a.evt"] = bytes(data)
+
+            result = disassemble_events(
+                evt_files, output_directory, CHARACTER_ENCODING_NAME
+            )
+
+            self.assertEqual([], result.written)
+            self.assertEqual(["b.evt"], result.skipped)
+            self.assertEqual(["a.evt"], list(result.failed))
+            self.assertFalse(get_script_filepath(output_directory, "a.evt").exists())
+            self.assertNotIn(
+                "a.evt", (output_directory / MANIFEST_FILENAME).read_text()
+            )
+
+    def test_removed_events_are_deleted(self) -> None:
+        evt_files = create_evt_files()
+
+        with tempfile.TemporaryDirectory() as output_directory_str:
+            output_directory = pathlib.Path(output_directory_str)
+            disassemble_events(evt_files, output_directory, CHARACTER_ENCODING_NAME)
+
+            del evt_files["a.evt"]
+            result = disassemble_events(
+                evt_files, output_directory, CHARACTER_ENCODING_NAME
+            )
+
+            self.assertEqual(["b.evt"], result.skipped)
+            self.assertFalse(get_script_filepath(output_directory, "a.evt").exists())
+            self.assertEqual(
+                ["b.evt"],
+                list(
+                    assemble_events(output_directory, CHARACTER_ENCODING_NAME).evt_files
+                ),
+            )
+
+    def test_malformed_events_are_reported(self) -> None:
+        evt_files = create_evt_files()
+        data = evt_files["a.evt"]
+
+        # First instruction claims to be longer than the whole file, or shorter than its header
+        too_long = bytearray(data)
+        struct.pack_into("<I", too_long, 0x1004 + 4, 0xFFFFFFFF)
+        too_short = bytearray(data)
+        struct.pack_into("<I", too_short, 0x1004 + 4, 3)
+
+        malformed = {
+            "header_only.evt": data[: 0x1004 + 4],
+            "truncated.evt": data[:-3],
+            "too_long.evt": bytes(too_long),
+            "too_short.evt": bytes(too_short),
+        }
+
+        with tempfile.TemporaryDirectory() as output_directory_str:
+            output_directory = pathlib.Path(output_directory_str)
+            result = disassemble_events(
+                {**evt_files, **malformed},
+                output_directory,
+                CHARACTER_ENCODING_NAME,
+                max_workers=2,
+            )
+
+            self.assertEqual(sorted(malformed), sorted(result.failed))
+            self.assertEqual(["a.evt", "b.evt"], sorted(result.written))
+            for filename in malformed:
+                self.assertFalse(
+                    get_script_filepath(output_directory, filename).exists()
+                )
+
+
+class TestRunInWorkers(unittest.TestCase):
+    def test_other_errors_are_reported(self) -> None:
+        results = dict(
+            run_in_workers(
+                fail_on_empty,
+                {"a.evt": b"a", "empty.evt": b""},
+                CHARACTER_ENCODING_NAME,
+                max_workers=2,
+            )
+        )
+
+        self.assertEqual(b"a", results["a.evt"])
+        self.assertIsInstance(results["empty.evt"], EventWorkerError)
+        self.assertEqual("error: empty", str(results["empty.evt"]))
+
+
+class TestAssembleEvents(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        evt_files = create_evt_files()
+
+        with tempfile.TemporaryDirectory() as script_directory_str:
+            script_directory = pathlib.Path(script_directory_str)
+            disassemble_events(evt_files, script_directory, CHARACTER_ENCODING_NAME)
+
+            result = assemble_events(
+                script_directory, CHARACTER_ENCODING_NAME, max_workers=2
+            )
+
+            self.assertEqual(evt_files, result.evt_files)
+            self.assertEqual(["a.evt", "b.evt"], sorted(result.compiled))
+            self.assertEqual({}, result.failed)
+            self.assertTrue(
+                (
+                    script_directory / BUILD_DIRECTORY_NAME / BUILD_MANIFEST_FILENAME
+                ).exists()
+            )
+
+    def test_only_recompiles_changed_scripts(self) -> None:
+        evt_files = create_evt_files()
+
+        with (
+            tempfile.TemporaryDirectory() as script_directory_str,
+            tempfile.TemporaryDirectory() as build_directory_str,
+        ):
+            script_directory = pathlib.Path(script_directory_str)
+            build_directory = pathlib.Path(build_directory_str)
+            disassemble_events(evt_files, script_directory, CHARACTER_ENCODING_NAME)
+            assemble_events(
+                script_directory,
+                CHARACTER_ENCODING_NAME,
+                build_directory=build_directory,
+            )
+
+            result = assemble_events(
+                script_directory,
+                CHARACTER_ENCODING_NAME,
+                build_directory=build_directory,
+            )
+            self.assertEqual([], result.compiled)
+            self.assertEqual(["a.evt", "b.evt"], sorted(result.skipped))
+            self.assertEqual(evt_files, result.evt_files)
+
+            # Use the script of b.evt for a.evt
+            get_script_filepath(script_directory, "a.evt").write_bytes(
+                get_script_filepath(script_directory, "b.evt").read_bytes()
+            )
+
+            result = assemble_events(
+                script_directory,
+                CHARACTER_ENCODING_NAME,
+                build_directory=build_directory,
+            )
+            self.assertEqual(["a.evt"], result.compiled)
+            self.assertEqual(["b.evt"], result.skipped)
+            self.assertEqual(
+                {"a.evt": evt_files["b.evt"], "b.evt": evt_files["b.evt"]},
+                result.evt_files,
+            )
+
+    def test_failed_scripts_are_reported(self) -> None:
+        evt_files = create_evt_files()
+
+        with tempfile.TemporaryDirectory() as script_directory_str:
+            script_directory = pathlib.Path(script_directory_str)
+            disassemble_events(evt_files, script_directory, CHARACTER_ENCODING_NAME)
+
+            script_filepath = get_script_filepath(script_directory, "a.evt")
+            script_filepath.write_text(
+                script_filepath.read_text(encoding="utf-8") + "    NotAnInstruction\n",
+                encoding="utf-8",
+            )
+
+            result = assemble_events(script_directory, CHARACTER_ENCODING_NAME)
+
+            self.assertEqual(["b.evt"], result.compiled)
+            self.assertEqual(["a.evt"], list(result.failed))
+            self.assertEqual(["b.evt"], list(result.evt_files))
+
+    def test_malformed_scripts_are_reported(self) -> None:
+        evt_files = create_evt_files()
+        script = to_script(evt_files["a.evt"])
+        data_start = script.index(".data:")
+        code_start = script.index(".code:\n") + len(".code:\n")
+
+        scripts = {
+            # Arguments that do not fit in 32 bits
+            "big.evt": script[:code_start] + "    Cmd_0x0B Const 0x100000000\n",
+            "negative.evt": script[:code_start] + "    Cmd_0x0B Const -0x1\n",
+            # Code before any section
+            "no_section.evt": "    Nop0\n" + script[data_start:],
+            # Not UTF-8
+            "binary.evt": script[:code_start] + "    \udcff\n",
+        }
+
+        with tempfile.TemporaryDirectory() as script_directory_str:
+            script_directory = pathlib.Path(script_directory_str)
+            disassemble_events(evt_files, script_directory, CHARACTER_ENCODING_NAME)
+            for filename, contents in scripts.items():
+                get_script_filepath(script_directory, filename).write_bytes(
+                    contents.encode("utf-8", errors="surrogateescape")
+                )
+
+            result = assemble_events(
+                script_directory, CHARACTER_ENCODING_NAME, max_workers=2
+            )
+
+            self.assertEqual(sorted(scripts), sorted(result.failed))
+            self.assertEqual(evt_files, result.evt_files)
@@ -0,0 +1,168 @@
+import pathlib
+import struct
+import tempfile
+import unittest
+
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt import (
+    ArgumentType,
+    Event,
+    scan_instruction_headers,
+)
+from dqmj1_randomizer.randomize.evt_index import (
+    EventIndex,
+    InstructionReference,
+    get_index_filepath,
+)
+from dqmj1_randomizer.randomize.patch import BytePatch, apply_patches
+
+DUMMY_EVENT_FILEPATH = (
+    pathlib.Path(__file__).parent.parent
+    / "regression_tests"
+    / "inputs"
+    / "dummy_event.evt"
+)
+
+CHARACTER_ENCODING_NAME = "North America / Europe"
+CHARACTER_ENCODING = CHARACTER_ENCODINGS[CHARACTER_ENCODING_NAME]
+
+UNKNOWN_TYPE_ID = 0x12345
+
+
+def load_dummy_event_bytes() -> bytes:
+    with DUMMY_EVENT_FILEPATH.open("rb") as input_stream:
+        return input_stream.read()
+
+
+def create_evt_files() -> dict[str, bytes]:
+    data = load_dummy_event_bytes()
+
+    # Same event, but with the first instruction changed to an unknown type
+    offset, _, _ = next(scan_instruction_headers(data))
+    other_data = apply_patches(
+        data, [BytePatch(offset, struct.pack("<I", UNKNOWN_TYPE_ID))]
+    )
+
+    return {"a.evt": data, "b.evt": other_data}
+
+
+class TestEventIndex(unittest.TestCase):
+    def test_instructions(self) -> None:
+        evt_files = create_evt_files()
+        index = EventIndex.build(evt_files, CHARACTER_ENCODING)
+
+        headers = list(scan_instruction_headers(evt_files["a.evt"]))
+        self.assertEqual(
+            [
+                InstructionReference("a.evt", offset, type_id)
+                for offset, type_id, _ in headers
+            ],
+            index.instructions(filename="a.evt"),
+        )
+
+        first_offset, first_type_id, _ = headers[0]
+        self.assertEqual(
+            [InstructionReference("b.evt", first_offset, UNKNOWN_TYPE_ID)],
+            index.instructions(type_id=UNKNOWN_TYPE_ID),
+        )
+        self.assertEqual(["b.evt"], index.filenames_with_instruction(UNKNOWN_TYPE_ID))
+        self.assertEqual(
+            [
+                InstructionReference("b.evt", offset, type_id)
+                for offset, type_id, _ in headers[1:]
+                if type_id == first_type_id
+            ],
+            index.instructions(type_id=first_type_id, filename="b.evt"),
+        )
+        self.assertEqual([], index.instructions(type_id=0xFFFF, filename="a.evt"))
+
+    def test_strings_and_jumps(self) -> None:
+        data = load_dummy_event_bytes()
+        index = EventIndex.build({"a.evt": data}, CHARACTER_ENCODING)
+
+        event = Event.from_buffer(data, CHARACTER_ENCODING)
+        offsets = [offset for offset, _, _ in scan_instruction_headers(data)]
+
+        strings = []
+        jumps = []
+        for offset, instruction in zip(offsets, event.instructions):
+            for argument_type, argument in zip(
+                instruction.instruction_type.arguments, instruction.arguments
+            ):
+                if argument_type in (ArgumentType.String, ArgumentType.AsciiString):
+                    strings.append((offset, argument))
+                elif argument_type == ArgumentType.InstructionLocation:
+                    jumps.append((offset, int(argument, 16)))
+
+        self.assertNotEqual([], strings)
+        self.assertNotEqual([], jumps)
+        self.assertEqual(strings, index.files["a.evt"].strings)
+        self.assertEqual(jumps, index.files["a.evt"].jumps)
+
+        offset, string = strings[0]
+        self.assertIn(
+            offset,
+            [reference.offset for reference in index.find_strings(string)],
+        )
+
+        offset, target = jumps[0]
+        self.assertIn(offset, index.jumps_to("a.evt", target))
+
+    def test_save_and_load(self) -> None:
+        index = EventIndex.build(create_evt_files(), CHARACTER_ENCODING)
+
+        with tempfile.TemporaryDirectory() as directory:
+            index_filepath = get_index_filepath(pathlib.Path(directory) / "game.nds")
+            self.assertEqual("game.nds.evt_index.json", index_filepath.name)
+
+            index.save(index_filepath, CHARACTER_ENCODING_NAME)
+
+            loaded = EventIndex.load(index_filepath, CHARACTER_ENCODING_NAME)
+            assert loaded is not None
+            self.assertEqual(index.files, loaded.files)
+            self.assertEqual(index.offsets_by_type_id, loaded.offsets_by_type_id)
+
+            # Indexes built with a different character encoding are not used
+            self.assertIsNone(EventIndex.load(index_filepath, "Japan"))
+
+            index_filepath.write_text("not json")
+            self.assertIsNone(EventIndex.load(index_filepath, CHARACTER_ENCODING_NAME))
+
+    def test_only_reindexes_changed_files(self) -> None:
+        evt_files = create_evt_files()
+        previous = EventIndex.build(evt_files, CHARACTER_ENCODING)
+
+        evt_files["b.evt"] = evt_files["a.evt"]
+        evt_files["c.evt"] = evt_files["a.evt"]
+        index = EventIndex.build(evt_files, CHARACTER_ENCODING, previous)
+
+        self.assertIs(previous.files["a.evt"], index.files["a.evt"])
+        self.assertIsNot(previous.files["b.evt"], index.files["b.evt"])
+        self.assertEqual(index.files["a.evt"], index.files["b.evt"])
+        self.assertEqual(index.files["a.evt"], index.files["c.evt"])
+
+    def test_failed_files_are_kept_and_not_retried(self) -> None:
+        evt_files = create_evt_files()
+        evt_files["bad.evt"] = evt_files["a.evt"][:-3]
+
+        previous = EventIndex.build(evt_files, CHARACTER_ENCODING)
+        self.assertEqual(["a.evt", "b.evt"], sorted(previous.files))
+        self.assertEqual(["bad.evt"], list(previous.failed))
+        self.assertIn("EvtInstructionParseError", previous.failed["bad.evt"].error)
+
+        with tempfile.TemporaryDirectory() as directory:
+            index_filepath = pathlib.Path(directory) / "game.nds.evt_index.json"
+            previous.save(index_filepath, CHARACTER_ENCODING_NAME)
+
+            loaded = EventIndex.load(index_filepath, CHARACTER_ENCODING_NAME)
+            assert loaded is not None
+            self.assertEqual(previous.failed, loaded.failed)
+
+        index = EventIndex.build(evt_files, CHARACTER_ENCODING, previous)
+        self.assertIs(previous.failed["bad.evt"], index.failed["bad.evt"])
+
+        # Once fixed, the file is indexed
+        evt_files["bad.evt"] = evt_files["a.evt"]
+        index = EventIndex.build(evt_files, CHARACTER_ENCODING, previous)
+        self.assertEqual({}, index.failed)
+        self.assertEqual(index.files["a.evt"], index.files["bad.evt"])
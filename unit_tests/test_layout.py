@@ -0,0 +1,87 @@
+import struct
+import unittest
+
+import numpy as np
+
+from dqmj1_randomizer.randomize.layout import (
+    U8,
+    U16,
+    U32,
+    Blob,
+    Field,
+    RecordLayout,
+    RegionalRecordLayout,
+)
+from dqmj1_randomizer.randomize.regions import Region
+
+POINT_LAYOUT = RecordLayout([Field("x", U8), Field("y", U16)])
+EXAMPLE_LAYOUT = RecordLayout(
+    [
+        Field("a", U32),
+        Field("b", Blob(3), count=2),
+        Field("c", POINT_LAYOUT, count=2),
+        Field("d", U16, count=3),
+    ]
+)
+
+
+class TestRecordLayout(unittest.TestCase):
+    def test_struct(self) -> None:
+        self.assertEqual(22, EXAMPLE_LAYOUT.size)
+        self.assertEqual(
+            struct.Struct("<I3s3sBHBH3H").format, EXAMPLE_LAYOUT.struct.format
+        )
+
+    def test_offsets(self) -> None:
+        self.assertEqual(
+            [0, 4, 10, 16], [EXAMPLE_LAYOUT.offset(name) for name in "abcd"]
+        )
+
+    def test_struct_and_dtype_agree(self) -> None:
+        values = (1, b"abc", b"def", 2, 3, 4, 5, 6, 7, 8)
+        data = EXAMPLE_LAYOUT.struct.pack(*values)
+
+        (record,) = EXAMPLE_LAYOUT.frombuffer(data)
+        self.assertEqual(1, record["a"])
+        self.assertEqual([b"abc", b"def"], [bytes(b) for b in record["b"]])
+        self.assertEqual([2, 4], record["c"]["x"].tolist())
+        self.assertEqual([3, 5], record["c"]["y"].tolist())
+        self.assertEqual([6, 7, 8], record["d"].tolist())
+
+    def test_field_struct(self) -> None:
+        data = EXAMPLE_LAYOUT.struct.pack(1, b"abc", b"def", 2, 3, 4, 5, 6, 7, 8)
+
+        self.assertEqual(
+            (2, 3, 4, 5),
+            EXAMPLE_LAYOUT.field_struct("c").unpack_from(
+                data, EXAMPLE_LAYOUT.offset("c")
+            ),
+        )
+
+    def test_frombuffer_is_a_view(self) -> None:
+        data = bytearray(EXAMPLE_LAYOUT.size * 2)
+
+        records = EXAMPLE_LAYOUT.frombuffer(data)
+        records["d"][1, 1] = 0xFFFF
+
+        self.assertEqual(
+            (0, 0xFFFF, 0),
+            EXAMPLE_LAYOUT.field_struct("d").unpack_from(
+                data, EXAMPLE_LAYOUT.size + EXAMPLE_LAYOUT.offset("d")
+            ),
+        )
+        self.assertEqual(np.uint8, records["b"].dtype)
+
+
+class TestRegionalRecordLayout(unittest.TestCase):
+    def test_overrides(self) -> None:
+        long_layout = RecordLayout([Field("a", U8), Field("b", Blob(4))])
+        short_layout = RecordLayout([Field("a", U8), Field("b", Blob(2))])
+
+        layout = RegionalRecordLayout(
+            default=long_layout, overrides={Region.Japan: short_layout}
+        )
+
+        self.assertEqual(5, layout[Region.NorthAmerica].size)
+        self.assertEqual(5, layout[Region.Europe].size)
+        self.assertEqual(3, layout[Region.Japan].size)
@@ -0,0 +1,50 @@
+import unittest
+
+from dqmj1_randomizer.randomize.patch import (
+    BytePatch,
+    PatchOutOfBoundsError,
+    apply_patches,
+    diff_bytes,
+)
+
+
+class TestDiffBytes(unittest.TestCase):
+    def test_no_changes(self) -> None:
+        self.assertEqual([], diff_bytes(b"abcdef", b"abcdef"))
+
+    def test_runs(self) -> None:
+        self.assertEqual(
+            [BytePatch(0, b"X"), BytePatch(2, b"YZ"), BytePatch(5, b"W")],
+            diff_bytes(b"abcdef", b"XbYZeW"),
+        )
+
+    def test_offset(self) -> None:
+        self.assertEqual(
+            [BytePatch(10, b"YZ")], diff_bytes(b"abcdef", b"abYZef", offset=8)
+        )
+
+    def test_round_trip(self) -> None:
+        original = bytes(range(256)) * 4
+        modified = bytearray(original)
+        modified[3:9] = b"\xff" * 6
+        modified[100] = 0x0
+        modified[-1] = 0x1
+
+        patches = diff_bytes(original, modified)
+
+        self.assertEqual(3, len(patches))
+        self.assertEqual(modified, apply_patches(original, patches))
+
+
+class TestApplyPatches(unittest.TestCase):
+    def test_does_not_modify_input(self) -> None:
+        data = bytearray(b"abcdef")
+
+        self.assertEqual(
+            bytearray(b"abXYef"), apply_patches(data, [BytePatch(2, b"XY")])
+        )
+        self.assertEqual(bytearray(b"abcdef"), data)
+
+    def test_out_of_bounds(self) -> None:
+        with self.assertRaises(PatchOutOfBoundsError):
+            apply_patches(b"abcdef", [BytePatch(5, b"XY")])
@@ -0,0 +1,138 @@
+import io
+import pathlib
+import random
+import unittest
+
+import ndspy.fnt
+import ndspy.rom
+import pandas as pd
+
+from dqmj1_randomizer.data import data_path
+from dqmj1_randomizer.randomize.btl_enmy_prm import randomize_btl_enmy_prm
+from dqmj1_randomizer.randomize.character_encoding import CHARACTER_ENCODINGS
+from dqmj1_randomizer.randomize.evt import (
+    INSTRUCTION_TYPES_BY_NAME,
+    Event,
+    scan_instruction_headers,
+)
+from dqmj1_randomizer.randomize.randomize import (
+    RandomizeBtlEnmyPrmTbl,
+    RandomizeSkillTbl,
+    RemoveDialog,
+)
+from dqmj1_randomizer.randomize.regions import Region
+from dqmj1_randomizer.randomize.skill_tbl import SkillSetTable, shuffle_skill_tbl
+from dqmj1_randomizer.state import (
+    BiasedByStatTotalMonsterShuffle,
+    Monsters,
+    Other,
+    SkillSets,
+    State,
+)
+from unit_tests.helpers import create_skill_sets_table
+
+INPUTS_DIRECTORY = pathlib.Path(__file__).parent.parent / "regression_tests" / "inputs"
+
+CHARACTER_ENCODING = CHARACTER_ENCODINGS["North America / Europe"]
+
+
+def create_rom(files: dict[str, bytes]) -> ndspy.rom.NintendoDSRom:
+    rom = ndspy.rom.NintendoDSRom()
+    rom.filenames = ndspy.fnt.Folder(files=list(files))
+    rom.files = list(files.values())
+
+    return rom
+
+
+class TestTableTasks(unittest.TestCase):
+    def test_randomize_btl_enmy_prm_tbl(self) -> None:
+        data = (INPUTS_DIRECTORY / "dummy_BtlEnmyPrm.bin").read_bytes()
+        state = State(
+            seed=42,
+            monsters=Monsters(
+                randomize=True,
+                include_bosses=True,
+                transfer_boss_item_drops=True,
+                include_starters=True,
+                include_gift_monsters=True,
+                randomization_policy=BiasedByStatTotalMonsterShuffle(50),
+            ),
+        )
+
+        rom = create_rom({"BtlEnmyPrm.bin": data})
+        RandomizeBtlEnmyPrmTbl().run(state, rom)
+
+        # Randomize by writing out the whole file
+        output_stream = io.BytesIO()
+        randomize_btl_enmy_prm(state, io.BytesIO(data), output_stream)
+
+        self.assertNotEqual(data, rom.getFileByName("BtlEnmyPrm.bin"))
+        self.assertEqual(output_stream.getvalue(), rom.getFileByName("BtlEnmyPrm.bin"))
+
+    def test_randomize_skill_tbl(self) -> None:
+        for region in Region:
+            data = bytes(create_skill_sets_table(region, seed=0).raw)
+            state = State(seed=42, region=region, skill_sets=SkillSets(randomize=True))
+
+            rom = create_rom({"SkillTbl.bin": data})
+            RandomizeSkillTbl().run(state, rom)
+
+            # Randomize by writing out the whole file
+            skill_sets_table = SkillSetTable.from_bin(io.BytesIO(data), region=region)
+            shuffle_skill_tbl(
+                state,
+                pd.read_csv(data_path / "skill_tbl_info.csv"),
+                skill_sets_table,
+                random.Random(state.seed),
+            )
+            output_stream = io.BytesIO()
+            skill_sets_table.write_bin(output_stream)
+
+            self.assertNotEqual(data, rom.getFileByName("SkillTbl.bin"))
+            self.assertEqual(
+                output_stream.getvalue(), rom.getFileByName("SkillTbl.bin")
+            )
+
+
+class TestRemoveDialog(unittest.TestCase):
+    def test_only_show_dialog_type_ids_are_changed(self) -> None:
+        data = (INPUTS_DIRECTORY / "dummy_event.evt").read_bytes()
+        other_data = (INPUTS_DIRECTORY / "dummy_BtlEnmyPrm.bin").read_bytes()
+
+        show_dialog = INSTRUCTION_TYPES_BY_NAME["ShowDialog"]
+        nop = INSTRUCTION_TYPES_BY_NAME["NopAA"]
+
+        # Remove the dialog by decoding and re-encoding the whole event, ShowDialog has no
+        # arguments so its Nop has no data
+        event = Event.from_buffer(data, CHARACTER_ENCODING)
+        self.assertIn(
+            show_dialog,
+            [instruction.instruction_type for instruction in event.instructions],
+        )
+        event.instructions = [
+            instruction.replace(instruction_type=nop, arguments=(b"",))
+            if instruction.instruction_type == show_dialog
+            else instruction
+            for instruction in event.instructions
+        ]
+        expected = event.to_evt(CHARACTER_ENCODING)
+
+        rom = create_rom(
+            {
+                "a.evt": data,
+                "b.evt": data,
+                "no_dialog.evt": bytes(expected),
+                "BtlEnmyPrm.bin": other_data,
+            }
+        )
+        RemoveDialog().run(State(seed=42, other=Other(remove_dialogue=True)), rom)
+
+        for filename in ["a.evt", "b.evt", "no_dialog.evt"]:
+            actual = rom.getFileByName(filename)
+            self.assertEqual(bytes(expected), actual)
+            self.assertNotIn(
+                show_dialog.type_id,
+                [type_id for _, type_id, _ in scan_instruction_headers(actual)],
+            )
+
+        self.assertEqual(other_data, rom.getFileByName("BtlEnmyPrm.bin"))
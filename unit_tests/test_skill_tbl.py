@@ -0,0 +1,168 @@
+import random
+import unittest
+
+import pandas as pd
+
+from dqmj1_randomizer.randomize.patch import apply_patches
+from dqmj1_randomizer.randomize.regions import Region
+from dqmj1_randomizer.randomize.skill_tbl import (
+    NUM_SKILL_SETS,
+    NUM_SKILLS_PER_SKILL_SET,
+    SKILL_SIZE_IN_BYTES,
+    TRAIT_SIZE_IN_BYTES,
+    SkillSetTable,
+    find_skill_and_trait_slots,
+    shuffle_skill_tbl,
+    skill_tbl_patches,
+)
+from dqmj1_randomizer.state import State
+from unit_tests.helpers import create_skill_sets_table
+
+
+def create_info(seed: int) -> pd.DataFrame:
+    rng = random.Random(seed)
+
+    return pd.DataFrame(
+        {
+            "id": range(NUM_SKILL_SETS),
+            "exclude": [
+                "y" if rng.random() < 0.2 else None for _ in range(NUM_SKILL_SETS)
+            ],
+        }
+    )
+
+
+def reference_shuffle_skill_tbl(
+    data: pd.DataFrame, skill_sets_table: SkillSetTable, rng: random.Random
+) -> None:
+    """
+    Shuffle implemented on top of the SkillSet objects, to check the byte-level one against.
+    """
+    skill_sets = skill_sets_table.skill_sets
+
+    skill_and_trait_entries = {}
+    for skill_set_index, skill_set in enumerate(skill_sets):
+        if data["exclude"][skill_set_index] == "y":
+            continue
+
+        for slot_index, (skill, trait) in enumerate(
+            zip(skill_set.skills, skill_set.traits)
+        ):
+            if skill.is_empty() and trait.is_empty():
+                continue
+
+            skill_and_trait_entries[(skill_set_index, slot_index)] = (skill, trait)
+
+    indices = skill_and_trait_entries.keys()
+    values = list(skill_and_trait_entries.values())
+    rng.shuffle(values)
+
+    for (skill_set_index, slot_index), (skill, trait) in zip(indices, values):
+        skill_set = skill_sets[skill_set_index]
+
+        skills = skill_set.skills
+        traits = skill_set.traits
+
+        skills[slot_index] = skill
+        traits[slot_index] = trait
+
+        skill_set.skills = skills
+        skill_set.traits = traits
+
+    skill_sets_table.skill_sets = skill_sets
+
+
+class TestShuffleSkillTbl(unittest.TestCase):
+    def test_matches_reference(self) -> None:
+        for region in [Region.NorthAmerica, Region.Japan]:
+            for seed in range(5):
+                data = create_info(seed)
+
+                expected = create_skill_sets_table(region, seed)
+                reference_shuffle_skill_tbl(data, expected, random.Random(seed))
+
+                actual = create_skill_sets_table(region, seed)
+                shuffle_skill_tbl(State(seed=seed), data, actual, random.Random(seed))
+
+                self.assertEqual(expected.raw, actual.raw)
+
+    def test_patches_match_full_output(self) -> None:
+        data = create_info(0)
+        original = create_skill_sets_table(Region.Japan, 0)
+
+        expected = create_skill_sets_table(Region.Japan, 0)
+        shuffle_skill_tbl(State(), data, expected, random.Random(0))
+
+        patches = skill_tbl_patches(
+            State(region=Region.Japan), data, bytes(original.raw), random.Random(0)
+        )
+
+        self.assertEqual(expected.raw, apply_patches(original.raw, patches))
+
+    def test_find_skill_and_trait_slots_skips_empty_and_excluded(self) -> None:
+        skill_sets_table = SkillSetTable(raw=bytearray(), region=Region.NorthAmerica)
+        skill_sets_table.raw = bytearray(
+            skill_sets_table.skill_offset(NUM_SKILL_SETS, 0)
+        )
+
+        # Skill only, trait only, and a slot in an excluded skill set
+        skill_sets_table.raw[skill_sets_table.skill_offset(1, 2)] = 0x01
+        skill_sets_table.raw[skill_sets_table.trait_offset(3, 9)] = 0x01
+        skill_sets_table.raw[skill_sets_table.skill_offset(0, 0)] = 0x01
+
+        data = create_info(0)
+        data.loc[:, "exclude"] = None
+        data.loc[0, "exclude"] = "y"
+
+        skill_set_indices, slot_indices = find_skill_and_trait_slots(
+            data, skill_sets_table
+        )
+        self.assertEqual([1, 3], skill_set_indices.tolist())
+        self.assertEqual([2, 9], slot_indices.tolist())
+
+
+class TestSkillSetTable(unittest.TestCase):
+    def test_array_views_match_skill_sets(self) -> None:
+        for region in [Region.NorthAmerica, Region.Japan]:
+            skill_sets_table = create_skill_sets_table(region, 0)
+
+            skill_sets = skill_sets_table.skill_sets
+            for skill_set_index in [0, 57, NUM_SKILL_SETS - 1]:
+                skill_set = skill_sets[skill_set_index]
+                for slot_index in range(NUM_SKILLS_PER_SKILL_SET):
+                    self.assertEqual(
+                        skill_set.skills[slot_index].raw,
+                        skill_sets_table.skills[skill_set_index, slot_index].tobytes(),
+                    )
+                    self.assertEqual(
+                        skill_set.traits[slot_index].raw,
+                        skill_sets_table.traits[skill_set_index, slot_index].tobytes(),
+                    )
+
+    def test_array_views_write_through(self) -> None:
+        skill_sets_table = create_skill_sets_table(Region.NorthAmerica, 0)
+
+        skill_sets_table.skills[3, 4] = 0x0
+        skill_sets_table.traits[3, 4] = 0x0
+
+        skill_set = skill_sets_table.skill_sets[3]
+        self.assertTrue(skill_set.skills[4].is_empty())
+        self.assertTrue(skill_set.traits[4].is_empty())
+
+    def test_to_pd(self) -> None:
+        skill_sets_table = create_skill_sets_table(Region.Japan, 0)
+
+        skill_sets_df = skill_sets_table.to_pd()
+
+        self.assertEqual(NUM_SKILL_SETS * NUM_SKILLS_PER_SKILL_SET, len(skill_sets_df))
+
+        row = skill_sets_df.iloc[5 * NUM_SKILLS_PER_SKILL_SET + 2]
+        self.assertEqual((5, 2), (row["skill_set_index"], row["slot_index"]))
+        self.assertEqual(
+            skill_sets_table.skill_sets[5].skills[2].raw,
+            bytes(row[[f"skill_{k}" for k in range(SKILL_SIZE_IN_BYTES)]].tolist()),
+        )
+        self.assertEqual(
+            skill_sets_table.skill_sets[5].traits[2].raw,
+            bytes(row[[f"trait_{k}" for k in range(TRAIT_SIZE_IN_BYTES)]].tolist()),
+        )